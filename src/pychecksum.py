@@ -20,21 +20,73 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock, Event, BoundedSemaphore, get_ident, local
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from multiprocessing.connection import Listener, Client
 from app_image import image_code, paypal_code
 from app_license import license_msg
 from app_donate import donate_msg
 from tkinter import filedialog
-from threading import Thread
 from subprocess import Popen
 from tkinter import ttk
 import webbrowser as wb
-import winsound as ws
+import multiprocessing
 import tkinter as tk
+import ctypes.util
+import tempfile
 import platform
+import argparse
+import tarfile
+import zipfile
 import hashlib
+import shutil
+import select
+import struct
+import random
+import errno
+import heapq
+import queue
+import stat
+import json
+import math
+import lzma
+import gzip
+import zlib
 import time
+import csv
+import sys
+import re
 import os
 
+try:
+    import winsound as ws
+except ImportError:
+    ws = None
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
 
 class AddTooltip(object):
 
@@ -47,10 +99,9 @@ class AddTooltip(object):
         self.time = None
         self.block = False
         self.display = False
+        self.tooltip = None
         self._set_styles()
         self._set_formats()
-        self._create_styles()
-        self._create_tooltip()
         self._add_tooltip()
 
     def loc_inside_widget(self, loc_left, loc_top):
@@ -128,13 +179,16 @@ class AddTooltip(object):
 
     def display_tooltip(self):
         """
-        Display tooltip window
+        Display tooltip window, creating it on first use
         """
         if not self.block:
             cursor_left = self.widget.winfo_pointerx()
             cursor_top = self.widget.winfo_pointery()
             is_inside = self.loc_inside_widget(cursor_left, cursor_top)
             if is_inside:
+                if self.tooltip is None:
+                    self._create_styles()
+                    self._create_tooltip()
                 self.display = True
                 kwargs = {'left': cursor_left, 'top': cursor_top + 18}
                 self.tooltip.geometry(self.geometry_fmt.format(**kwargs))
@@ -211,29 +265,3527 @@ class AddMoveControl(object):
         self.button_dict[self.active_button].configure(state='active')
         self.master.bind('<Return>', func=self.press_button)
 
-    def deselect_button(self, event):
+    def deselect_button(self, event):
+        """
+        Release button selection when event is fired
+        """
+        if self.active_button is not None:
+            self.button_dict[self.active_button].configure(state='normal')
+            self.master.unbind('<Return>')
+            key = event.keysym.lower()
+            if key not in self.direct:
+                self.active_button = None
+
+    def press_button(self, event):
+        """
+        Invoke selected button when event is fired
+        """
+        if self.active_button is not None:
+            active_button = self.active_button
+            self.deselect_button(event)
+            self.button_dict[active_button].invoke()
+
+
+class HashProc(object):
+
+    def __init__(self, notify=None, progress=None, workers=None, dev_workers=None, run_num=None, sink=None,
+                 metrics=None, links=None, path_filter=None, timeouts=None):
+        """
+        Initialize hash process class
+        """
+        if workers is None:
+            workers = os.cpu_count()
+        if run_num is None:
+            run_num = 2 ** 18
+        self.notify = notify
+        self.progress = progress
+        self.sink = sink
+        self.metrics = metrics
+        self.cache = None
+        self.budget = None
+        self.links = links
+        self.path_filter = path_filter
+        self.workers = workers
+        self.dev_workers = {'hdd': 1, 'ssd': 8}
+        if dev_workers is not None:
+            self.dev_workers.update(dev_workers)
+        self.timeout_dict = {'read': None, 'file': None, 'rate': None, 'grace': 5.0, 'retries': 0, 'backoff': 0.5,
+                             'interval': 0.5}
+        if timeouts is not None:
+            self.timeout_dict.update(timeouts)
+        self.local = local()
+        self.rot_dict = {}
+        self.sema_dict = {}
+        self.proto_dict = {}
+        self.lock = Lock()
+        self.block_size = 2 ** 16
+        self.batch_num = 64
+        self.batch_size = 2 ** 23
+        self.fan_num = 64
+        self.zero_buffer = bytes(2 ** 20)
+        self.comp_errs = (EOFError, zlib.error, gzip.BadGzipFile, lzma.LZMAError)
+        if zstd is not None:
+            self.comp_errs += (zstd.ZstdError,)
+        self.run_num = run_num
+        self._set_info()
+        self._set_dicts()
+        self._set_formats()
+        self._set_patterns()
+
+    def _set_info(self):
+        """
+        Setting process information
+        """
+        self.app_name = 'PyChecksum'
+        self.app_ver = '1.0'
+        self.app_title = ' '.join([self.app_name, self.app_ver])
+        self.app_website = 'https://github.com/pychecksum'
+
+    def _set_dicts(self):
+        """
+        Setting algorithm, compression, dialect, and archive dictionaries
+        """
+        self.alg_dict = {1: 'md5', 2: 'sha1', 3: 'sha224', 4: 'sha256', 5: 'sha384', 6: 'sha512'}
+        self.comp_dict = {1: 'gz', 2: 'xz', 3: 'zst'}
+        self.side_dict = {1: 'err', 2: 'state'}
+        self.dial_dict = {1: 'native', 2: 'gnu', 3: 'bsd'}
+        self.link_dict = {1: 'follow', 2: 'record', 3: 'skip'}
+        self.arch_dict = {1: 'zip', 2: 'tar', 3: 'tar.gz', 4: 'tgz', 5: 'tar.bz2', 6: 'tbz2', 7: 'tar.xz', 8: 'txz'}
+        self.len_dict = {32: 'md5', 40: 'sha1', 56: 'sha224', 64: 'sha256', 96: 'sha384', 128: 'sha512'}
+        self.esc_dict = {'\\': '\\\\', '\n': '\\n', '\r': '\\r'}
+
+    def _set_formats(self):
+        """
+        Setting special formats
+        """
+        self.title_fmt = '{main} ({add})'
+        self.info_fmt = '{info}: {data}'
+        self.hash_fmt = '{hash} *{path}\n'
+        self.gnu_fmt = '{esc}{hash}  {path}\n'
+        self.bsd_fmt = '{esc}{alg} ({path}) = {hash}\n'
+        self.err_fmt = '{err} *{path}\n'
+        self.state_fmt = '{time:.0f} *{path}\n'
+        self.dir_fmt = '{hash} {start}+{size} /{path}\n'
+        self.sep_fmt = '-' * 120
+
+    def _set_patterns(self):
+        """
+        Setting hash line patterns of GNU and BSD dialects, directories, and archive members
+        """
+        self.gnu_pat = re.compile(r'^(\\?)([0-9a-fA-F]+) [ *](.+)$')
+        self.bsd_pat = re.compile(r'^(\\?)([A-Za-z0-9-]+) ?\((.+)\) ?= ?([0-9a-fA-F]+)$')
+        self.esc_pat = re.compile(r'\\(.)')
+        self.dir_pat = re.compile(r'^([0-9a-fA-F]+) (?:(\d+)\+(\d+) )?/(.*)$')
+        arch_exts = '|'.join(re.escape(arch_ext) for arch_ext in self.arch_dict.values())
+        self.member_pat = re.compile(r'^(.*?\.(?:{exts}))!(.+)$'.format(exts=arch_exts), re.IGNORECASE)
+
+    def fork(self, notify=None, progress=None):
+        """
+        Create a hash process that shares the device budgets, the global budget, sink, and metrics
+        """
+        hash_proc = HashProc(notify, progress, self.workers, self.dev_workers, self.run_num, self.sink, self.metrics,
+                             self.links, self.path_filter, self.timeout_dict)
+        hash_proc.rot_dict = self.rot_dict
+        hash_proc.sema_dict = self.sema_dict
+        hash_proc.proto_dict = self.proto_dict
+        hash_proc.cache = self.cache
+        hash_proc.budget = self.budget
+        hash_proc.lock = self.lock
+        return hash_proc
+
+    def report(self, action, path):
+        """
+        Report the current action to the notify function
+        """
+        if self.notify is not None:
+            self.notify(action, path)
+
+    def advance(self, num, total_num):
+        """
+        Report the current progress to the progress function
+        """
+        if self.progress is not None:
+            self.progress(num, total_num)
+
+    def emit(self, err, rel_path, expected=None, actual=None, size=None, duration=None):
+        """
+        Report a verdict to the result sink and the metrics
+        """
+        if self.metrics is not None:
+            self.metrics.count(err.strip())
+        if self.sink is not None:
+            record = {'type': err.strip(), 'path': rel_path, 'expected': expected, 'actual': actual,
+                      'size': size, 'duration': duration}
+            self.sink.write(record)
+
+    def format_err(self, err, rel_path, expected=None, actual=None, size=None, duration=None):
+        """
+        Format an error line and report it to the result sink
+        """
+        self.emit(err, rel_path, expected, actual, size, duration)
+        return self.err_fmt.format(err=err, path=rel_path)
+
+    def split_table(self, file_path):
+        """
+        Split a hash table path into base path, algorithm, and compression
+        """
+        base_path, file_ext = os.path.splitext(file_path)
+        file_ext = file_ext[1:].lower()
+        comp = None
+        if file_ext in self.comp_dict.values():
+            comp = file_ext
+            file_path = base_path
+            base_path, file_ext = os.path.splitext(base_path)
+            file_ext = file_ext[1:].lower()
+        if file_ext in self.alg_dict.values():
+            return base_path, file_ext, comp
+        return file_path, None, comp
+
+    def is_sidecar(self, file_path):
+        """
+        Verify if a file is a hash table, an error file, or a state file
+        """
+        file_ext = os.path.splitext(file_path)[1][1:].lower()
+        if file_ext in self.side_dict.values():
+            file_path = os.path.splitext(file_path)[0]
+        alg = self.split_table(file_path)[1]
+        return alg is not None
+
+    def get_sidecars(self, hash_path):
+        """
+        Get the hash table path and the paths of its side files
+        """
+        side_paths = ['.'.join([hash_path, ext]) for ext in self.side_dict.values()]
+        return [hash_path] + side_paths
+
+    def open_table(self, file_path, mode='r'):
+        """
+        Open a hash table file, compressed or not, in text mode
+        """
+        comp = self.split_table(file_path)[2]
+        open_dict = {None: open, 'gz': gzip.open, 'xz': lzma.open}
+        if zstd is not None:
+            open_dict['zst'] = zstd.open
+        if comp not in open_dict:
+            raise ImportError("No module named 'zstandard'", name='zstandard', path=file_path)
+        func = open_dict[comp]
+        mode = ''.join([mode, 't'])
+        return func(file_path, mode=mode, encoding='utf-8')
+
+    def get_table(self, alg, dir_path, comp=None):
+        """
+        Get the hash table path of a directory
+        """
+        dir_name = os.path.basename(dir_path)
+        hash_name = '.'.join([dir_name, alg])
+        if comp is not None:
+            hash_name = '.'.join([hash_name, comp])
+        return os.path.join(dir_path, hash_name)
+
+    def get_shard(self, alg, dir_path, key, comp=None):
+        """
+        Get the hash table path of a directory shard
+        """
+        dir_name = os.path.basename(dir_path)
+        shard_name = '.'.join([dir_name, key, alg])
+        if key == '.':
+            shard_name = '.'.join([dir_name, '', alg])
+        if comp is not None:
+            shard_name = '.'.join([shard_name, comp])
+        return os.path.join(dir_path, shard_name)
+
+    def shard_key(self, rel_path, layout):
+        """
+        Get the shard key of a relative path by top directory or path hash
+        """
+        rel_path = rel_path.replace(os.sep, '/')
+        if layout == 'dir':
+            parts = rel_path.split('/', 1)
+            if len(parts) == 1:
+                return '.'
+            return parts[0]
+        shard_num = zlib.crc32(rel_path.encode('utf-8')) % int(layout)
+        return str(shard_num)
+
+    def split_shards(self, dir_path, path_dict, layout):
+        """
+        Split a dictionary of files into shard dictionaries
+        """
+        shard_dict = {}
+        if layout != 'dir':
+            for shard_num in range(int(layout)):
+                shard_dict[str(shard_num)] = {}
+        for file_path in path_dict:
+            rel_path = os.path.relpath(file_path, start=dir_path)
+            key = self.shard_key(rel_path, layout)
+            if key not in shard_dict:
+                shard_dict[key] = {}
+            shard_dict[key][file_path] = path_dict[file_path]
+        return shard_dict
+
+    def walk_dir(self, dir_path, skip_dict=None, sub_path=None, top_only=False):
+        """
+        Walk a directory and return the dictionary of files to process
+        """
+        return dict(self.iter_dir(dir_path, skip_dict, sub_path, top_only))
+
+    def walk_info(self):
+        """
+        Get the header information lines of the symlink policy and the path filter
+        """
+        info_lines = []
+        if self.links is not None:
+            info_lines.append(('Symlinks', self.links))
+        if self.path_filter is not None:
+            info_lines.append(('Path Filter', self.path_filter.dump()))
+        return info_lines
+
+    def fork_info(self, info_dict):
+        """
+        Create a hash process that walks with the symlink policy and the path filter of a hash table header
+        """
+        hash_proc = self.fork(self.notify, self.progress)
+        hash_proc.links = None
+        hash_proc.path_filter = None
+        if info_dict.get('Symlinks') in self.link_dict.values():
+            hash_proc.links = info_dict.get('Symlinks')
+        if 'Path Filter' in info_dict:
+            hash_proc.path_filter = HashFilter(**json.loads(info_dict['Path Filter']))
+        return hash_proc
+
+    def is_limited(self, file_path, rel_path):
+        """
+        Verify if a listed file is only missing from the walk because of the size and time limits of the path filter
+        """
+        path_filter = self.path_filter
+        if (path_filter is None) or (not path_filter.has_stat):
+            return False
+        return os.path.isfile(file_path) and (not path_filter.is_excluded(rel_path))
+
+    def iter_dir(self, dir_path, skip_dict=None, sub_path=None, top_only=False):
+        """
+        Walk a directory and yield the files to process with their device information, and with their size when the
+        walk already has their stat
+        """
+        if sub_path is None:
+            sub_path = dir_path
+        path_filter = self.path_filter
+        root_len = len(os.path.join(dir_path, ''))
+        if (path_filter is not None) and (sub_path != dir_path):
+            if path_filter.is_excluded(os.path.relpath(sub_path, start=dir_path), True):
+                return
+        path_list = [sub_path]
+        seen_dict = {}
+        while path_list:
+            path = path_list.pop()
+            try:
+                path_stat = os.stat(path)
+                dev = path_stat.st_dev
+                if self.links == 'follow':
+                    if (dev, path_stat.st_ino) in seen_dict:
+                        continue
+                    seen_dict[(dev, path_stat.st_ino)] = None
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            dirs = []
+            for entry in entries:
+                try:
+                    is_link = entry.is_symlink()
+                    is_dir = entry.is_dir() and not (is_link and (self.links == 'record'))
+                    is_special = not (is_link or is_dir or entry.is_file())
+                except OSError:
+                    is_link = False
+                    is_dir = False
+                    is_special = False
+                if (is_link and (self.links == 'skip')) or is_special:
+                    continue
+                elif is_dir:
+                    if top_only or (is_link and (self.links != 'follow')):
+                        continue
+                    elif (path_filter is None) or (not path_filter.is_excluded(entry.path[root_len:], True)):
+                        dirs.append(entry.path)
+                elif (path == dir_path) and self.is_sidecar(entry.path):
+                    if skip_dict is not None:
+                        skip_dict[entry.path] = None
+                elif (path_filter is not None) and path_filter.is_excluded(entry.path[root_len:], False, entry):
+                    continue
+                elif is_link and (self.links == 'record'):
+                    yield entry.path, (dev, 0, None)
+                else:
+                    file_size = None
+                    file_info = (dev, entry.inode())
+                    try:
+                        if is_link or (os.name == 'nt') or ((path_filter is not None) and path_filter.has_stat):
+                            file_stat = entry.stat()
+                            if not stat.S_ISREG(file_stat.st_mode):
+                                continue
+                            if is_link:
+                                file_info = (file_stat.st_dev, file_stat.st_ino)
+                            if not self.is_sparse(file_stat):
+                                file_size = file_stat.st_size
+                    except OSError:
+                        file_info = (dev, 0)
+                    yield entry.path, file_info + (file_size,)
+            path_list.extend(reversed(dirs))
+
+    def walk_shard(self, dir_path, layout, key, skip_dict=None):
+        """
+        Walk the part of a directory that belongs to a shard
+        """
+        if layout != 'dir':
+            path_dict = self.walk_dir(dir_path, skip_dict)
+            return self.split_shards(dir_path, path_dict, layout)[key]
+        elif key == '.':
+            return self.walk_dir(dir_path, skip_dict, top_only=True)
+        else:
+            sub_path = os.path.join(dir_path, key)
+            return self.walk_dir(dir_path, skip_dict, sub_path=sub_path)
+
+    def write_header(self, file, info, num, title, info_lines=()):
+        """
+        Write the header lines of a hash table or an error file
+        """
+        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
+        num_info = self.info_fmt.format(info=info, data=num)
+        info_lines = [self.info_fmt.format(info=key, data=value) for key, value in info_lines]
+        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info, num_info]
+        header_lines += info_lines + [self.sep_fmt, title, self.sep_fmt, '']
+        header_lines = '\n'.join(header_lines)
+        file.write(header_lines)
+
+    def write_err(self, err_path, err_lines):
+        """
+        Write the error file
+        """
+        with open(err_path, mode='w', encoding='utf-8') as err_file:
+            self.write_header(err_file, 'Number of Errors', len(err_lines), 'Error Type')
+            err_file.writelines(err_lines)
+
+    def open_spool(self, hash_path):
+        """
+        Open the error spool of a hash table run
+        """
+        spool_prefix = '.'.join([os.path.basename(hash_path), ''])
+        return HashSpool(spool_prefix)
+
+    def write_table(self, hash_path, alg, hash_lines, dial=None, info_lines=(), dir_dict=None):
+        """
+        Write the hash table file, compressed by extension, with the entries grouped by directory when directory
+        digests are given so that their records can point at the span of their entries
+        """
+        with self.open_table(hash_path, mode='w') as hash_file:
+            if dial in (None, 'native'):
+                alg_title = self.title_fmt.format(main='Hash Algorithm', add=alg.upper())
+                self.write_header(hash_file, 'Number of Hashes', len(hash_lines), alg_title, info_lines)
+            if not dir_dict:
+                hash_file.writelines(hash_lines)
+                return
+            line_dict = {}
+            for hash_line in hash_lines:
+                rel_dir = self.entry_dir(self.parse_line(hash_line, alg)[1])
+                line_dict.setdefault(rel_dir, []).append(hash_line)
+            span_dict = {}
+            for rel_dir in sorted(line_dict):
+                start = hash_file.tell()
+                hash_file.writelines(line_dict[rel_dir])
+                span_dict[rel_dir] = (start, hash_file.tell() - start)
+            for rel_dir in sorted(dir_dict):
+                start, size = span_dict.get(rel_dir, (0, 0))
+                hash_file.write(self.dir_fmt.format(hash=dir_dict[rel_dir], start=start, size=size, path=rel_dir))
+
+    def read_header(self, hash_path):
+        """
+        Read the information lines of a hash table header
+        """
+        info_dict = {}
+        sep_num = 0
+        with self.open_table(hash_path, mode='r') as hash_file:
+            for line in hash_file:
+                line = line.rstrip('\r\n')
+                if line == self.sep_fmt:
+                    sep_num += 1
+                    if sep_num == 3:
+                        break
+                elif self.parse_line(line) is not None:
+                    break
+                elif line.count(': '):
+                    info, data = line.split(': ', 1)
+                    info_dict[info] = data
+                elif (sep_num == 2) and line.count(' ('):
+                    info_dict['Title'] = line.split(' (')[0]
+        return info_dict
+
+    def format_line(self, alg, file_hash, rel_path, dial=None):
+        """
+        Format a hash line in native, GNU, or BSD dialect
+        """
+        if dial in (None, 'native'):
+            return self.hash_fmt.format(hash=file_hash, path=rel_path)
+        rel_path = rel_path.replace(os.sep, '/')
+        esc = ''
+        if ('\\' in rel_path) or ('\n' in rel_path) or ('\r' in rel_path):
+            esc = '\\'
+            rel_path = ''.join([self.esc_dict.get(char, char) for char in rel_path])
+        if dial == 'gnu':
+            return self.gnu_fmt.format(esc=esc, hash=file_hash, path=rel_path)
+        return self.bsd_fmt.format(esc=esc, alg=alg.upper(), path=rel_path, hash=file_hash)
+
+    def parse_line(self, line, alg=None):
+        """
+        Parse a hash line in native, GNU, or BSD dialect
+        """
+        line = line.rstrip('\r\n')
+        if self.dir_pat.match(line):
+            return None
+        gnu_match = self.gnu_pat.match(line)
+        if gnu_match:
+            esc, file_hash, rel_path = gnu_match.groups()
+            if (alg is None) or (self.len_dict.get(len(file_hash)) == alg):
+                if esc:
+                    rel_path = self.esc_pat.sub(self.unescape, rel_path)
+                elif line[len(file_hash) + 1] == '*':
+                    rel_path = rel_path.strip()
+                return file_hash.lower(), rel_path, self.len_dict.get(len(file_hash))
+        bsd_match = self.bsd_pat.match(line)
+        if bsd_match:
+            esc, tag, rel_path, file_hash = bsd_match.groups()
+            tag = tag.lower().replace('sha2-', 'sha').replace('-', '')
+            if (alg is None) or (tag == alg):
+                if esc:
+                    rel_path = self.esc_pat.sub(self.unescape, rel_path)
+                return file_hash.lower(), rel_path, tag
+        if line.count('*'):
+            file_hash, rel_path = map(str.strip, line.split('*')[:2])
+            return file_hash.lower(), rel_path, alg
+        return None
+
+    def unescape(self, match):
+        """
+        Unescape a character of a GNU or BSD escaped path
+        """
+        char = match.group(1)
+        return {'n': '\n', 'r': '\r'}.get(char, char)
+
+    def detect_alg(self, hash_path):
+        """
+        Detect the algorithm of a hash table by extension or content
+        """
+        alg = self.split_table(hash_path)[1]
+        if alg is None:
+            with self.open_table(hash_path, mode='r') as hash_file:
+                for line in hash_file:
+                    hash_info = self.parse_line(line)
+                    if (hash_info is not None) and (hash_info[2] in self.alg_dict.values()):
+                        alg = hash_info[2]
+                        break
+        return alg
+
+    def read_table(self, hash_path, alg=None):
+        """
+        Read the hash table file line by line, compressed or not
+        """
+        with self.open_table(hash_path, mode='r') as hash_file:
+            for line in hash_file:
+                hash_info = self.parse_line(line, alg)
+                if hash_info is not None:
+                    yield hash_info[:2]
+
+    def read_entries(self, hash_path, alg=None):
+        """
+        Read the file entries of a hash table or of all shards of a manifest
+        """
+        dir_path = os.path.dirname(hash_path)
+        if self.read_header(hash_path).get('Title') == 'Hash Manifest':
+            for shard_hash, shard_name in self.read_table(hash_path, alg):
+                shard_path = os.path.join(dir_path, shard_name)
+                yield from self.read_table(shard_path, alg)
+        else:
+            yield from self.read_table(hash_path, alg)
+
+    def read_tail(self, hash_path):
+        """
+        Read the directory records that end a hash table, reading an uncompressed table backwards
+        """
+        if self.split_table(hash_path)[2] is not None:
+            with self.open_table(hash_path, mode='r') as hash_file:
+                return [line.rstrip('\r\n') for line in hash_file if self.dir_pat.match(line.rstrip('\r\n'))]
+        dir_lines = []
+        with open(hash_path, mode='rb') as hash_file:
+            pos = hash_file.seek(0, os.SEEK_END)
+            rest = b''
+            while pos > 0:
+                read_num = min(pos, self.block_size)
+                pos -= read_num
+                hash_file.seek(pos)
+                lines = (hash_file.read(read_num) + rest).split(b'\n')
+                rest = lines.pop(0) if pos > 0 else b''
+                for line in reversed(lines):
+                    line = line.decode('utf-8').rstrip('\r')
+                    if not line:
+                        continue
+                    elif not self.dir_pat.match(line):
+                        return dir_lines
+                    dir_lines.append(line)
+        return dir_lines
+
+    def read_dirs(self, hash_path):
+        """
+        Read the directory digests of a hash table with the byte spans of their entries, when recorded
+        """
+        dir_dict = {}
+        for line in self.read_tail(hash_path):
+            dir_hash, start, size, rel_dir = self.dir_pat.match(line).groups()
+            span = None if start is None else (int(start), int(size))
+            dir_dict[rel_dir] = (dir_hash.lower(), span)
+        return dir_dict
+
+    def read_span(self, hash_path, alg, span):
+        """
+        Read the entries of a directory from their byte span in an uncompressed hash table
+        """
+        with open(hash_path, mode='rb') as hash_file:
+            hash_file.seek(span[0])
+            data = hash_file.read(span[1]).decode('utf-8')
+        for line in data.splitlines():
+            hash_info = self.parse_line(line, alg)
+            if hash_info is not None:
+                yield hash_info[:2]
+
+    def entry_dir(self, rel_path):
+        """
+        Get the directory of a file entry, or of the archive of a member entry
+        """
+        member_info = self.split_member(rel_path)
+        if member_info is not None:
+            rel_path = member_info[0]
+        rel_dir = os.path.dirname(rel_path.replace(os.sep, '/'))
+        return rel_dir or '.'
+
+    def merkle_dirs(self, alg, hash_lines):
+        """
+        Calculate the Merkle digests of all directories from their file hashes
+        """
+        child_dict = {'.': {}}
+        for line in hash_lines:
+            file_hash, rel_path = self.parse_line(line, alg)[:2]
+            if self.split_member(rel_path) is not None:
+                continue
+            rel_dir = self.entry_dir(rel_path)
+            child_dict.setdefault(rel_dir, {})[os.path.basename(rel_path)] = file_hash
+            while rel_dir != '.':
+                base_dir = os.path.dirname(rel_dir) or '.'
+                sub_name = os.path.basename(rel_dir) + '/'
+                base_dict = child_dict.setdefault(base_dir, {})
+                if sub_name in base_dict:
+                    break
+                base_dict[sub_name] = None
+                rel_dir = base_dir
+        dir_dict = {}
+        for rel_dir in sorted(child_dict, key=lambda rel_dir: -rel_dir.count('/') - (rel_dir != '.')):
+            hasher = self.new_hasher(alg)
+            for name in sorted(child_dict[rel_dir]):
+                child_hash = child_dict[rel_dir][name]
+                if child_hash is None:
+                    sub_dir = name[:-1] if rel_dir == '.' else '/'.join([rel_dir, name[:-1]])
+                    child_hash = dir_dict[sub_dir]
+                hasher.update('{name}\0{hash}\n'.format(name=name, hash=child_hash).encode('utf-8'))
+            dir_dict[rel_dir] = hasher.hexdigest()
+        return dir_dict
+
+    def read_state(self, state_path):
+        """
+        Read the last check times of a state file
+        """
+        state_dict = {}
+        if os.path.isfile(state_path):
+            with open(state_path, mode='r', encoding='utf-8') as state_file:
+                for line in state_file:
+                    if line.count(' *'):
+                        check_time, rel_path = line.rstrip('\r\n').split(' *', 1)
+                        state_dict[rel_path] = float(check_time)
+        return state_dict
+
+    def write_state(self, state_path, state_dict):
+        """
+        Write the last check times of a state file
+        """
+        with open(state_path, mode='w', encoding='utf-8') as state_file:
+            for rel_path, check_time in state_dict.items():
+                state_file.write(self.state_fmt.format(time=check_time, path=rel_path))
+
+    def new_hasher(self, alg):
+        """
+        Get a new hasher by copying the prototype of an algorithm
+        """
+        if alg not in self.proto_dict:
+            self.proto_dict[alg] = hashlib.new(alg)
+        return self.proto_dict[alg].copy()
+
+    def calc_hash(self, alg, file_path, display=False, file_size=None, out_file=None, stream=False):
+        """
+        Calculate the hash of a file, or of its target path when symlinks are recorded, streaming a pipe only when
+        it was given explicitly
+        """
+        block_size = self.block_size
+        hasher = self.new_hasher(alg)
+        if (self.links == 'record') and os.path.islink(file_path):
+            hasher.update(os.fsencode(os.readlink(file_path)))
+            return hasher.hexdigest()
+        try:
+            with open(file_path, mode='rb', buffering=0) as file:
+                if file_size is None:
+                    file_stat = os.fstat(file.fileno())
+                    if stream and stat.S_ISFIFO(file_stat.st_mode):
+                        return self.hash_stream(alg, file, out_file)
+                    elif not stat.S_ISREG(file_stat.st_mode):
+                        return OSError(errno.EINVAL, 'Not a regular file', file_path)
+                    file_size = file_stat.st_size
+                    if self.is_sparse(file_stat):
+                        self.hash_sparse(hasher, file, file_size, out_file, display)
+                        return hasher.hexdigest()
+                if file_size < block_size:
+                    buffer = file.read(block_size)
+                    hasher.update(buffer)
+                    if out_file is not None:
+                        out_file.write(buffer)
+                    if len(buffer) == file_size:
+                        if display:
+                            self.advance(1, 1)
+                        return hasher.hexdigest()
+                total_num = int(file_size / block_size) + 1
+                buffer = bytearray(block_size)
+                view = memoryview(buffer)
+                chunk_num = 0
+                watch_state = getattr(self.local, 'state', None)
+                read_num = file.readinto(buffer)
+                while read_num:
+                    hasher.update(view[:read_num])
+                    if out_file is not None:
+                        out_file.write(view[:read_num])
+                    if watch_state is not None:
+                        self.track_read(watch_state, read_num)
+                    chunk_num += 1
+                    if display:
+                        self.advance(min(chunk_num, total_num), total_num)
+                    read_num = file.readinto(buffer)
+            file_hash = hasher.hexdigest()
+            return file_hash
+        except PermissionError as perm_err:
+            return perm_err
+
+    def is_sparse(self, file_stat):
+        """
+        Verify if a file has holes that can be skipped when reading it
+        """
+        if not (hasattr(os, 'SEEK_DATA') and hasattr(file_stat, 'st_blocks')):
+            return False
+        return (file_stat.st_size >= self.block_size) and (file_stat.st_blocks * 512 < file_stat.st_size)
+
+    def is_skippable(self, out_file):
+        """
+        Verify if holes can be seeked over in an output file, which must be a regular file not opened for appending
+        """
+        try:
+            fd = out_file.fileno()
+            if not stat.S_ISREG(os.fstat(fd).st_mode):
+                return False
+            elif fcntl is not None:
+                return not (fcntl.fcntl(fd, fcntl.F_GETFL) & os.O_APPEND)
+        except (OSError, AttributeError, ValueError):
+            return False
+        return 'a' not in getattr(out_file, 'mode', 'a')
+
+    def hash_zeros(self, hasher, zero_num, out_file=None, skip=False):
+        """
+        Feed the zero bytes of a hole to a hasher from the shared zero buffer, seeking over them in the output file
+        when it can skip holes
+        """
+        zero_view = memoryview(self.zero_buffer)
+        if (out_file is not None) and skip:
+            out_file.seek(zero_num, os.SEEK_CUR)
+            out_file = None
+        while zero_num > 0:
+            chunk_view = zero_view[:min(zero_num, len(zero_view))]
+            hasher.update(chunk_view)
+            if out_file is not None:
+                out_file.write(chunk_view)
+            zero_num -= len(chunk_view)
+
+    def hash_sparse(self, hasher, file, file_size, out_file=None, display=False):
+        """
+        Hash the data extents of a sparse file and its holes without reading them
+        """
+        block_size = self.block_size
+        fd = file.fileno()
+        total_num = int(file_size / block_size) + 1
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        watch_state = getattr(self.local, 'state', None)
+        skip = (out_file is not None) and self.is_skippable(out_file)
+        pos = 0
+        while pos < file_size:
+            try:
+                data_pos = min(os.lseek(fd, pos, os.SEEK_DATA), file_size)
+            except OSError:
+                data_pos = file_size
+            self.hash_zeros(hasher, data_pos - pos, out_file, skip)
+            if data_pos >= file_size:
+                break
+            hole_pos = min(os.lseek(fd, data_pos, os.SEEK_HOLE), file_size)
+            os.lseek(fd, data_pos, os.SEEK_SET)
+            pos = data_pos
+            while pos < hole_pos:
+                read_num = file.readinto(view[:min(hole_pos - pos, block_size)])
+                if not read_num:
+                    return
+                hasher.update(view[:read_num])
+                if out_file is not None:
+                    out_file.write(view[:read_num])
+                if watch_state is not None:
+                    self.track_read(watch_state, read_num)
+                pos += read_num
+            if display:
+                self.advance(min(int(pos / block_size), total_num), total_num)
+        if skip:
+            out_file.truncate()
+
+    def hash_stream(self, alg, stream, out_stream=None):
+        """
+        Calculate the hash of a binary stream of unknown length, passing its data to an output stream when given
+        """
+        hasher = self.new_hasher(alg)
+        buffer = bytearray(self.block_size)
+        view = memoryview(buffer)
+        read_into = getattr(stream, 'recv_into', None) or getattr(stream, 'readinto', None)
+        while True:
+            if read_into is not None:
+                read_num = read_into(buffer)
+                data = view[:read_num or 0]
+            else:
+                data = stream.read(self.block_size)
+            if not data:
+                break
+            hasher.update(data)
+            if out_stream is not None:
+                out_stream.write(data)
+        if out_stream is not None:
+            out_stream.flush()
+        return hasher.hexdigest()
+
+    def copy_range(self, src_path, dst_file):
+        """
+        Copy a file inside the kernel when the platform allows it
+        """
+        with open(src_path, mode='rb', buffering=0) as src_file:
+            in_fd = src_file.fileno()
+            out_fd = dst_file.fileno()
+            try:
+                if hasattr(os, 'copy_file_range'):
+                    while os.copy_file_range(in_fd, out_fd, self.batch_size):
+                        pass
+                    return
+                elif hasattr(os, 'sendfile'):
+                    offset = 0
+                    sent_num = os.sendfile(out_fd, in_fd, offset, self.batch_size)
+                    while sent_num:
+                        offset += sent_num
+                        sent_num = os.sendfile(out_fd, in_fd, offset, self.batch_size)
+                    return
+            except OSError:
+                src_file.seek(0)
+                dst_file.seek(0)
+                dst_file.truncate()
+            shutil.copyfileobj(src_file, dst_file, self.batch_size)
+
+    def copy_file(self, alg, src_path, dst_path, file_size=None):
+        """
+        Copy a file and calculate its hash from the same reads, or only copy it when no algorithm is given
+        """
+        file_hash = None
+        try:
+            with open(dst_path, mode='wb') as dst_file:
+                if alg is None:
+                    self.copy_range(src_path, dst_file)
+                else:
+                    file_hash = self.calc_hash(alg, src_path, file_size=file_size, out_file=dst_file)
+            if isinstance(file_hash, Exception):
+                os.remove(dst_path)
+            else:
+                shutil.copystat(src_path, dst_path)
+        except OSError as os_err:
+            return os_err
+        return file_hash
+
+    def copy_worker(self, alg, src_path, dst_path, file_info, is_link=False):
+        """
+        Copy a file, or only hash a symlink copied as a link, while holding the read semaphore of its device
+        """
+        dev, ino, file_size = file_info or (None, 0, None)
+        with self.get_sema(dev):
+            if not is_link:
+                return self.copy_file(alg, src_path, dst_path, file_size)
+            elif alg is None:
+                return None
+            try:
+                return self.calc_hash(alg, src_path, file_size=file_size)
+            except OSError as os_err:
+                return os_err
+
+    def copy_dirs(self, src_path, dst_path):
+        """
+        Create the directories of a copy, the empty ones included, and get the symlinks to copy as links
+        """
+        path_filter = self.path_filter
+        root_len = len(os.path.join(src_path, ''))
+        link_list = []
+        seen_dict = {}
+        path_list = [src_path]
+        while path_list:
+            path = path_list.pop()
+            path_stat = os.stat(path)
+            if (path_stat.st_dev, path_stat.st_ino) in seen_dict:
+                continue
+            seen_dict[(path_stat.st_dev, path_stat.st_ino)] = None
+            os.makedirs(os.path.join(dst_path, path[root_len:]), exist_ok=True)
+            for entry in os.scandir(path):
+                rel_path = entry.path[root_len:]
+                if entry.is_symlink() and (self.links not in ('follow', 'skip')):
+                    if (path_filter is None) or (not path_filter.is_excluded(rel_path, entry.is_dir())):
+                        link_list.append(entry.path)
+                elif entry.is_dir() and ((path_filter is None) or (not path_filter.is_excluded(rel_path, True))):
+                    path_list.append(entry.path)
+        return link_list
+
+    def copy_dir(self, alg, src_path, dst_path, comp=None, dial=None):
+        """
+        Copy a directory and generate the hash table of the copy from the same reads
+        """
+        src_path = os.path.abspath(src_path)
+        dst_path = os.path.abspath(dst_path)
+        err_lines = []
+        try:
+            if not os.path.isdir(src_path):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), src_path)
+            self.report('Reading', src_path)
+            link_dict = dict.fromkeys(self.copy_dirs(src_path, dst_path))
+            path_dict = self.walk_dir(src_path)
+            for link_path in link_dict:
+                rel_path = os.path.relpath(link_path, start=src_path)
+                copy_path = os.path.join(dst_path, rel_path)
+                try:
+                    if os.path.lexists(copy_path):
+                        os.remove(copy_path)
+                    os.symlink(os.readlink(link_path), copy_path)
+                except OSError:
+                    path_dict.pop(link_path, None)
+                    err_lines.append(self.format_err('Unknown    ', rel_path))
+            self.report('Processing', src_path)
+            res_dict = {}
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                future_dict = {}
+                for file_path in sorted(path_dict, key=lambda file_path: (path_dict[file_path] or (0, 0))[:2]):
+                    rel_path = os.path.relpath(file_path, start=src_path)
+                    copy_path = os.path.join(dst_path, rel_path)
+                    os.makedirs(os.path.dirname(copy_path), exist_ok=True)
+                    args = (alg, file_path, copy_path, path_dict[file_path], file_path in link_dict)
+                    future_dict[executor.submit(self.copy_worker, *args)] = file_path
+                total_num = len(future_dict)
+                file_num = 0
+                for future in as_completed(future_dict):
+                    file_num += 1
+                    res_dict[future_dict[future]] = future.result()
+                    self.advance(file_num, total_num)
+        except (OSError, ImportError) as proc_err:
+            return proc_err
+        hash_lines = []
+        for file_path in path_dict:
+            rel_path = os.path.relpath(file_path, start=src_path)
+            file_hash = res_dict[file_path]
+            if type(file_hash) == str:
+                hash_lines.append(self.format_line(alg, file_hash, rel_path, dial))
+            elif (file_hash is None) and (alg is None):
+                continue
+            elif type(file_hash) == PermissionError:
+                err_lines.append(self.format_err('Permission ', rel_path))
+            elif type(file_hash) == TimeoutError:
+                err_lines.append(self.format_err('Stalled    ', rel_path))
+            else:
+                err_lines.append(self.format_err('Unknown    ', rel_path))
+        if alg is None:
+            return len(err_lines) or None
+        hash_path = self.get_table(alg, dst_path, comp)
+        err_path = '.'.join([hash_path, 'err'])
+        try:
+            if err_lines:
+                self.write_err(err_path, err_lines)
+                return len(err_lines)
+            elif hash_lines:
+                self.write_table(hash_path, alg, hash_lines, dial)
+                if os.path.isfile(err_path):
+                    os.remove(err_path)
+                return hash_lines
+            else:
+                return None
+        except (OSError, ImportError) as proc_err:
+            return proc_err
+
+    def is_archive(self, file_path):
+        """
+        Verify if a file is a zip or tar archive
+        """
+        file_name = file_path.lower()
+        return any(file_name.endswith('.' + arch_ext) for arch_ext in self.arch_dict.values())
+
+    def split_member(self, rel_path):
+        """
+        Split an archive member entry into archive path and member name
+        """
+        match = self.member_pat.match(rel_path)
+        if match is None:
+            return None
+        return match.group(1), match.group(2)
+
+    def read_hash(self, alg, file):
+        """
+        Calculate the hash of a file object until its end
+        """
+        hasher = self.new_hasher(alg)
+        watch_state = getattr(self.local, 'state', None)
+        buffer = file.read(self.block_size)
+        while buffer:
+            hasher.update(buffer)
+            if watch_state is not None:
+                self.track_read(watch_state, len(buffer))
+            buffer = file.read(self.block_size)
+        return hasher.hexdigest()
+
+    def hash_archive(self, alg, file_path):
+        """
+        Calculate the hashes of the members of an archive without extracting it
+        """
+        member_list = []
+        try:
+            if file_path.lower().endswith('.zip'):
+                with zipfile.ZipFile(file_path, mode='r') as arch_file:
+                    for member_info in arch_file.infolist():
+                        if not member_info.is_dir():
+                            with arch_file.open(member_info, mode='r') as member:
+                                member_list.append((member_info.filename, self.read_hash(alg, member)))
+            else:
+                with tarfile.open(file_path, mode='r|*') as arch_file:
+                    for member_info in arch_file:
+                        if member_info.isfile():
+                            member = arch_file.extractfile(member_info)
+                            member_list.append((member_info.name, self.read_hash(alg, member)))
+        except (PermissionError, TimeoutError) as proc_err:
+            return proc_err
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error, lzma.LZMAError) as arch_err:
+            return arch_err
+        return member_list
+
+    def is_rotational(self, dev):
+        """
+        Verify if a device is a spinning disk, when the platform tells
+        """
+        if dev not in self.rot_dict:
+            rot = None
+            if hasattr(os, 'major') and (dev is not None):
+                dev_path = '/sys/dev/block/{major}:{minor}'.format(major=os.major(dev), minor=os.minor(dev))
+                dev_path = os.path.realpath(dev_path)
+                for rot_path in (os.path.join(dev_path, 'queue', 'rotational'),
+                                 os.path.join(os.path.dirname(dev_path), 'queue', 'rotational')):
+                    if os.path.isfile(rot_path):
+                        with open(rot_path, mode='r') as rot_file:
+                            rot = rot_file.read().strip() == '1'
+                        break
+            self.rot_dict[dev] = rot
+        return self.rot_dict[dev]
+
+    def get_workers(self, dev):
+        """
+        Get the number of concurrent reads allowed on a device
+        """
+        if dev in self.dev_workers:
+            return self.dev_workers[dev]
+        elif self.is_rotational(dev):
+            return self.dev_workers['hdd']
+        else:
+            return self.dev_workers['ssd']
+
+    def get_sema(self, dev):
+        """
+        Get the semaphore that bounds the concurrent reads on a device
+        """
+        with self.lock:
+            if dev not in self.sema_dict:
+                self.sema_dict[dev] = BoundedSemaphore(self.get_workers(dev))
+            return self.sema_dict[dev]
+
+    def is_watched(self):
+        """
+        Verify if reads have deadlines or a throughput floor
+        """
+        return any(self.timeout_dict[key] is not None for key in ('read', 'file', 'rate'))
+
+    def is_stalled(self, state, now, hung=False):
+        """
+        Verify if the read of a file passed its deadlines or, unless only hung reads are checked, fell below the
+        throughput floor
+        """
+        start_time, last_time, read_size = state[2:5]
+        read_timeout = self.timeout_dict['read']
+        file_timeout = self.timeout_dict['file']
+        min_rate = self.timeout_dict['rate']
+        if (read_timeout is not None) and (now - last_time > read_timeout):
+            return True
+        elif (file_timeout is not None) and (now - start_time > file_timeout):
+            return True
+        elif (min_rate is not None) and (not hung) and (now - start_time > self.timeout_dict['grace']):
+            return read_size / (now - start_time) < min_rate
+        return False
+
+    def track_read(self, state, read_num):
+        """
+        Record the progress of a watched read and stop it when it stalls
+        """
+        now = time.monotonic()
+        state[3] = now
+        state[4] += read_num
+        if self.is_stalled(state, now):
+            raise TimeoutError('Stalled reading {path}'.format(path=state[0]))
+
+    def hash_file(self, alg, file_path, file_size=None, state=None):
+        """
+        Hash a file, retrying transient and stall errors with exponential backoff
+        """
+        retry_num = 0
+        while True:
+            if state is not None:
+                state[2] = state[3] = time.monotonic()
+                state[4] = 0
+            try:
+                if (self.cache is not None) and (not os.path.islink(file_path)):
+                    file_hash = self.cache.calc_cached(alg, file_path)
+                else:
+                    file_hash = self.calc_hash(alg, file_path, file_size=file_size)
+                if (file_size is None) and ((self.sink is not None) or (self.metrics is not None)):
+                    file_size = os.stat(file_path).st_size
+            except OSError as os_err:
+                file_hash = os_err
+            is_transient = isinstance(file_hash, TimeoutError) or (
+                isinstance(file_hash, OSError) and (file_hash.errno in (errno.EIO, errno.EAGAIN, errno.ETIMEDOUT)))
+            if (not is_transient) or (retry_num >= self.timeout_dict['retries']):
+                return file_hash, file_size
+            delay = self.timeout_dict['backoff'] * 2 ** retry_num
+            if state is not None:
+                state[3] = time.monotonic() + delay
+            time.sleep(delay)
+            retry_num += 1
+
+    def hash_worker(self, alg, dev, file_iter, lock, out_queue, member_dict=None, watch_dict=None):
+        """
+        Hash the files of a device iterator and queue the results
+        """
+        sema = self.get_sema(dev)
+        batch_num = self.batch_num
+        if watch_dict is not None:
+            batch_num = 1
+        ident = get_ident()
+        while True:
+            batch_list = []
+            batch_size = 0
+            with lock:
+                for file_path, file_size in file_iter:
+                    batch_list.append((file_path, file_size))
+                    batch_size += file_size or self.block_size
+                    if (len(batch_list) >= batch_num) or (batch_size >= self.batch_size):
+                        break
+            if not batch_list:
+                break
+            res_list = []
+            if self.budget is not None:
+                self.budget.acquire()
+            is_held = sema.acquire()
+            try:
+                for file_path, file_size in batch_list:
+                    state = None
+                    if watch_dict is not None:
+                        state = [file_path, dev, 0.0, 0.0, 0, file_size]
+                        with self.lock:
+                            watch_dict[ident] = state
+                        self.local.state = state
+                    start_time = time.perf_counter()
+                    file_hash, file_size = self.hash_file(alg, file_path, file_size, state)
+                    duration = time.perf_counter() - start_time
+                    is_member = (member_dict is not None) and (file_path in member_dict)
+                    if is_member:
+                        if state is not None:
+                            state[2] = state[3] = time.monotonic()
+                            state[4] = 0
+                        member_list = self.hash_archive(alg, file_path)
+                    if watch_dict is not None:
+                        self.local.state = None
+                        with self.lock:
+                            if watch_dict.get(ident) is not state:
+                                is_held = False
+                                return
+                            del watch_dict[ident]
+                    if is_member:
+                        member_dict[file_path] = member_list
+                    if (self.metrics is not None) and (type(file_hash) == str):
+                        self.metrics.observe(alg, file_size, duration)
+                    res_list.append((file_path, file_hash, file_size, duration))
+            finally:
+                if is_held:
+                    sema.release()
+                    if self.budget is not None:
+                        self.budget.release()
+            out_queue.put(res_list)
+
+    def check_stalls(self, watch_dict, worker_dict, stall_dict, member_dict=None):
+        """
+        Retry or report the files whose reads stalled and replace their blocked workers
+        """
+        res_list = []
+        now = time.monotonic()
+        with self.lock:
+            stall_list = [(ident, state) for ident, state in watch_dict.items() if self.is_stalled(state, now, True)]
+            for ident, state in stall_list:
+                del watch_dict[ident]
+        for ident, state in stall_list:
+            file_path, dev, start_time = state[:3]
+            stall_dict[file_path] = stall_dict.get(file_path, 0) + 1
+            self.get_sema(dev).release()
+            if self.budget is not None:
+                self.budget.release()
+            if stall_dict[file_path] <= self.timeout_dict['retries']:
+                args = worker_dict[dev][:2] + (iter([(file_path, state[5])]), Lock()) + worker_dict[dev][4:]
+                Thread(target=self.hash_worker, args=args, daemon=True).start()
+            else:
+                stall_err = TimeoutError('Stalled reading {path}'.format(path=file_path))
+                if (member_dict is not None) and (file_path in member_dict):
+                    member_dict[file_path] = stall_err
+                res_list.append((file_path, stall_err, None, now - start_time))
+            Thread(target=self.hash_worker, args=worker_dict[dev], daemon=True).start()
+        return res_list
+
+    def hash_files(self, alg, path_dict, member_dict=None, timed=False):
+        """
+        Hash files with concurrent reads per device, in inode order, once per inode, and the archives of a member
+        dictionary
+        """
+        dev_dict = {}
+        ino_dict = {}
+        link_dict = {}
+        for file_path, file_info in path_dict.items():
+            dev, ino, file_size = file_info or (None, 0, None)
+            if ino and ((dev, ino) in ino_dict):
+                link_dict[ino_dict[(dev, ino)]].append(file_path)
+                continue
+            elif ino:
+                ino_dict[(dev, ino)] = file_path
+                link_dict[file_path] = []
+            if dev not in dev_dict:
+                dev_dict[dev] = []
+            dev_dict[dev].append((ino, file_path, file_size))
+        out_queue = queue.Queue()
+        watch_dict = None
+        stall_dict = {}
+        interval = None
+        if self.is_watched():
+            watch_dict = {}
+            interval = self.timeout_dict['interval']
+        worker_dict = {}
+        for dev, file_list in dev_dict.items():
+            file_list.sort(key=lambda file_info: file_info[0])
+            file_iter = iter([(file_path, file_size) for ino, file_path, file_size in file_list])
+            lock = Lock()
+            worker_dict[dev] = (alg, dev, file_iter, lock, out_queue, member_dict, watch_dict)
+            for i in range(min(self.get_workers(dev), len(file_list))):
+                Thread(target=self.hash_worker, args=worker_dict[dev], daemon=True).start()
+        total_num = sum(len(file_list) for file_list in dev_dict.values())
+        res_num = 0
+        check_time = time.monotonic()
+        while res_num < total_num:
+            if self.metrics is not None:
+                self.metrics.queue(total_num - res_num)
+            try:
+                res_list = out_queue.get(timeout=interval)
+            except queue.Empty:
+                res_list = []
+            if (watch_dict is not None) and (time.monotonic() - check_time >= interval):
+                res_list.extend(self.check_stalls(watch_dict, worker_dict, stall_dict, member_dict))
+                check_time = time.monotonic()
+            res_num += len(res_list)
+            for file_path, file_hash, file_size, duration in list(res_list):
+                for link_path in link_dict.get(file_path, ()):
+                    if (member_dict is not None) and (link_path in member_dict):
+                        member_dict[link_path] = member_dict.get(file_path)
+                    res_list.append((link_path, file_hash, file_size, 0.0))
+            if timed:
+                yield from res_list
+            else:
+                for res in res_list:
+                    yield res[:2]
+        if self.metrics is not None:
+            self.metrics.queue(0)
+
+    def gen_table(self, alg, dir_path, path_dict, dial=None, display=False, archives=False, err_lines=None):
+        """
+        Generate the hash and error lines of a dictionary of files
+        """
+        if err_lines is None:
+            err_lines = []
+        total_num = len(path_dict)
+        file_num = 0
+        line_dict = {}
+        member_dict = None
+        if archives:
+            member_dict = dict.fromkeys(file_path for file_path in path_dict if self.is_archive(file_path))
+        for file_path, file_hash, file_size, duration in self.hash_files(alg, path_dict, member_dict, timed=True):
+            file_num += 1
+            if display:
+                self.advance(file_num, total_num)
+            rel_path = os.path.relpath(file_path, start=dir_path)
+            hash_lines = line_dict[file_path] = []
+            if type(file_hash) == str:
+                hash_line = self.format_line(alg, file_hash, rel_path, dial)
+                hash_lines.append(hash_line)
+                self.emit('OK', rel_path, None, file_hash, file_size, duration)
+            elif type(file_hash) == PermissionError:
+                err_line = self.format_err('Permission ', rel_path, size=file_size, duration=duration)
+                err_lines.append(err_line)
+            elif type(file_hash) == TimeoutError:
+                err_line = self.format_err('Stalled    ', rel_path, size=file_size, duration=duration)
+                err_lines.append(err_line)
+            else:
+                err_line = self.format_err('Unknown    ', rel_path, size=file_size, duration=duration)
+                err_lines.append(err_line)
+            if (member_dict is not None) and (file_path in member_dict):
+                member_list = member_dict[file_path]
+                if isinstance(member_list, Exception):
+                    err_line = self.format_err('Unknown    ', rel_path + '!')
+                    err_lines.append(err_line)
+                    continue
+                for member_name, member_hash in member_list:
+                    member_path = '!'.join([rel_path, member_name])
+                    hash_line = self.format_line(alg, member_hash, member_path, dial)
+                    hash_lines.append(hash_line)
+        hash_lines = [hash_line for file_path in path_dict for hash_line in line_dict.pop(file_path)]
+        return hash_lines, err_lines
+
+    def gen_hash(self, alg, dir_path, comp=None, dial=None, shard=None, keys=None, archives=False, merkle=False):
+        """
+        Generate the hash table of a directory and return its hash lines, the number of lines of its error file, or
+        the error that stopped it
+        """
+        if merkle and ((dial not in (None, 'native')) or (shard is not None)):
+            return ValueError('Merkle digests need a single hash table in the native dialect')
+        hash_path = self.get_table(alg, dir_path, comp)
+        err_path = '.'.join([hash_path, 'err'])
+        try:
+            if not os.path.isdir(dir_path):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), dir_path)
+            if shard is not None:
+                return self.gen_shards(alg, dir_path, comp, shard, keys, archives)
+            self.report('Reading', dir_path)
+            path_dict = self.walk_dir(dir_path)
+            self.report('Processing', dir_path)
+            with self.open_spool(hash_path) as err_lines:
+                hash_lines = self.gen_table(alg, dir_path, path_dict, dial, True, archives, err_lines)[0]
+                if err_lines:
+                    self.write_err(err_path, err_lines)
+                    if os.path.isfile(hash_path):
+                        os.remove(hash_path)
+                    return len(err_lines)
+            if hash_lines:
+                info_lines = []
+                dir_dict = None
+                if archives:
+                    info_lines.append(('Archive Members', 'yes'))
+                info_lines.extend(self.walk_info())
+                if merkle:
+                    dir_dict = self.merkle_dirs(alg, hash_lines)
+                    info_lines.append(('Merkle Root', dir_dict['.']))
+                self.write_table(hash_path, alg, hash_lines, dial, info_lines, dir_dict)
+                if os.path.isfile(err_path):
+                    os.remove(err_path)
+                return hash_lines
+            else:
+                return None
+        except (OSError, ImportError) as proc_err:
+            return proc_err
+
+    def gen_shard(self, alg, dir_path, path_dict, comp, layout, key, archives=False):
+        """
+        Generate the hash table of a shard and return its hash
+        """
+        shard_path = self.get_shard(alg, dir_path, key, comp)
+        hash_lines, err_lines = self.gen_table(alg, dir_path, path_dict, archives=archives)
+        if err_lines:
+            if os.path.isfile(shard_path):
+                os.remove(shard_path)
+            return None, err_lines
+        info_lines = [('Shard Layout', layout), ('Shard Key', key)]
+        if archives:
+            info_lines.append(('Archive Members', 'yes'))
+        info_lines.extend(self.walk_info())
+        self.write_table(shard_path, alg, hash_lines, info_lines=info_lines)
+        shard_hash = self.calc_hash(alg, shard_path)
+        return shard_hash, err_lines
+
+    def gen_shards(self, alg, dir_path, comp=None, shard='dir', keys=None, archives=False):
+        """
+        Generate the sharded hash tables and the manifest of a directory, walking only the requested top directories
+        """
+        hash_path = self.get_table(alg, dir_path, comp)
+        err_path = '.'.join([hash_path, 'err'])
+        layout = str(shard)
+        req_keys = None if keys is None else [str(key) for key in keys]
+        self.report('Reading', dir_path)
+        if (req_keys is not None) and (layout == 'dir'):
+            shard_dict = {key: self.walk_shard(dir_path, layout, key) for key in req_keys}
+            keys = [key for key in req_keys if shard_dict[key]]
+        else:
+            path_dict = self.walk_dir(dir_path)
+            if not path_dict:
+                return None
+            shard_dict = self.split_shards(dir_path, path_dict, layout)
+            keys = [key for key in (shard_dict if req_keys is None else req_keys) if key in shard_dict]
+        old_dict = {}
+        if os.path.isfile(hash_path):
+            info_dict = self.read_header(hash_path)
+            if (info_dict.get('Title') == 'Hash Manifest') and (info_dict.get('Shard Layout') == layout):
+                for shard_hash, shard_name in self.read_table(hash_path, alg):
+                    old_dict[shard_name] = shard_hash
+        self.report('Processing', dir_path)
+        new_dict = {}
+        with self.open_spool(hash_path) as err_lines:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                future_dict = {}
+                for key in keys:
+                    args = (alg, dir_path, shard_dict[key], comp, layout, key, archives)
+                    future_dict[executor.submit(self.gen_shard, *args)] = key
+                total_num = len(future_dict)
+                shard_num = 0
+                for future in as_completed(future_dict):
+                    shard_num += 1
+                    shard_hash, shard_errs = future.result()
+                    shard_path = self.get_shard(alg, dir_path, future_dict[future], comp)
+                    if shard_hash is not None:
+                        new_dict[os.path.basename(shard_path)] = shard_hash
+                    err_lines.extend(shard_errs)
+                    self.advance(shard_num, total_num)
+            if req_keys is not None:
+                gen_names = [os.path.basename(self.get_shard(alg, dir_path, key, comp)) for key in req_keys]
+                for shard_name in old_dict:
+                    if shard_name not in gen_names:
+                        new_dict[shard_name] = old_dict[shard_name]
+            hash_lines = [self.format_line(alg, new_dict[key], key) for key in sorted(new_dict)]
+            info_lines = [('Shard Layout', layout)]
+            info_lines.extend(self.walk_info())
+            with self.open_table(hash_path, mode='w') as hash_file:
+                alg_title = self.title_fmt.format(main='Hash Manifest', add=alg.upper())
+                self.write_header(hash_file, 'Number of Shards', len(hash_lines), alg_title, info_lines)
+                hash_file.writelines(hash_lines)
+            for shard_name in old_dict:
+                shard_path = os.path.join(dir_path, shard_name)
+                if (shard_name not in new_dict) and os.path.isfile(shard_path):
+                    os.remove(shard_path)
+            if err_lines:
+                self.write_err(err_path, err_lines)
+                return len(err_lines)
+        if os.path.isfile(err_path):
+            os.remove(err_path)
+        return hash_lines
+
+    def verif_table(self, alg, hash_path, dir_path, path_dict, skip_dict, display=False, err_lines=None):
+        """
+        Verify a hash table against a dictionary of files
+        """
+        archives = self.read_header(hash_path).get('Archive Members') == 'yes'
+        hash_lines = self.read_table(hash_path, alg)
+        return self.verif_entries(alg, hash_lines, dir_path, path_dict, skip_dict, display, hash_path, archives,
+                                  err_lines)
+
+    def verif_res(self, rel_path, old_hash, new_hash, file_size=None, duration=None):
+        """
+        Verify the new hash of a file against its listed hash
+        """
+        if type(new_hash) == str:
+            if new_hash != old_hash:
+                return [self.format_err('Not match  ', rel_path, old_hash, new_hash, file_size, duration)]
+            self.emit('OK', rel_path, old_hash, new_hash, file_size, duration)
+        elif type(new_hash) == PermissionError:
+            return [self.format_err('Permission ', rel_path, old_hash, None, file_size, duration)]
+        elif type(new_hash) == TimeoutError:
+            return [self.format_err('Stalled    ', rel_path, old_hash, None, file_size, duration)]
+        else:
+            return [self.format_err('Unknown    ', rel_path, old_hash, None, file_size, duration)]
+        return []
+
+    def verif_members(self, rel_path, member_hashes, member_list, archives=False):
+        """
+        Verify the member entries of an archive against its member hashes
+        """
+        err_lines = []
+        if isinstance(member_list, Exception):
+            err_type = 'Unknown    '
+            if type(member_list) == PermissionError:
+                err_type = 'Permission '
+            elif type(member_list) == TimeoutError:
+                err_type = 'Stalled    '
+            for member_name in member_hashes:
+                member_path = '!'.join([rel_path, member_name])
+                err_lines.append(self.format_err(err_type, member_path))
+            return err_lines
+        new_dict = dict(member_list)
+        for member_name, old_hash in member_hashes.items():
+            member_path = '!'.join([rel_path, member_name])
+            if member_name not in new_dict:
+                err_lines.append(self.format_err('Not found  ', member_path, old_hash))
+            elif new_dict[member_name] != old_hash:
+                err_lines.append(self.format_err('Not match  ', member_path))
+        if archives:
+            for member_name in new_dict:
+                if member_name not in member_hashes:
+                    member_path = '!'.join([rel_path, member_name])
+                    err_lines.append(self.format_err('Not listed ', member_path))
+        return err_lines
+
+    def verif_entries(self, alg, hash_lines, dir_path, path_dict, skip_dict, display=False, hash_path=None,
+                      archives=False, err_lines=None):
+        """
+        Verify hash entries against a dictionary of files
+        """
+        if err_lines is None:
+            err_lines = []
+        hash_dict = {}
+        err_dict = {}
+        member_tab = {}
+        for file_hash, rel_path in hash_lines:
+            member_info = self.split_member(rel_path)
+            if member_info is not None:
+                arch_path = os.path.abspath(os.path.join(dir_path, member_info[0]))
+                if arch_path in path_dict:
+                    if arch_path not in member_tab:
+                        member_tab[arch_path] = {}
+                    if member_info[1] not in member_tab[arch_path]:
+                        member_tab[arch_path][member_info[1]] = file_hash
+                    else:
+                        err_dict.setdefault(('Duplicated ', rel_path), file_hash)
+                    continue
+            file_path = os.path.join(dir_path, rel_path)
+            file_path = os.path.abspath(file_path)
+            is_found = (file_path in path_dict) or (file_path in skip_dict)
+            if (not is_found) and self.is_limited(file_path, rel_path):
+                path_dict[file_path] = None
+                is_found = True
+            base_path = os.path.dirname(file_path)
+            if (base_path == dir_path) and self.is_sidecar(file_path):
+                skip_dict[file_path] = None
+            if file_path not in hash_dict:
+                hash_dict[file_path] = file_hash
+            else:
+                err_dict.setdefault(('Duplicated ', rel_path), file_hash)
+            if file_path in skip_dict:
+                err_dict.setdefault(('Not skipped', rel_path), file_hash)
+            if not is_found:
+                err_dict.setdefault(('Not found  ', rel_path), file_hash)
+        err_lines.extend(self.format_err(err, rel_path, old_hash) for (err, rel_path), old_hash in err_dict.items())
+        if display:
+            self.report('Processing', hash_path)
+        hash_path_dict = {key: path_dict[key] for key in path_dict if key in hash_dict}
+        member_dict = dict.fromkeys(member_tab)
+        if archives:
+            member_dict.update(dict.fromkeys(key for key in hash_path_dict if self.is_archive(key)))
+        for file_path in path_dict:
+            if file_path not in hash_dict:
+                rel_path = os.path.relpath(file_path, start=dir_path)
+                err_line = self.format_err('Not listed ', rel_path)
+                err_lines.append(err_line)
+        total_num = len(hash_path_dict)
+        file_num = 0
+        for file_path, new_hash, file_size, duration in self.hash_files(alg, hash_path_dict, member_dict, timed=True):
+            file_num += 1
+            if display:
+                self.advance(file_num, total_num)
+            rel_path = os.path.relpath(file_path, start=dir_path)
+            err_lines.extend(self.verif_res(rel_path, hash_dict[file_path], new_hash, file_size, duration))
+            if file_path in member_dict:
+                member_list = member_dict[file_path]
+                err_lines.extend(self.verif_members(rel_path, member_tab.get(file_path, {}), member_list, archives))
+        for file_path in member_tab:
+            if file_path in hash_path_dict:
+                continue
+            rel_path = os.path.relpath(file_path, start=dir_path)
+            member_list = self.hash_archive(alg, file_path)
+            err_lines.extend(self.verif_members(rel_path, member_tab[file_path], member_list, archives))
+        return err_lines
+
+    def verif_hash(self, alg, hash_path, external=False):
+        """
+        Verify the hash table of a directory and return None, the number of lines of its error file, or the error that
+        stopped it
+        """
+        dir_path = os.path.dirname(hash_path)
+        err_path = '.'.join([hash_path, 'err'])
+        skip_dict = {}
+        try:
+            info_dict = self.read_header(hash_path)
+            info_proc = self.fork_info(info_dict)
+            if info_proc.walk_info() != self.walk_info():
+                return info_proc.verif_hash(alg, hash_path, external)
+            with self.open_spool(hash_path) as err_lines:
+                if external and ('Shard Key' not in info_dict):
+                    self.verif_sorted(alg, hash_path, err_lines)
+                elif info_dict.get('Title') == 'Hash Manifest':
+                    self.verif_shards(alg, hash_path, err_lines)
+                else:
+                    self.report('Reading', dir_path)
+                    if 'Shard Key' in info_dict:
+                        layout = info_dict.get('Shard Layout')
+                        key = info_dict.get('Shard Key')
+                        path_dict = self.walk_shard(dir_path, layout, key, skip_dict)
+                    else:
+                        path_dict = self.walk_dir(dir_path, skip_dict)
+                    for file_path in self.get_sidecars(hash_path):
+                        if file_path in path_dict:
+                            del path_dict[file_path]
+                            skip_dict[file_path] = None
+                    self.report('Reading', hash_path)
+                    self.verif_table(alg, hash_path, dir_path, path_dict, skip_dict, True, err_lines)
+                if err_lines:
+                    self.write_err(err_path, err_lines)
+                    return len(err_lines)
+            if os.path.isfile(err_path):
+                os.remove(err_path)
+            return None
+        except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+            return proc_err
+        except self.comp_errs as comp_err:
+            return comp_err
+
+    def write_run(self, entry_list):
+        """
+        Write a sorted run of entries to a temporary file
+        """
+        run_file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        for entry in entry_list:
+            run_file.write(json.dumps(entry) + '\n')
+        run_file.seek(0)
+        return run_file
+
+    def read_run(self, run_file):
+        """
+        Read the entries of a temporary run file
+        """
+        for line in run_file:
+            yield tuple(json.loads(line))
+
+    def sort_runs(self, entry_iter):
+        """
+        Sort entries in memory bounded runs and merge the runs spilled to disk, in passes of bounded fan-in
+        """
+        run_list = []
+        run_files = []
+        try:
+            for entry in entry_iter:
+                run_list.append(entry)
+                if len(run_list) >= self.run_num:
+                    run_list.sort()
+                    run_files.append(self.write_run(run_list))
+                    run_list = []
+            run_list.sort()
+            if not run_files:
+                yield from run_list
+            else:
+                run_files.append(self.write_run(run_list))
+                run_list = []
+                while len(run_files) > self.fan_num:
+                    merge_files = run_files[:self.fan_num]
+                    try:
+                        merge_file = self.write_run(heapq.merge(*[self.read_run(run_file) for run_file in merge_files]))
+                    finally:
+                        for run_file in merge_files:
+                            run_file.close()
+                    del run_files[:self.fan_num]
+                    run_files.append(merge_file)
+                yield from heapq.merge(*[self.read_run(run_file) for run_file in run_files])
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+    def split_entries(self, hash_lines, member_file):
+        """
+        Yield the file entries of a hash table and spool its archive member entries, with their line numbers
+        """
+        for line_num, (file_hash, rel_path) in enumerate(hash_lines):
+            member_info = self.split_member(rel_path)
+            if member_info is not None:
+                member_entry = [os.path.normpath(member_info[0]), member_info[1], line_num, file_hash]
+                member_file.write(json.dumps(member_entry) + '\n')
+            else:
+                yield os.path.normpath(rel_path), line_num, file_hash
+
+    def verif_batch(self, alg, batch_list, err_lines):
+        """
+        Verify a batch of matched walk and table entries
+        """
+        path_dict = {file_path: tuple(file_info) for file_path, file_info, rel_path, old_hash in batch_list}
+        entry_dict = {file_path: (rel_path, old_hash) for file_path, file_info, rel_path, old_hash in batch_list}
+        for file_path, new_hash, file_size, duration in self.hash_files(alg, path_dict, timed=True):
+            rel_path, old_hash = entry_dict[file_path]
+            err_lines.extend(self.verif_res(rel_path, old_hash, new_hash, file_size, duration))
+
+    def verif_archive(self, alg, dir_path, arch_rel, member_hashes, archives=False):
+        """
+        Verify the member entries of an archive that may be missing
+        """
+        arch_path = os.path.abspath(os.path.join(dir_path, arch_rel))
+        if not os.path.isfile(arch_path):
+            return [self.format_err('Not found  ', '!'.join([arch_rel, member_name]), old_hash)
+                    for member_name, old_hash in member_hashes.items()]
+        return self.verif_members(arch_rel, member_hashes, self.hash_archive(alg, arch_path), archives)
+
+    def verif_sorted(self, alg, hash_path, err_lines=None):
+        """
+        Verify the hash table of a directory by merge-joining sorted runs of the walk and the table
+        """
+        if err_lines is None:
+            err_lines = []
+        dir_path = os.path.dirname(hash_path)
+        archives = self.read_header(hash_path).get('Archive Members') == 'yes'
+        skip_dict = dict.fromkeys(self.get_sidecars(hash_path))
+        last_err = None
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as member_file:
+            self.report('Reading', dir_path)
+            walk_iter = self.sort_runs((os.path.relpath(file_path, start=dir_path), file_path, file_info)
+                                       for file_path, file_info in self.iter_dir(dir_path, skip_dict)
+                                       if file_path not in skip_dict)
+            walk_entry = next(walk_iter, None)
+            self.report('Reading', hash_path)
+            hash_iter = self.sort_runs(self.split_entries(self.read_entries(hash_path, alg), member_file))
+            hash_entry = next(hash_iter, None)
+            self.report('Processing', hash_path)
+            batch_list = []
+            last_path = None
+            while (walk_entry is not None) or (hash_entry is not None):
+                if (walk_entry is None) or ((hash_entry is not None) and (hash_entry[0] < walk_entry[0])):
+                    rel_path = hash_entry[0]
+                    file_path = os.path.abspath(os.path.join(dir_path, rel_path))
+                    is_side = (os.path.dirname(file_path) == dir_path) and self.is_sidecar(file_path)
+                    err = None
+                    if rel_path == last_path:
+                        err = 'Duplicated '
+                    elif (file_path in skip_dict) or is_side:
+                        err = 'Not skipped'
+                    elif self.is_limited(file_path, rel_path):
+                        batch_list.append((file_path, (None, 0, None), rel_path, hash_entry[2]))
+                    else:
+                        err = 'Not found  '
+                    if (err is not None) and ((err, rel_path) != last_err):
+                        err_lines.append(self.format_err(err, rel_path, hash_entry[2]))
+                        last_err = (err, rel_path)
+                    last_path = rel_path
+                    hash_entry = next(hash_iter, None)
+                elif (hash_entry is None) or (walk_entry[0] < hash_entry[0]):
+                    err_line = self.format_err('Not listed ', walk_entry[0])
+                    err_lines.append(err_line)
+                    walk_entry = next(walk_iter, None)
+                else:
+                    batch_list.append((walk_entry[1], walk_entry[2], walk_entry[0], hash_entry[2]))
+                    last_path = walk_entry[0]
+                    walk_entry = next(walk_iter, None)
+                    hash_entry = next(hash_iter, None)
+                if len(batch_list) >= self.run_num:
+                    self.verif_batch(alg, batch_list, err_lines)
+                    batch_list = []
+            self.verif_batch(alg, batch_list, err_lines)
+            member_file.seek(0)
+            arch_rel = None
+            member_hashes = {}
+            for member_entry in self.sort_runs(self.read_run(member_file)):
+                if member_entry[0] != arch_rel:
+                    if arch_rel is not None:
+                        err_lines.extend(self.verif_archive(alg, dir_path, arch_rel, member_hashes, archives))
+                    arch_rel = member_entry[0]
+                    member_hashes = {}
+                if member_entry[1] in member_hashes:
+                    err_line = self.format_err('Duplicated ', '!'.join([arch_rel, member_entry[1]]), member_entry[3])
+                    err_lines.append(err_line)
+                    continue
+                member_hashes[member_entry[1]] = member_entry[3]
+            if arch_rel is not None:
+                err_lines.extend(self.verif_archive(alg, dir_path, arch_rel, member_hashes, archives))
+        return err_lines
+
+    def sort_entries(self, hash_path, alg=None):
+        """
+        Read the entries of a hash table sorted by path, keeping the first occurrence of a duplicated path
+        """
+        return self.sort_unique(self.read_entries(hash_path, alg))
+
+    def sort_unique(self, hash_lines):
+        """
+        Sort hash entries by path, keeping the first occurrence of a duplicated path
+        """
+        last_path = None
+        hash_lines = enumerate(hash_lines)
+        for rel_path, line_num, file_hash in self.sort_runs((rel_path, line_num, file_hash)
+                                                            for line_num, (file_hash, rel_path) in hash_lines):
+            if rel_path != last_path:
+                yield rel_path, file_hash
+            last_path = rel_path
+
+    def iter_diff(self, alg, hash_path, other_path):
+        """
+        Diff two hash tables by sort-merge and yield the added, removed, changed, and moved lines
+        """
+        return self.diff_entries(self.sort_entries(hash_path, alg), self.sort_entries(other_path, alg))
+
+    def diff_entries(self, old_iter, new_iter):
+        """
+        Diff two iterators of hash entries sorted by path and yield the added, removed, changed, and moved lines
+        """
+        with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as rem_file, \
+                tempfile.TemporaryFile(mode='w+', encoding='utf-8') as add_file:
+            old_entry = next(old_iter, None)
+            new_entry = next(new_iter, None)
+            while (old_entry is not None) or (new_entry is not None):
+                if (new_entry is None) or ((old_entry is not None) and (old_entry[0] < new_entry[0])):
+                    rem_file.write(json.dumps([old_entry[1], old_entry[0]]) + '\n')
+                    old_entry = next(old_iter, None)
+                elif (old_entry is None) or (new_entry[0] < old_entry[0]):
+                    add_file.write(json.dumps([new_entry[1], new_entry[0]]) + '\n')
+                    new_entry = next(new_iter, None)
+                else:
+                    if old_entry[1] != new_entry[1]:
+                        yield self.format_err('Changed    ', old_entry[0])
+                    old_entry = next(old_iter, None)
+                    new_entry = next(new_iter, None)
+            rem_file.seek(0)
+            add_file.seek(0)
+            rem_iter = self.sort_runs(self.read_run(rem_file))
+            add_iter = self.sort_runs(self.read_run(add_file))
+            rem_entry = next(rem_iter, None)
+            add_entry = next(add_iter, None)
+            while (rem_entry is not None) or (add_entry is not None):
+                if (add_entry is None) or ((rem_entry is not None) and (rem_entry[0] < add_entry[0])):
+                    yield self.format_err('Removed    ', rem_entry[1])
+                    rem_entry = next(rem_iter, None)
+                elif (rem_entry is None) or (add_entry[0] < rem_entry[0]):
+                    yield self.format_err('Added      ', add_entry[1])
+                    add_entry = next(add_iter, None)
+                else:
+                    move_path = ' -> '.join([rem_entry[1], add_entry[1]])
+                    yield self.format_err('Moved      ', move_path)
+                    rem_entry = next(rem_iter, None)
+                    add_entry = next(add_iter, None)
+
+    def diff_hash(self, alg, hash_path, other_path):
+        """
+        Diff two hash tables without rehashing any file
+        """
+        try:
+            self.report('Reading', hash_path)
+            diff_lines = list(self.iter_diff(alg, hash_path, other_path))
+            return diff_lines or None
+        except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+            return proc_err
+        except self.comp_errs as comp_err:
+            return comp_err
+
+    def compare_hash(self, alg, hash_path, other_path):
+        """
+        Compare two hash tables, reading only the entries of the directories whose digests differ, and report the
+        changes like a diff
+        """
+        try:
+            root_hash = self.read_header(hash_path).get('Merkle Root')
+            if (root_hash is not None) and (root_hash == self.read_header(other_path).get('Merkle Root')):
+                return None
+            dir_dict = self.read_dirs(hash_path)
+            other_dict = self.read_dirs(other_path)
+            if not (dir_dict and other_dict):
+                diff_lines = list(self.iter_diff(alg, hash_path, other_path))
+                return diff_lines or None
+            sub_dict = {}
+            for rel_dir in set(dir_dict) | set(other_dict):
+                if rel_dir != '.':
+                    sub_dict.setdefault(os.path.dirname(rel_dir) or '.', []).append(rel_dir)
+            old_lines = []
+            new_lines = []
+            diff_dict = {}
+            dir_list = ['.']
+            while dir_list:
+                rel_dir = dir_list.pop()
+                old_info = dir_dict.get(rel_dir)
+                new_info = other_dict.get(rel_dir)
+                if (old_info is not None) and (new_info is not None) and (old_info[0] == new_info[0]):
+                    continue
+                elif new_info is None:
+                    old_lines.append((old_info[0], rel_dir + '/'))
+                elif old_info is None:
+                    new_lines.append((new_info[0], rel_dir + '/'))
+                else:
+                    diff_dict[rel_dir] = None
+                    dir_list.extend(sub_dict.get(rel_dir, []))
+            old_iter = self.sort_unique(chain(old_lines, self.read_subtrees(alg, hash_path, dir_dict, diff_dict)))
+            new_iter = self.sort_unique(chain(new_lines, self.read_subtrees(alg, other_path, other_dict, diff_dict)))
+            diff_lines = list(self.diff_entries(old_iter, new_iter))
+            return diff_lines or None
+        except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+            return proc_err
+        except self.comp_errs as comp_err:
+            return comp_err
+
+    def read_subtrees(self, alg, hash_path, dir_dict, diff_dict):
+        """
+        Read the entries of some directories of a hash table from their spans, or by filtering the whole table when
+        it is compressed or has no spans
+        """
+        span_list = [dir_dict[rel_dir][1] for rel_dir in sorted(diff_dict)]
+        if (self.split_table(hash_path)[2] is None) and all(span is not None for span in span_list):
+            for span in span_list:
+                yield from self.read_span(hash_path, alg, span)
+        else:
+            for file_hash, rel_path in self.read_entries(hash_path, alg):
+                if self.entry_dir(rel_path) in diff_dict:
+                    yield file_hash, rel_path
+
+    def verif_shards(self, alg, hash_path, err_lines=None):
+        """
+        Verify the sharded hash tables of a manifest in parallel
+        """
+        if err_lines is None:
+            err_lines = []
+        dir_path = os.path.dirname(hash_path)
+        layout = self.read_header(hash_path).get('Shard Layout')
+        skip_dict = {}
+        self.report('Reading', dir_path)
+        path_dict = self.walk_dir(dir_path, skip_dict)
+        for file_path in self.get_sidecars(hash_path):
+            if file_path in path_dict:
+                del path_dict[file_path]
+                skip_dict[file_path] = None
+        shard_dict = self.split_shards(dir_path, path_dict, layout)
+        self.report('Reading', hash_path)
+        task_list = []
+        for shard_hash, shard_name in self.read_table(hash_path, alg):
+            shard_path = os.path.join(dir_path, shard_name)
+            if not os.path.isfile(shard_path):
+                err_line = self.format_err('Not found  ', shard_name, shard_hash)
+                err_lines.append(err_line)
+                continue
+            key = self.read_header(shard_path).get('Shard Key')
+            sub_dict = shard_dict.pop(key, {})
+            if self.calc_hash(alg, shard_path) != shard_hash:
+                err_line = self.format_err('Not match  ', shard_name)
+                err_lines.append(err_line)
+            else:
+                task_list.append((alg, shard_path, dir_path, sub_dict, skip_dict, False, err_lines))
+        for key in shard_dict:
+            for file_path in shard_dict[key]:
+                rel_path = os.path.relpath(file_path, start=dir_path)
+                err_line = self.format_err('Not listed ', rel_path)
+                err_lines.append(err_line)
+        self.report('Processing', hash_path)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.verif_table, *args) for args in task_list]
+            total_num = len(futures)
+            shard_num = 0
+            for future in as_completed(futures):
+                shard_num += 1
+                future.result()
+                self.advance(shard_num, total_num)
+        return err_lines
+
+    def sample_entries(self, entry_dict, state_dict, sample_num, days=None, mode='random', seed=None):
+        """
+        Select the entries to check, overdue first and then weighted by age
+        """
+        now = time.time()
+        rand = random.Random(seed)
+        age_dict = {}
+        for rel_path in entry_dict:
+            age = now - state_dict.get(rel_path, 0.0)
+            age_dict[rel_path] = max(age, 1.0)
+        sel_list = []
+        if days is not None:
+            due_list = [rel_path for rel_path in age_dict if age_dict[rel_path] >= days * 86400]
+            due_list.sort(key=lambda rel_path: -age_dict[rel_path])
+            sel_list = due_list[:sample_num]
+        sel_dict = dict.fromkeys(sel_list)
+        free_num = sample_num - len(sel_list)
+        strata_dict = {}
+        for rel_path in age_dict:
+            if rel_path not in sel_dict:
+                key = '.'
+                if mode == 'stratified':
+                    key = self.shard_key(rel_path, 'dir')
+                if key not in strata_dict:
+                    strata_dict[key] = []
+                strata_dict[key].append(rel_path)
+        rest_num = max(sum(len(rel_list) for rel_list in strata_dict.values()), 1)
+        for key in sorted(strata_dict, key=lambda key: -len(strata_dict[key])):
+            rel_list = strata_dict[key]
+            take_num = math.ceil(free_num * len(rel_list) / rest_num)
+            take_num = min(take_num, len(rel_list), sample_num - len(sel_list))
+            rank_list = sorted(rel_list, key=lambda rel_path: -(rand.random() ** (1 / age_dict[rel_path])))
+            sel_list.extend(rank_list[:take_num])
+        return sel_list
+
+    def sample_hash(self, alg, hash_path, fraction=None, days=None, mode='random', seed=None):
+        """
+        Verify a sample of the hash table of a directory and save the coverage
+        """
+        dir_path = os.path.dirname(hash_path)
+        err_path = '.'.join([hash_path, 'err'])
+        state_path = '.'.join([hash_path, 'state'])
+        try:
+            info_proc = self.fork_info(self.read_header(hash_path))
+            if info_proc.walk_info() != self.walk_info():
+                return info_proc.sample_hash(alg, hash_path, fraction, days, mode, seed)
+            with self.open_spool(hash_path) as err_lines:
+                self.report('Reading', hash_path)
+                entry_dict = {}
+                for file_hash, rel_path in self.read_entries(hash_path, alg):
+                    if rel_path not in entry_dict:
+                        entry_dict[rel_path] = file_hash
+                state_dict = self.read_state(state_path)
+                sample_num = 0
+                if fraction is not None:
+                    sample_num = math.ceil(len(entry_dict) * fraction)
+                if days is not None:
+                    sample_num = max(sample_num, math.ceil(len(entry_dict) / days))
+                sel_list = self.sample_entries(entry_dict, state_dict, sample_num, days, mode, seed)
+                self.report('Processing', hash_path)
+                total_num = len(sel_list)
+                file_num = 0
+                arch_dict = {}
+                path_dict = {}
+                rel_dict = {}
+                for rel_path in sel_list:
+                    file_path = os.path.abspath(os.path.join(dir_path, rel_path))
+                    member_info = self.split_member(rel_path)
+                    if (member_info is not None) and (not os.path.isfile(file_path)):
+                        arch_path = os.path.abspath(os.path.join(dir_path, member_info[0]))
+                        if os.path.isfile(arch_path):
+                            file_num += 1
+                            if arch_path not in arch_dict:
+                                arch_dict[arch_path] = self.hash_archive(alg, arch_path)
+                            member_hashes = {member_info[1]: entry_dict[rel_path]}
+                            err_lines.extend(self.verif_members(member_info[0], member_hashes, arch_dict[arch_path]))
+                            state_dict[rel_path] = time.time()
+                            self.advance(file_num, total_num)
+                            continue
+                    is_link = (self.links == 'record') and os.path.islink(file_path)
+                    if not (os.path.isfile(file_path) or is_link):
+                        file_num += 1
+                        err_line = self.format_err('Not found  ', rel_path, entry_dict[rel_path])
+                        err_lines.append(err_line)
+                        state_dict[rel_path] = time.time()
+                        self.advance(file_num, total_num)
+                        continue
+                    rel_dict[file_path] = rel_path
+                    try:
+                        if is_link:
+                            path_dict[file_path] = (os.lstat(file_path).st_dev, 0, None)
+                        else:
+                            file_stat = os.stat(file_path)
+                            path_dict[file_path] = (file_stat.st_dev, file_stat.st_ino, None)
+                    except OSError:
+                        path_dict[file_path] = None
+                for file_path, new_hash, file_size, duration in self.hash_files(alg, path_dict, timed=True):
+                    file_num += 1
+                    rel_path = rel_dict[file_path]
+                    err_lines.extend(self.verif_res(rel_path, entry_dict[rel_path], new_hash, file_size, duration))
+                    state_dict[rel_path] = time.time()
+                    self.advance(file_num, total_num)
+                state_dict = {rel_path: state_dict[rel_path] for rel_path in entry_dict if rel_path in state_dict}
+                self.write_state(state_path, state_dict)
+                if err_lines:
+                    self.write_err(err_path, err_lines)
+                    return len(err_lines)
+            if os.path.isfile(err_path):
+                os.remove(err_path)
+            return None
+        except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+            return proc_err
+        except self.comp_errs as comp_err:
+            return comp_err
+
+
+class HashFilter(object):
+
+    def __init__(self, rules=(), min_size=None, max_size=None, min_time=None, max_time=None):
+        """
+        Initialize hash filter class
+        """
+        self.rules = [rule.strip() for rule in rules if rule.strip() and not rule.strip().startswith('#')]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_time = min_time
+        self.max_time = max_time
+        self.has_stat = any(limit is not None for limit in (min_size, max_size, min_time, max_time))
+        self._set_matcher()
+
+    def _set_matcher(self):
+        """
+        Setting the single pattern that matches the last applicable rule
+        """
+        self.neg_dict = {}
+        rule_pats = []
+        for rule_num, rule in reversed(list(enumerate(self.rules))):
+            group = 'r{num}'.format(num=rule_num)
+            self.neg_dict[group] = rule.startswith('!')
+            pat = self.compile_rule(rule.lstrip('!'))
+            try:
+                re.compile(pat)
+            except re.error:
+                pat = self.compile_rule(rule.lstrip('!'), literal=True)
+            rule_pats.append('(?P<{group}>{pat})'.format(group=group, pat=pat))
+        self.rule_pat = None
+        if rule_pats:
+            self.rule_pat = re.compile('^(?:{pats})$'.format(pats='|'.join(rule_pats)), re.DOTALL)
+
+    def compile_rule(self, rule, literal=False):
+        """
+        Translate a gitignore style rule into a pattern over relative paths, matching its brackets literally when
+        they do not form valid sets
+        """
+        dir_only = rule.endswith('/')
+        rule = rule.rstrip('/')
+        prefix = '' if '/' in rule else '(?:.*/)?'
+        rule = rule.lstrip('/')
+        if rule.startswith('**/'):
+            prefix = '(?:.*/)?'
+            rule = rule[3:]
+        pat = ''
+        pos = 0
+        while pos < len(rule):
+            char = rule[pos]
+            if rule.startswith('/**/', pos):
+                pat += '/(?:.*/)?'
+                pos += 4
+                continue
+            elif rule.startswith('**', pos):
+                pat += '.*'
+                pos += 2
+                continue
+            elif char == '*':
+                pat += '[^/]*'
+            elif char == '?':
+                pat += '[^/]'
+            elif (char == '[') and (not literal) and (rule.find(']', pos + 2) > pos):
+                end_pos = rule.find(']', pos + 2)
+                char_set = rule[pos + 1:end_pos].replace('\\', '\\\\')
+                if char_set.startswith('!'):
+                    char_set = '^' + char_set[1:]
+                pat += '[' + char_set + ']'
+                pos = end_pos
+            elif (char == '\\') and (pos + 1 < len(rule)):
+                pos += 1
+                pat += re.escape(rule[pos])
+            else:
+                pat += re.escape(char)
+            pos += 1
+        return prefix + pat + ('/' if dir_only else '/?')
+
+    def is_excluded(self, rel_path, is_dir=False, entry=None):
+        """
+        Verify if a file or a directory is excluded by the rules and, for files, by the size and time limits
+        """
+        if self.rule_pat is not None:
+            rel_path = rel_path.replace(os.sep, '/')
+            match = self.rule_pat.match(rel_path + '/' if is_dir else rel_path)
+            if (match is not None) and (not self.neg_dict[match.lastgroup]):
+                return True
+        if is_dir or (not self.has_stat) or (entry is None):
+            return False
+        try:
+            file_stat = entry.stat()
+        except OSError:
+            return False
+        return self.is_outside(file_stat)
+
+    def is_outside(self, file_stat):
+        """
+        Verify if a file is outside the size and time limits
+        """
+        if (self.min_size is not None) and (file_stat.st_size < self.min_size):
+            return True
+        elif (self.max_size is not None) and (file_stat.st_size > self.max_size):
+            return True
+        elif (self.min_time is not None) and (file_stat.st_mtime < self.min_time):
+            return True
+        elif (self.max_time is not None) and (file_stat.st_mtime > self.max_time):
+            return True
+        return False
+
+    def dump(self):
+        """
+        Serialize the rules and limits for a hash table header, escaping the asterisks of hash lines
+        """
+        filter_dict = {'rules': self.rules, 'min_size': self.min_size, 'max_size': self.max_size,
+                       'min_time': self.min_time, 'max_time': self.max_time}
+        filter_data = json.dumps({key: value for key, value in filter_dict.items() if value is not None})
+        return filter_data.replace('*', '\\u002a')
+
+
+class HashSink(object):
+
+    def __init__(self, file, fmt='ndjson'):
+        """
+        Initialize hash sink class
+        """
+        self.own = isinstance(file, str)
+        if self.own:
+            file = open(file, mode='w', encoding='utf-8', newline='', buffering=1)
+        self.file = file
+        self.fmt = fmt
+        self.lock = Lock()
+        self.fields = ['type', 'path', 'expected', 'actual', 'size', 'duration']
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(file, fieldnames=self.fields, lineterminator='\n')
+            self.writer.writeheader()
+
+    def write(self, record):
+        """
+        Write a verdict record as soon as it is produced
+        """
+        with self.lock:
+            if self.fmt == 'csv':
+                self.writer.writerow(record)
+            else:
+                self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        """
+        Close the sink file when the sink opened it
+        """
+        if self.own:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class HashResults(object):
+
+    def __init__(self, res_path, chunk_num=50000):
+        """
+        Initialize hash results class
+        """
+        self.res_file = open(res_path, mode='r', encoding='utf-8')
+        self.res_list = []
+        self.match_list = []
+        self.err_type = 'All'
+        self.prefix = ''
+        self.chunk_num = chunk_num
+
+    def parse_result(self, line):
+        """
+        Parse a line of an error file or of a result report
+        """
+        if line.startswith('{'):
+            record = json.loads(line)
+            return record['type'], record['path']
+        elif line[11:13] == ' *':
+            return line[:11].strip(), line[13:].rstrip('\r\n')
+        return None
+
+    def is_match(self, res):
+        """
+        Verify if a result matches the error type and path prefix filters
+        """
+        return ((self.err_type == 'All') or (res[0] == self.err_type)) and res[1].startswith(self.prefix)
+
+    def load(self):
+        """
+        Load the next chunk of results and return whether more remain
+        """
+        start_num = len(self.res_list)
+        line = ''
+        try:
+            for i in range(self.chunk_num):
+                line = self.res_file.readline()
+                if not line:
+                    break
+                res = self.parse_result(line)
+                if res is not None:
+                    self.res_list.append(res)
+        except ValueError:
+            line = ''
+        for num in range(start_num, len(self.res_list)):
+            if self.is_match(self.res_list[num]):
+                self.match_list.append(num)
+        if not line:
+            self.close()
+        return bool(line)
+
+    def apply_filter(self, err_type, prefix):
+        """
+        Filter the results, narrowing the last matches when the filter only gets narrower
+        """
+        if (err_type == self.err_type) and prefix.startswith(self.prefix):
+            num_list = self.match_list
+        else:
+            num_list = range(len(self.res_list))
+        self.err_type = err_type
+        self.prefix = prefix
+        self.match_list = [num for num in num_list if self.is_match(self.res_list[num])]
+        return self.match_list
+
+    def close(self):
+        """
+        Close the result file
+        """
+        self.res_file.close()
+
+
+class HashSpool(object):
+
+    def __init__(self, spool_prefix=None):
+        """
+        Initialize hash spool class
+        """
+        self.spool_prefix = spool_prefix
+        self.file = None
+        self.lock = Lock()
+        self.err_num = 0
+
+    def __enter__(self):
+        """
+        Enter the spool context
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Exit the spool context and close the spool file
+        """
+        self.close()
+
+    def __len__(self):
+        """
+        Count the spooled error lines
+        """
+        return self.err_num
+
+    def __iter__(self):
+        """
+        Read back the spooled error lines
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.flush()
+            self.file.seek(0)
+        yield from self.file
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+
+    def append(self, err_line):
+        """
+        Append an error line to the spool file as soon as it is found
+        """
+        with self.lock:
+            if self.file is None:
+                self.file = tempfile.TemporaryFile(mode='w+', encoding='utf-8', prefix=self.spool_prefix)
+            self.file.write(err_line)
+            self.err_num += 1
+
+    def extend(self, err_lines):
+        """
+        Append error lines to the spool file
+        """
+        for err_line in err_lines:
+            self.append(err_line)
+
+    def close(self):
+        """
+        Close the spool file, which is removed by the system
+        """
+        if self.file is not None:
+            self.file.close()
+
+
+class HashMetrics(object):
+
+    def __init__(self, buckets=None):
+        """
+        Initialize hash metrics class
+        """
+        if buckets is None:
+            buckets = [0.001, 0.01, 0.1, 1.0, 10.0, 60.0, 600.0]
+        self.buckets = buckets
+        self.lock = Lock()
+        self.start_time = time.time()
+        self.byte_dict = {}
+        self.file_dict = {}
+        self.time_dict = {}
+        self.err_dict = dict.fromkeys(['Permission', 'Not match', 'Not found', 'Not listed', 'Duplicated',
+                                       'Not skipped', 'Stalled', 'Unknown'], 0)
+        self.bucket_list = [0] * len(buckets)
+        self.lat_num = 0
+        self.lat_sum = 0.0
+        self.depth = 0
+        self.thread = None
+        self.server = None
+        self.stop_event = Event()
+
+    def observe(self, alg, file_size, duration):
+        """
+        Record a hashed file with its size and latency
+        """
+        with self.lock:
+            self.byte_dict[alg] = self.byte_dict.get(alg, 0) + (file_size or 0)
+            self.file_dict[alg] = self.file_dict.get(alg, 0) + 1
+            self.time_dict[alg] = self.time_dict.get(alg, 0.0) + duration
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    self.bucket_list[i] += 1
+            self.lat_num += 1
+            self.lat_sum += duration
+
+    def count(self, err):
+        """
+        Record a verdict by its error type
+        """
+        if err != 'OK':
+            with self.lock:
+                self.err_dict[err] = self.err_dict.get(err, 0) + 1
+
+    def queue(self, depth):
+        """
+        Record the number of files waiting to be hashed
+        """
+        self.depth = depth
+
+    def render(self):
+        """
+        Render the metrics in Prometheus text format
+        """
+        with self.lock:
+            elapsed = max(time.time() - self.start_time, 1e-9)
+            lines = ['# HELP pychecksum_bytes_hashed_total Bytes hashed by algorithm.',
+                     '# TYPE pychecksum_bytes_hashed_total counter']
+            for alg in sorted(self.byte_dict):
+                line = 'pychecksum_bytes_hashed_total{{alg="{alg}"}} {num}'
+                lines.append(line.format(alg=alg, num=self.byte_dict[alg]))
+            lines += ['# HELP pychecksum_files_hashed_total Files hashed by algorithm.',
+                      '# TYPE pychecksum_files_hashed_total counter']
+            for alg in sorted(self.file_dict):
+                line = 'pychecksum_files_hashed_total{{alg="{alg}"}} {num}'
+                lines.append(line.format(alg=alg, num=self.file_dict[alg]))
+            lines += ['# HELP pychecksum_files_per_second Files hashed per second since start.',
+                      '# TYPE pychecksum_files_per_second gauge',
+                      'pychecksum_files_per_second {num:.3f}'.format(num=sum(self.file_dict.values()) / elapsed)]
+            lines += ['# HELP pychecksum_throughput_bytes_per_second Bytes hashed per second of hashing time.',
+                      '# TYPE pychecksum_throughput_bytes_per_second gauge']
+            for alg in sorted(self.time_dict):
+                rate = self.byte_dict[alg] / max(self.time_dict[alg], 1e-9)
+                line = 'pychecksum_throughput_bytes_per_second{{alg="{alg}"}} {num:.0f}'
+                lines.append(line.format(alg=alg, num=rate))
+            lines += ['# HELP pychecksum_queue_depth Files waiting to be hashed.',
+                      '# TYPE pychecksum_queue_depth gauge',
+                      'pychecksum_queue_depth {num}'.format(num=self.depth)]
+            lines += ['# HELP pychecksum_errors_total Verdicts by error type.',
+                      '# TYPE pychecksum_errors_total counter']
+            for err in self.err_dict:
+                lines.append('pychecksum_errors_total{{type="{err}"}} {num}'.format(err=err, num=self.err_dict[err]))
+            lines += ['# HELP pychecksum_file_seconds Per-file hashing latency.',
+                      '# TYPE pychecksum_file_seconds histogram']
+            for bound, num in zip(self.buckets, self.bucket_list):
+                lines.append('pychecksum_file_seconds_bucket{{le="{le}"}} {num}'.format(le=bound, num=num))
+            lines.append('pychecksum_file_seconds_bucket{{le="+Inf"}} {num}'.format(num=self.lat_num))
+            lines.append('pychecksum_file_seconds_sum {num:.6f}'.format(num=self.lat_sum))
+            lines.append('pychecksum_file_seconds_count {num}'.format(num=self.lat_num))
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self, file_path):
+        """
+        Replace a Prometheus textfile with the current metrics
+        """
+        temp_path = '.'.join([file_path, 'tmp'])
+        with open(temp_path, mode='w', encoding='utf-8') as metric_file:
+            metric_file.write(self.render())
+        os.replace(temp_path, file_path)
+
+    def export_loop(self, file_path, interval):
+        """
+        Rewrite a Prometheus textfile until the exporters are stopped
+        """
+        while not self.stop_event.wait(interval):
+            self.write_file(file_path)
+        self.write_file(file_path)
+
+    def export_file(self, file_path, interval=15.0):
+        """
+        Rewrite a Prometheus textfile periodically in a background thread
+        """
+        self.thread = Thread(target=self.export_loop, args=(file_path, interval), daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def serve(self, port, host='localhost'):
+        """
+        Serve the metrics over HTTP in a background thread
+        """
+        self.server = ThreadingHTTPServer((host, port), MetricHandler)
+        self.server.metrics = self
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def stop(self):
+        """
+        Stop the exporters, writing the textfile a last time
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class MetricHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        """
+        Answer a scrape with the current metrics
+        """
+        data = self.server.metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        """
+        Keep scrapes out of the standard error
+        """
+        pass
+
+
+class HashQueue(object):
+
+    def __init__(self, hash_proc=None, jobs=None, queue_path=None, notify=None, progress=None):
+        """
+        Initialize hash queue class
+        """
+        if hash_proc is None:
+            hash_proc = HashProc()
+        if jobs is None:
+            jobs = 2
+        if queue_path is None:
+            queue_path = os.path.join(os.path.expanduser('~'), '.pychecksum_queue.json')
+        self.hash_proc = hash_proc.fork(hash_proc.notify, hash_proc.progress)
+        if self.hash_proc.budget is None:
+            self.hash_proc.budget = BoundedSemaphore(self.hash_proc.workers)
+        self.jobs = jobs
+        self.queue_path = queue_path
+        self.notify = notify
+        self.progress = progress
+        self.lock = Lock()
+        self.run_lock = Lock()
+        self.job_list = []
+        self.prog_dict = {}
+        self.thread = None
+        self.load()
+
+    def load(self):
+        """
+        Load the saved jobs, resuming the interrupted ones
+        """
+        if os.path.isfile(self.queue_path):
+            try:
+                with open(self.queue_path, mode='r', encoding='utf-8') as queue_file:
+                    self.job_list = json.load(queue_file)
+            except (OSError, ValueError):
+                self.job_list = []
+        for job in self.job_list:
+            if job['state'] == 'running':
+                job['state'] = 'pending'
+
+    def save(self):
+        """
+        Save the jobs so that the queue survives a restart
+        """
+        with self.lock:
+            temp_path = '.'.join([self.queue_path, 'tmp'])
+            with open(temp_path, mode='w', encoding='utf-8') as queue_file:
+                json.dump(self.job_list, queue_file, indent=1)
+            os.replace(temp_path, self.queue_path)
+
+    def add(self, opt_num, alg, path):
+        """
+        Add a generation (2) or verification (3) job to the queue
+        """
+        with self.lock:
+            job_num = max([job['num'] for job in self.job_list] + [0]) + 1
+            job = {'num': job_num, 'opt_num': opt_num, 'alg': alg, 'path': os.path.abspath(path),
+                   'state': 'pending', 'errors': None}
+            self.job_list.append(job)
+        self.save()
+        return job
+
+    def clear(self):
+        """
+        Remove the finished jobs from the queue
+        """
+        with self.lock:
+            self.job_list = [job for job in self.job_list if job['state'] in ('pending', 'running')]
+        self.save()
+
+    def set_state(self, job, state, errors=None):
+        """
+        Change the state of a job and report it
+        """
+        with self.lock:
+            job['state'] = state
+            job['errors'] = errors
+        self.save()
+        if self.notify is not None:
+            self.notify(job)
+
+    def update_progress(self, job, num, total_num):
+        """
+        Report the aggregated progress of the running batch
+        """
+        with self.lock:
+            self.prog_dict[job['num']] = num / max(total_num, 1)
+            prog_num = sum(self.prog_dict.values())
+            prog_total = len(self.prog_dict)
+        if self.progress is not None:
+            self.progress(prog_num, prog_total)
+
+    def run_job(self, job):
+        """
+        Generate or verify the hash table of a job
+        """
+        job_proc = self.hash_proc.fork(progress=lambda num, total_num: self.update_progress(job, num, total_num))
+        self.set_state(job, 'running')
+        try:
+            if job['opt_num'] == 2:
+                job_res = job_proc.gen_hash(job['alg'], job['path'])
+            else:
+                job_res = job_proc.verif_hash(job['alg'], job['path'])
+        except OSError as os_err:
+            job_res = os_err
+        self.update_progress(job, 1, 1)
+        if isinstance(job_res, Exception):
+            self.set_state(job, 'failed', str(job_res))
+        elif isinstance(job_res, int):
+            self.set_state(job, 'done', job_res)
+        else:
+            self.set_state(job, 'done', 0)
+        return job
+
+    def job_dir(self, job):
+        """
+        Get the directory that a job reads and writes
+        """
+        if job['opt_num'] == 2:
+            return job['path']
+        return os.path.dirname(job['path'])
+
+    def run_chain(self, job_list):
+        """
+        Run the jobs of a directory one after the other, in queue order
+        """
+        for job in job_list:
+            self.run_job(job)
+
+    def run(self):
+        """
+        Run the pending jobs under one concurrency budget, one run at a time, in order for each directory
+        """
+        with self.run_lock:
+            with self.lock:
+                run_list = [job for job in self.job_list if job['state'] == 'pending']
+                self.prog_dict = dict.fromkeys([job['num'] for job in run_list], 0.0)
+            chain_dict = {}
+            for job in run_list:
+                chain_dict.setdefault(self.job_dir(job), []).append(job)
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                list(executor.map(self.run_chain, chain_dict.values()))
+            return run_list
+
+    def start(self):
+        """
+        Run the pending jobs in a background thread, unless a run is in progress
+        """
+        if (self.thread is not None) and self.thread.is_alive():
+            return self.thread
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+
+class HashWatcher(object):
+
+    def __init__(self, alg, dir_path, hash_proc=None, comp=None, interval=5.0, delay=2.0, poll=False):
+        """
+        Initialize hash watcher class
+        """
+        if hash_proc is None:
+            hash_proc = HashProc()
+        self.alg = alg
+        self.dir_path = os.path.abspath(dir_path)
+        self.hash_proc = hash_proc
+        self.hash_path = hash_proc.get_table(alg, self.dir_path, comp)
+        self.interval = interval
+        self.delay = delay
+        self.hash_dict = {}
+        self.member_dict = {}
+        self.stat_dict = {}
+        self.dir_dict = {}
+        self.pend_dict = {}
+        self.wd_dict = {}
+        self.sweep_num = 12
+        self.poll_num = 0
+        self.write_time = 0.0
+        self.dirty = False
+        self.archives = False
+        self.merkle = False
+        self.dial = None
+        self.stop_event = Event()
+        self.fd = None
+        self._set_masks()
+        if not poll:
+            self._init_inotify()
+
+    def _set_masks(self):
+        """
+        Setting inotify event masks
+        """
+        self.file_mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_CREATE
+        self.gone_mask = IN_MOVED_FROM | IN_DELETE
+        self.move_mask = IN_MOVED_TO
+        self.dir_mask = IN_ISDIR
+        self.over_mask = IN_Q_OVERFLOW
+        self.self_mask = IN_DELETE_SELF | IN_IGNORED
+        self.watch_mask = self.file_mask | self.gone_mask | self.move_mask | IN_DELETE_SELF
+
+    def _init_inotify(self):
+        """
+        Initialize inotify when the platform supports it
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+        except (OSError, AttributeError, TypeError):
+            return
+        if fd >= 0:
+            self.libc = libc
+            self.fd = fd
+
+    def add_watch(self, dir_path):
+        """
+        Add inotify watches to a directory and its subdirectories
+        """
+        if self.is_pruned(dir_path):
+            return
+        for path, dirs, files in os.walk(dir_path):
+            dirs[:] = [name for name in dirs if not self.is_pruned(os.path.join(path, name))]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.watch_mask)
+            if wd >= 0:
+                self.wd_dict[wd] = path
+
+    def remove_watch(self, dir_path):
+        """
+        Remove the inotify watches of a directory moved away and of its subdirectories
+        """
+        sub_path = os.path.join(dir_path, '')
+        for wd, path in list(self.wd_dict.items()):
+            if (path == dir_path) or path.startswith(sub_path):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.wd_dict[wd]
+
+    def is_pruned(self, path):
+        """
+        Verify if the path filter excludes a directory or one of its parents
+        """
+        path_filter = self.hash_proc.path_filter
+        if path_filter is None:
+            return False
+        rel_dir = os.path.relpath(path, start=self.dir_path)
+        while rel_dir and (rel_dir != '.'):
+            if path_filter.is_excluded(rel_dir, True):
+                return True
+            rel_dir = os.path.dirname(rel_dir)
+        return False
+
+    def is_tracked(self, file_path):
+        """
+        Verify if a file belongs to the hash table
+        """
+        base_path = os.path.dirname(file_path)
+        if (base_path == self.dir_path) and self.hash_proc.is_sidecar(file_path):
+            return False
+        path_filter = self.hash_proc.path_filter
+        if path_filter is None:
+            return True
+        rel_path = os.path.relpath(file_path, start=self.dir_path)
+        if self.is_pruned(base_path) or path_filter.is_excluded(rel_path):
+            return False
+        if path_filter.has_stat and (file_path not in self.hash_dict):
+            try:
+                return not path_filter.is_outside(os.stat(file_path))
+            except OSError:
+                return True
+        return True
+
+    def stat_file(self, file_path):
+        """
+        Get the size and modification time of a file
+        """
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    def stat_dirs(self):
+        """
+        Get the modification times of the watched directories
+        """
+        dir_dict = {}
+        for path, dirs, files in os.walk(self.dir_path, followlinks=(self.hash_proc.links == 'follow')):
+            dirs[:] = [name for name in dirs if not self.is_pruned(os.path.join(path, name))]
+            try:
+                dir_dict[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+        return dir_dict
+
+    def snapshot(self, dir_paths=None):
+        """
+        Take a stat snapshot of the directory, or only of the files directly inside some of its directories
+        """
+        stat_dict = {}
+        if dir_paths is None:
+            path_iter = self.hash_proc.iter_dir(self.dir_path)
+            hash_paths = self.hash_dict
+        else:
+            path_iter = (path_info for dir_path in dir_paths
+                         for path_info in self.hash_proc.iter_dir(self.dir_path, sub_path=dir_path, top_only=True))
+            hash_paths = [file_path for file_path in self.hash_dict if os.path.dirname(file_path) in dir_paths]
+        for file_path, file_info in path_iter:
+            file_stat = self.stat_file(file_path)
+            if file_stat is not None:
+                stat_dict[file_path] = file_stat
+        for file_path in hash_paths:
+            rel_path = os.path.relpath(file_path, start=self.dir_path)
+            if (file_path not in stat_dict) and self.hash_proc.is_limited(file_path, rel_path):
+                file_stat = self.stat_file(file_path)
+                if file_stat is not None:
+                    stat_dict[file_path] = file_stat
+        return stat_dict
+
+    def load(self):
+        """
+        Load the hash table with its header settings and queue files changed since it was written
+        """
+        table_time = 0
+        if os.path.isfile(self.hash_path):
+            table_time = os.stat(self.hash_path).st_mtime_ns
+            info_dict = self.hash_proc.read_header(self.hash_path)
+            if (info_dict.get('Title') == 'Hash Manifest') or ('Shard Key' in info_dict):
+                return ValueError('Sharded hash tables cannot be watched: {path}'.format(path=self.hash_path))
+            self.hash_proc = self.hash_proc.fork_info(info_dict)
+            self.archives = info_dict.get('Archive Members') == 'yes'
+            self.merkle = 'Merkle Root' in info_dict
+            self.dial = None if 'Title' in info_dict else self.detect_dial()
+            for file_hash, rel_path in self.hash_proc.read_table(self.hash_path, self.alg):
+                member_info = self.hash_proc.split_member(rel_path)
+                if member_info is not None:
+                    arch_path = os.path.abspath(os.path.join(self.dir_path, member_info[0]))
+                    self.member_dict.setdefault(arch_path, {})[member_info[1]] = file_hash
+                    continue
+                file_path = os.path.abspath(os.path.join(self.dir_path, rel_path))
+                self.hash_dict[file_path] = file_hash
+        if self.fd is not None:
+            self.add_watch(self.dir_path)
+        else:
+            self.dir_dict = self.stat_dirs()
+        self.stat_dict = self.snapshot()
+        for file_path in self.hash_dict:
+            if file_path not in self.stat_dict:
+                self.pend_dict[file_path] = 0.0
+        for file_path, file_stat in self.stat_dict.items():
+            if (file_path not in self.hash_dict) or (file_stat[1] > table_time):
+                self.pend_dict[file_path] = 0.0
+        return None
+
+    def detect_dial(self):
+        """
+        Detect the dialect of a hash table without a header from its first hash line
+        """
+        with self.hash_proc.open_table(self.hash_path, mode='r') as hash_file:
+            for line in hash_file:
+                if self.hash_proc.bsd_pat.match(line.rstrip('\r\n')):
+                    return 'bsd'
+                elif self.hash_proc.parse_line(line) is not None:
+                    return 'gnu'
+        return 'gnu'
+
+    def poll(self, full=False):
+        """
+        Compare a new stat snapshot of the directories whose entries changed with the last one, sweeping the whole
+        tree every few polls to catch files rewritten in place
+        """
+        dir_dict = self.stat_dirs()
+        self.poll_num += 1
+        if full or (self.poll_num % self.sweep_num == 0):
+            stat_dict = self.snapshot()
+        else:
+            dir_paths = {dir_path for dir_path in dir_dict if self.dir_dict.get(dir_path) != dir_dict[dir_path]}
+            dir_paths.update(dir_path for dir_path in self.dir_dict if dir_path not in dir_dict)
+            stat_dict = {file_path: file_stat for file_path, file_stat in self.stat_dict.items()
+                         if os.path.dirname(file_path) not in dir_paths}
+            stat_dict.update(self.snapshot(dir_paths))
+        self.dir_dict = dir_dict
+        now = time.time()
+        for file_path, file_stat in stat_dict.items():
+            if self.stat_dict.get(file_path) != file_stat:
+                self.pend_dict[file_path] = now
+        for file_path in self.stat_dict:
+            if file_path not in stat_dict:
+                self.pend_dict[file_path] = now
+        self.stat_dict = stat_dict
+
+    def read_events(self, timeout):
+        """
+        Read inotify events and queue the changed files
+        """
+        ready = select.select([self.fd], [], [], timeout)[0]
+        if not ready:
+            return
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        now = time.time()
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, name_len = struct.unpack_from('iIII', data, pos)
+            name = data[pos + 16:pos + 16 + name_len].rstrip(b'\0')
+            pos += 16 + name_len
+            if mask & self.over_mask:
+                self.poll(True)
+                continue
+            if wd not in self.wd_dict:
+                continue
+            elif mask & self.self_mask:
+                if mask & IN_IGNORED:
+                    del self.wd_dict[wd]
+                continue
+            path = os.path.join(self.wd_dict[wd], os.fsdecode(name))
+            if mask & self.dir_mask:
+                if mask & (self.move_mask | IN_CREATE):
+                    self.add_watch(path)
+                    for file_path in self.hash_proc.walk_dir(self.dir_path, sub_path=path):
+                        self.pend_dict[file_path] = now
+                elif mask & self.gone_mask:
+                    if mask & IN_MOVED_FROM:
+                        self.remove_watch(path)
+                    sub_path = os.path.join(path, '')
+                    for file_path in list(self.hash_dict):
+                        if file_path.startswith(sub_path):
+                            self.pend_dict[file_path] = now
+            elif name:
+                self.pend_dict[path] = now
+
+    def flush(self, force=False):
+        """
+        Rehash the settled files and rewrite the hash table, at most once per interval unless forced
+        """
+        now = time.time()
+        path_list = [file_path for file_path, event_time in self.pend_dict.items()
+                     if (now - event_time) >= self.delay]
+        changed = False
+        for file_path in path_list:
+            del self.pend_dict[file_path]
+            if not self.is_tracked(file_path):
+                continue
+            file_stat = self.stat_file(file_path)
+            if (file_stat is None) or (not os.path.isfile(file_path)):
+                self.member_dict.pop(file_path, None)
+                if self.hash_dict.pop(file_path, None) is not None:
+                    changed = True
+                continue
+            try:
+                file_hash = self.hash_proc.calc_hash(self.alg, file_path)
+            except OSError:
+                continue
+            if type(file_hash) == str:
+                self.stat_dict[file_path] = file_stat
+                if self.hash_dict.get(file_path) != file_hash:
+                    self.hash_dict[file_path] = file_hash
+                    changed = True
+                if self.archives and self.hash_proc.is_archive(file_path):
+                    member_list = self.hash_proc.hash_archive(self.alg, file_path)
+                    if isinstance(member_list, Exception):
+                        continue
+                    elif self.member_dict.get(file_path) != dict(member_list):
+                        self.member_dict[file_path] = dict(member_list)
+                        changed = True
+        self.dirty = self.dirty or changed
+        if not os.path.isfile(self.hash_path):
+            self.write_table()
+        elif self.dirty and (force or ((now - self.write_time) >= self.interval)):
+            self.write_table()
+
+    def write_table(self):
+        """
+        Replace the hash table with the current hashes
+        """
+        base_path, alg, comp = self.hash_proc.split_table(self.hash_path)
+        temp_path = '.'.join([base_path, 'tmp', alg])
+        if comp is not None:
+            temp_path = '.'.join([temp_path, comp])
+        hash_lines = []
+        for file_path in sorted(self.hash_dict):
+            rel_path = os.path.relpath(file_path, start=self.dir_path)
+            hash_lines.append(self.hash_proc.format_line(self.alg, self.hash_dict[file_path], rel_path, self.dial))
+            for member_name, member_hash in self.member_dict.get(file_path, {}).items():
+                member_path = '!'.join([rel_path, member_name])
+                hash_lines.append(self.hash_proc.format_line(self.alg, member_hash, member_path, self.dial))
+        info_lines = []
+        dir_dict = None
+        if self.archives:
+            info_lines.append(('Archive Members', 'yes'))
+        info_lines.extend(self.hash_proc.walk_info())
+        if self.merkle and hash_lines:
+            dir_dict = self.hash_proc.merkle_dirs(self.alg, hash_lines)
+            info_lines.append(('Merkle Root', dir_dict['.']))
+        self.hash_proc.write_table(temp_path, self.alg, hash_lines, self.dial, info_lines, dir_dict)
+        os.replace(temp_path, self.hash_path)
+        self.write_time = time.time()
+        self.dirty = False
+
+    def run(self):
+        """
+        Keep the hash table up to date until the watcher is stopped
+        """
+        load_err = self.load()
+        if load_err is not None:
+            return load_err
+        self.flush()
+        try:
+            while not self.stop_event.is_set():
+                if self.fd is not None:
+                    self.read_events(min(self.interval, self.delay))
+                else:
+                    self.stop_event.wait(self.interval)
+                    self.poll()
+                self.flush()
+        finally:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+            if self.dirty:
+                self.write_table()
+
+    def start(self):
+        """
+        Run the watcher in a background thread
+        """
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """
+        Stop the watcher
+        """
+        self.stop_event.set()
+
+
+class HashCoord(object):
+
+    def __init__(self, hash_proc=None, address=None, authkey=None, attempts=3):
+        """
+        Initialize hash coordinator class
+        """
+        if hash_proc is None:
+            hash_proc = HashProc()
+        if address is None:
+            address = ('localhost', 0)
+        if authkey is None:
+            authkey = os.urandom(16)
+        self.hash_proc = hash_proc
+        self.address = address
+        self.authkey = authkey
+        self.attempts = attempts
+        self.lock = Lock()
+        self.done = Event()
+
+    def split_job(self, alg, hash_path, links=None):
+        """
+        Split the entries of a hash table into units by top directory
+        """
+        dir_path = os.path.dirname(hash_path)
+        unit_dict = {'.': []}
+        for entry in os.scandir(dir_path):
+            if entry.is_dir(follow_symlinks=(links == 'follow')):
+                unit_dict[entry.name] = []
+        for file_hash, rel_path in self.hash_proc.read_entries(hash_path, alg):
+            member_info = self.hash_proc.split_member(rel_path)
+            unit_path = rel_path if member_info is None else member_info[0]
+            key = self.hash_proc.shard_key(unit_path, 'dir')
+            if key not in unit_dict:
+                unit_dict[key] = []
+            unit_dict[key].append((file_hash, rel_path))
+        return unit_dict
+
+    def next_unit(self, keys=None):
+        """
+        Take the next pending unit that a worker can serve
+        """
+        with self.lock:
+            for key in self.pend_list:
+                if (keys is None) or (key in keys):
+                    self.pend_list.remove(key)
+                    self.run_dict[key] = None
+                    return key
+            if self.pend_list or self.run_dict:
+                return ''
+            return None
+
+    def finish_unit(self, key, err_lines):
+        """
+        Record the error lines of a unit and report the progress
+        """
+        with self.lock:
+            self.run_dict.pop(key, None)
+            if key in self.res_dict:
+                return
+            self.res_dict[key] = err_lines
+            res_num = len(self.res_dict)
+            if res_num == len(self.unit_dict):
+                self.done.set()
+        self.hash_proc.advance(res_num, len(self.unit_dict))
+
+    def retry_unit(self, key):
+        """
+        Put a unit back in the queue, or fail its entries after the last attempt
+        """
+        with self.lock:
+            self.run_dict.pop(key, None)
+            self.try_dict[key] = self.try_dict.get(key, 0) + 1
+            if self.try_dict[key] < self.attempts:
+                self.pend_list.append(key)
+                return
+        self.fail_unit(key)
+
+    def fail_unit(self, key):
+        """
+        Report the entries of a unit that could not be verified
+        """
+        rel_paths = [rel_path for file_hash, rel_path in self.unit_dict[key]] or [key]
+        self.finish_unit(key, [self.hash_proc.format_err('Unknown    ', rel_path) for rel_path in rel_paths])
+
+    def fail_pending(self):
+        """
+        Fail the units left once every worker process has exited
+        """
+        with self.lock:
+            key_list = self.pend_list + list(self.run_dict)
+            self.pend_list = []
+        for key in key_list:
+            self.fail_unit(key)
+
+    def serve_worker(self, conn):
+        """
+        Send units to a worker and collect its results
+        """
+        key = None
+        try:
+            while True:
+                msg = conn.recv()
+                if msg[0] == 'ready':
+                    key = self.next_unit(msg[1])
+                    if key is None:
+                        conn.send(('done',))
+                        break
+                    elif not key:
+                        conn.send(('wait', 0.5))
+                    else:
+                        conn.send(('unit', self.alg, key, self.unit_dict[key], self.skip_names, self.info_dict,
+                                   self.hash_proc.timeout_dict))
+                elif msg[0] == 'result':
+                    self.finish_unit(msg[1], msg[2])
+                    key = None
+                elif msg[0] == 'error':
+                    self.retry_unit(msg[1])
+                    key = None
+        except (EOFError, OSError):
+            if key:
+                self.retry_unit(key)
+        finally:
+            conn.close()
+
+    def accept_workers(self, listener):
+        """
+        Accept worker connections until the listener is closed
+        """
+        while not self.done.is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, multiprocessing.AuthenticationError):
+                if self.done.is_set():
+                    break
+                continue
+            if self.done.is_set():
+                conn.close()
+                break
+            Thread(target=self.serve_worker, args=(conn,), daemon=True).start()
+
+    def split_budget(self, workers):
+        """
+        Split the thread and per-device read budgets of the coordinator between its local worker processes
+        """
+        dev_workers = {dev: max(1, int(num / workers)) for dev, num in self.hash_proc.dev_workers.items()}
+        return max(1, int(self.hash_proc.workers / workers)), dev_workers
+
+    def verif_hash(self, alg, hash_path, workers=None):
+        """
+        Verify the hash table of a directory with worker processes
+        """
+        if workers is None:
+            workers = self.hash_proc.workers
+        dir_path = os.path.dirname(hash_path)
+        err_path = '.'.join([hash_path, 'err'])
+        try:
+            self.hash_proc.report('Reading', hash_path)
+            self.info_dict = self.hash_proc.read_header(hash_path)
+            self.unit_dict = self.split_job(alg, hash_path, self.info_dict.get('Symlinks'))
+        except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+            return proc_err
+        except self.hash_proc.comp_errs as comp_err:
+            return comp_err
+        self.alg = alg
+        self.skip_names = [os.path.basename(path) for path in self.hash_proc.get_sidecars(hash_path)]
+        self.pend_list = sorted(self.unit_dict, key=lambda key: -len(self.unit_dict[key]))
+        self.run_dict = {}
+        self.res_dict = {}
+        self.try_dict = {}
+        self.done.clear()
+        self.hash_proc.report('Processing', hash_path)
+        listener = Listener(self.address, authkey=self.authkey)
+        self.address = listener.address
+        Thread(target=self.accept_workers, args=(listener,), daemon=True).start()
+        proc_list = []
+        thread_num, dev_workers = self.split_budget(workers)
+        for i in range(workers):
+            worker = HashWorker(self.address, self.authkey, dir_path, None, thread_num, dev_workers)
+            proc = multiprocessing.Process(target=worker.run, daemon=True)
+            proc.start()
+            proc_list.append(proc)
+        while not self.done.wait(timeout=self.hash_proc.timeout_dict['interval']):
+            if proc_list and not any(proc.is_alive() for proc in proc_list):
+                self.fail_pending()
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError):
+            pass
+        listener.close()
+        for proc in proc_list:
+            proc.join()
+        err_lines = []
+        for key in sorted(self.res_dict):
+            err_lines.extend(self.res_dict[key])
+        if err_lines:
+            self.hash_proc.write_err(err_path, err_lines)
+            return len(err_lines)
+        else:
+            if os.path.isfile(err_path):
+                os.remove(err_path)
+            return None
+
+
+class HashWorker(object):
+
+    def __init__(self, address, authkey, root_path, keys=None, workers=None, dev_workers=None):
+        """
+        Initialize hash worker class
+        """
+        self.address = address
+        self.authkey = authkey
+        self.root_path = os.path.abspath(root_path)
+        self.keys = keys
+        self.workers = workers
+        self.dev_workers = dev_workers
+
+    def proc_unit(self, alg, key, hash_lines, skip_names, info_dict=None, timeouts=None):
+        """
+        Verify the entries of a unit against its part of the directory
+        """
+        if info_dict is None:
+            info_dict = {}
+        hash_proc = HashProc(workers=self.workers, dev_workers=self.dev_workers, timeouts=timeouts).fork_info(info_dict)
+        archives = info_dict.get('Archive Members') == 'yes'
+        skip_dict = {}
+        path_dict = hash_proc.walk_shard(self.root_path, 'dir', key, skip_dict)
+        for skip_name in skip_names:
+            file_path = os.path.join(self.root_path, skip_name)
+            if file_path in path_dict:
+                del path_dict[file_path]
+                skip_dict[file_path] = None
+        return hash_proc.verif_entries(alg, hash_lines, self.root_path, path_dict, skip_dict, archives=archives)
+
+    def run(self):
+        """
+        Process units from the coordinator until there are no more
+        """
+        conn = Client(self.address, authkey=self.authkey)
+        try:
+            while True:
+                conn.send(('ready', self.keys))
+                msg = conn.recv()
+                if msg[0] == 'done':
+                    break
+                elif msg[0] == 'wait':
+                    time.sleep(msg[1])
+                else:
+                    alg, key, hash_lines, skip_names, info_dict, timeouts = msg[1:]
+                    try:
+                        err_lines = self.proc_unit(alg, key, hash_lines, skip_names, info_dict, timeouts)
+                    except Exception:
+                        conn.send(('error', key))
+                        continue
+                    conn.send(('result', key, err_lines))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+class HashDaemon(object):
+
+    def __init__(self, hash_proc=None, address=None, authkey=None, workers=None, cache_num=None):
+        """
+        Initialize hash daemon class
+        """
+        if hash_proc is None:
+            hash_proc = HashProc()
+        if address is None:
+            address = self.get_address()
+        if authkey is None:
+            authkey = self.get_authkey()
+        if workers is None:
+            workers = hash_proc.workers
+        if cache_num is None:
+            cache_num = 2**16
+        self.hash_proc = hash_proc.fork(hash_proc.notify, hash_proc.progress)
+        self.hash_proc.cache = self
+        self.verif_proc = hash_proc.fork(hash_proc.notify, hash_proc.progress)
+        self.verif_proc.cache = None
+        self.address = address
+        self.authkey = authkey
+        self.workers = workers
+        self.cache_num = cache_num
+        self.cache_dict = {}
+        self.lock = Lock()
+        self.done = Event()
+
+    @staticmethod
+    def get_address():
+        """
+        Get the default local address of the daemon
+        """
+        if os.name == 'nt':
+            return ('localhost', 8465)
+        return os.path.join(os.path.expanduser('~'), '.pychecksum.sock')
+
+    @staticmethod
+    def get_authkey():
+        """
+        Get the authentication key shared by the local daemon and its clients, creating it on first use
+        """
+        key_path = os.path.join(os.path.expanduser('~'), '.pychecksum.key')
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path, mode='rb') as key_file:
+                return key_file.read().strip()
+        authkey = os.urandom(32).hex().encode('ascii')
+        with os.fdopen(fd, mode='wb') as key_file:
+            key_file.write(authkey)
+        return authkey
+
+    def is_live(self):
+        """
+        Verify if a daemon already listens on the address
+        """
+        try:
+            Client(self.address).close()
+        except (OSError, EOFError):
+            return False
+        return True
+
+    def calc_cached(self, alg, file_path):
+        """
+        Calculate the hash of a file unless the cache holds it for the same file state
+        """
+        file_path = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        state = (file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        with self.lock:
+            cache_res = self.cache_dict.get((alg, file_path))
+        if (cache_res is not None) and (cache_res[0] == state):
+            return cache_res[1]
+        file_hash = self.hash_proc.calc_hash(alg, file_path, file_size=file_stat.st_size)
+        if type(file_hash) == str:
+            with self.lock:
+                self.cache_dict.pop((alg, file_path), None)
+                self.cache_dict[(alg, file_path)] = (state, file_hash)
+                while len(self.cache_dict) > self.cache_num:
+                    del self.cache_dict[next(iter(self.cache_dict))]
+        return file_hash
+
+    def run_request(self, request):
+        """
+        Run a single calc, gen, or verify request, rereading the files of a verify request instead of the cache
+        """
+        try:
+            if request[0] == 'calc':
+                return self.calc_cached(*request[1:])
+            elif request[0] == 'gen':
+                return self.hash_proc.gen_hash(*request[1:])
+            elif request[0] == 'verify':
+                return self.verif_proc.verif_hash(*request[1:])
+            else:
+                return ValueError('Unknown request: {req}'.format(req=request[0]))
+        except (OSError, TypeError, ValueError) as req_err:
+            return req_err
+
+    def serve_client(self, conn):
+        """
+        Answer the request batches of a client until it disconnects
+        """
+        try:
+            while True:
+                batch = conn.recv()
+                if batch == 'stop':
+                    self.stop()
+                    conn.send(None)
+                    break
+                futures = [self.executor.submit(self.run_request, request) for request in batch]
+                conn.send([future.result() for future in futures])
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def run(self):
+        """
+        Accept client connections until the daemon is stopped
+        """
+        if not self.authkey:
+            return ValueError('An authentication key is required to listen on {addr}'.format(addr=self.address))
+        if isinstance(self.address, str) and os.path.lexists(self.address):
+            if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                return OSError(errno.EEXIST, 'A file that is not a socket exists at {addr}'.format(addr=self.address))
+            elif self.is_live():
+                return OSError(errno.EADDRINUSE, 'A daemon already listens on {addr}'.format(addr=self.address))
+            os.remove(self.address)
+        old_mask = os.umask(0o177)
+        try:
+            self.listener = Listener(self.address, authkey=self.authkey)
+        except OSError as sock_err:
+            return sock_err
+        finally:
+            os.umask(old_mask)
+        self.address = self.listener.address
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.hash_proc.report('Processing', str(self.address))
+        try:
+            while not self.done.is_set():
+                try:
+                    conn = self.listener.accept()
+                except (OSError, EOFError, multiprocessing.AuthenticationError):
+                    continue
+                if self.done.is_set():
+                    conn.close()
+                    break
+                Thread(target=self.serve_client, args=(conn,), daemon=True).start()
+        finally:
+            self.listener.close()
+            self.executor.shutdown(wait=False)
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)
+
+    def start(self):
+        """
+        Run the daemon in a background thread
+        """
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        """
+        Stop the daemon
+        """
+        self.done.set()
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except (OSError, EOFError):
+            pass
+
+
+class HashClient(object):
+
+    def __init__(self, address=None, authkey=None):
+        """
+        Initialize hash client class
+        """
+        if address is None:
+            address = HashDaemon.get_address()
+        if authkey is None:
+            authkey = HashDaemon.get_authkey()
+        self.conn = Client(address, authkey=authkey)
+
+    def request(self, batch):
+        """
+        Send a batch of requests to the daemon and return its results in order
+        """
+        self.conn.send(list(batch))
+        return self.conn.recv()
+
+    def calc_hash(self, alg, file_path):
+        """
+        Calculate the hash of a file through the daemon
+        """
+        return self.request([('calc', alg, os.path.abspath(file_path))])[0]
+
+    def stop(self):
         """
-        Release button selection when event is fired
+        Stop the daemon
         """
-        if self.active_button is not None:
-            self.button_dict[self.active_button].configure(state='normal')
-            self.master.unbind('<Return>')
-            key = event.keysym.lower()
-            if key not in self.direct:
-                self.active_button = None
+        self.conn.send('stop')
+        self.conn.recv()
+        self.close()
 
-    def press_button(self, event):
+    def close(self):
         """
-        Invoke selected button when event is fired
+        Close the connection to the daemon
         """
-        if self.active_button is not None:
-            active_button = self.active_button
-            self.deselect_button(event)
-            self.button_dict[active_button].invoke()
+        self.conn.close()
 
 
 class MainApp(object):
 
+    asset_dict = {}
+    win_dict = {}
+
     def __init__(self, master=None, *args, **kwargs):
         """
         Initialize main application
@@ -253,15 +3805,80 @@ class MainApp(object):
             root = tk.Tk()
         return win_class(master=root, *args, **kwargs)
 
+    def open_cached(self, win_class, *args, **kwargs):
+        """
+        Open a secondary window once per process and display it again afterwards
+        """
+        window = MainApp.win_dict.get(win_class)
+        if window is not None:
+            try:
+                self.display_window(window)
+                return window
+            except tk.TclError:
+                pass
+        window = self.open_window(win_class, *args, **kwargs)
+        MainApp.win_dict[win_class] = window
+        return window
+
     def close_window(self, window=None):
         """
-        Close a tkinter window
+        Close a tkinter window, or hide it when it is cached
         """
         if window is None:
             window = self
+        if MainApp.win_dict.get(type(window)) is window:
+            self.hide_window(window)
+            return
         window.master.withdraw()
         window.master.after(0, window.master.destroy)
 
+    def load_asset(self, name):
+        """
+        Load an application image or text once per process
+        """
+        key = name
+        if name in ('image', 'paypal'):
+            key = (name, self.master.tk)
+        if key not in MainApp.asset_dict:
+            if name == 'image':
+                asset = tk.PhotoImage(master=self.master, data=image_code)
+            elif name == 'paypal':
+                asset = tk.PhotoImage(master=self.master, data=paypal_code)
+            elif name == 'license':
+                asset = license_msg.format(year=self.app_year, author=self.app_author)
+            else:
+                asset = donate_msg.format(name=self.app_name)
+            MainApp.asset_dict[key] = asset
+        return MainApp.asset_dict[key]
+
+    def bench_windows(self, repeat=3):
+        """
+        Measure the time to open each window, the first time and once assets are cached
+        """
+        bench_dict = {}
+        main_win = None
+        temp_dir = tempfile.mkdtemp(prefix='pychecksum_bench_')
+        try:
+            for win_class in (MainWin, AlgWin, QueueWin, AboutWin, LicenseWin, DonateWin):
+                kwargs = {}
+                if win_class == AlgWin:
+                    kwargs = {'main_win': main_win, 'opt_num': 2}
+                elif win_class == QueueWin:
+                    kwargs = {'queue_path': os.path.join(temp_dir, 'queue.json')}
+                bench_dict[win_class.__name__] = []
+                for i in range(repeat):
+                    start_time = time.perf_counter()
+                    window = self.open_window(win_class, **kwargs)
+                    window.master.update_idletasks()
+                    bench_dict[win_class.__name__].append(time.perf_counter() - start_time)
+                    if (win_class == MainWin) and (main_win is None):
+                        main_win = window
+                    else:
+                        window.master.destroy()
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return bench_dict
+
     def display_window(self, window=None):
         """
         Display a tkinter window
@@ -323,17 +3940,15 @@ class MainWin(MainApp):
         self.app_paypal = 'https://www.paypal.me/pychecksum'
         self.app_email = 'pychecksum@gmail.com'
         self.app_fma = 'https://en.wikipedia.org/wiki/Fullmetal_Alchemist:_Brotherhood'
-        self.app_image = tk.PhotoImage(master=self.master, data=image_code)
-        self.app_license = license_msg.format(year=self.app_year, author=self.app_author)
-        self.app_donate = donate_msg.format(name=self.app_name)
         self.app_ini_dir = os.path.expanduser('~\Desktop')
 
     def _set_dicts(self):
         """
-        Setting option, algorithm, and color dictionaries
+        Setting option, algorithm, compression, and color dictionaries
         """
         self.opt_dict = {1: 'Hash Calculation', 2: 'Hash Table Generation', 3: 'Hash Table Verification'}
         self.alg_dict = {1: 'md5', 2: 'sha1', 3: 'sha224', 4: 'sha256', 5: 'sha384', 6: 'sha512'}
+        self.comp_dict = {1: 'gz', 2: 'xz', 3: 'zst'}
         self.color_dict = {0: '#000000', 1: '#0000ff', 2: '#009900', 3: '#ff0000'}
 
     def _set_tooltips(self):
@@ -381,9 +3996,12 @@ class MainWin(MainApp):
 
     def _create_styles(self):
         """
-        Create text and button styles
+        Create text and button styles once per process
         """
-        self.styles = ttk.Style()
+        self.styles = ttk.Style(self.master)
+        if ('styles', self.master.tk) in MainApp.asset_dict:
+            return
+        MainApp.asset_dict[('styles', self.master.tk)] = self.styles
         for key in self.color_dict:
             self.styles.configure(self.text_style[key], foreground=self.color_dict[key])
             self.styles.configure(self.button_style[key], foreground=self.color_dict[key])
@@ -402,11 +4020,12 @@ class MainWin(MainApp):
         self.menu_bar.add_cascade(label='File', underline=0, menu=self.file_menu)
         self.menu_bar.add_cascade(label='Help', underline=0, menu=self.help_menu)
         self.menu_bar.add_cascade(label='Extra', underline=0, menu=self.extra_menu)
+        self.file_menu.add_command(label='Job Queue', underline=0, command=lambda: self.open_cached(QueueWin))
         self.file_menu.add_command(label='Exit', underline=1, command=self.close_window)
         self.help_menu.add_command(label='Wiki Info', underline=2, command=lambda: wb.open(self.app_wiki_info))
         self.help_menu.add_command(label='Tutorial', underline=0, command=lambda: wb.open(self.app_tutorial))
         self.help_menu.add_command(label='Website', underline=0, command=lambda: wb.open(self.app_website))
-        self.help_menu.add_command(label='About', underline=0, command=lambda: self.open_window(AboutWin))
+        self.help_menu.add_command(label='About', underline=0, command=lambda: self.open_cached(AboutWin))
         self.extra_menu.add_command(label='Fullmetal Alchemist', underline=0, command=lambda: wb.open(self.app_fma))
         self.master.configure(menu=self.menu_bar)
 
@@ -454,7 +4073,7 @@ class MainWin(MainApp):
         """
         Center main window
         """
-        self.master.update()
+        self.master.update_idletasks()
         self.screen_width = self.master.winfo_screenwidth()
         self.screen_height = self.master.winfo_screenheight()
         self.win_width = self.master.winfo_reqwidth()
@@ -483,7 +4102,9 @@ class MainWin(MainApp):
         Configure main window
         """
         self.master.title(self.app_name)
-        self.master.iconphoto(True, self.app_image)
+        if ('icon', self.master.tk) not in MainApp.asset_dict:
+            MainApp.asset_dict[('icon', self.master.tk)] = True
+            self.master.iconphoto(True, self.load_asset('image'))
         self.master.protocol('WM_DELETE_WINDOW', func=self.close_window)
         self.master.minsize(self.win_width, self.win_height)
         self.master.resizable(width=False, height=False)
@@ -519,7 +4140,10 @@ class AlgWin(MainWin):
             ini_dir = self.main_win.app_ini_dir
             title = self.opt_dict[opt_num]
             name = 'Hash table files'
-            exts = ';'.join([''.join(['*.', value]) for value in self.alg_dict.values()])
+            exts = [''.join(['*.', value]) for value in self.alg_dict.values()]
+            exts += ['.'.join([ext, comp]) for ext in exts for comp in self.comp_dict.values()]
+            exts = ';'.join(exts)
+            sums = ';'.join(['*SUMS', '*sums', '*.txt', '*.*'])
         else:
             ini_dir = self.app_ini_dir
             title = self.title_fmt.format(main=self.opt_dict[opt_num], add=alg.upper())
@@ -529,6 +4153,8 @@ class AlgWin(MainWin):
         ask_root.withdraw()
         title = ' ➜ '.join([title, msg])
         types = [(name, exts)]
+        if opt_num == 3:
+            types.append(('Checksum files', sums))
         if opt_num == 2:
             path = func(parent=ask_root, initialdir=ini_dir, title=title)
         else:
@@ -542,7 +4168,13 @@ class AlgWin(MainWin):
                 new_dir = os.path.dirname(path)
                 if opt_num == 3:
                     self.main_win.app_ini_dir = new_dir
-                    alg = os.path.splitext(path)[1][1:]
+                    hash_proc = HashProc()
+                    try:
+                        alg = hash_proc.detect_alg(path) or os.path.splitext(path)[1][1:]
+                    except (OSError, UnicodeDecodeError, ImportError):
+                        alg = os.path.splitext(path)[1][1:]
+                    except hash_proc.comp_errs:
+                        alg = os.path.splitext(path)[1][1:]
                 else:
                     self.app_ini_dir = new_dir
                 alg = alg.lower()
@@ -583,7 +4215,8 @@ class AlgWin(MainWin):
 
 class ProcWin(MainWin):
 
-    def __init__(self, master=None, alg_win=None, opt_num=None, alg=None, path=None, *args, **kwargs):
+    def __init__(self, master=None, alg_win=None, opt_num=None, alg=None, path=None, timeouts=None, *args,
+                 **kwargs):
         """
         Initialize process window
         """
@@ -595,6 +4228,8 @@ class ProcWin(MainWin):
             alg = alg_win.alg_dict[1]
         if path is None:
             path = ''
+        if timeouts is None:
+            timeouts = {'read': 60.0, 'retries': 2}
         self.alg_win = alg_win
         self.opt_num = opt_num
         self.alg = alg
@@ -602,6 +4237,7 @@ class ProcWin(MainWin):
         super().__init__(master, *args, **kwargs)
         self._create_progress_bar()
         self._center_window()
+        self.hash_proc = HashProc(notify=self.update_action, progress=self.update_progress, timeouts=timeouts)
         if master is not None:
             self.run_process(opt_num, alg, path, display=True)
 
@@ -623,458 +4259,110 @@ class ProcWin(MainWin):
         proc = Thread(target=func, args=args)
         proc.start()
 
+    def update_action(self, action, path):
+        """
+        Update window text and progress bar mode by action
+        """
+        self.prog_bar.stop()
+        if action == 'Processing':
+            self.prog_bar.configure(mode='determinate')
+        else:
+            self.prog_bar.configure(mode='indeterminate')
+            self.prog_bar.start(15)
+        kwargs = {'action': action, 'path': path}
+        win_text = self.modif_text.format(**kwargs)
+        self.label.configure(text=win_text)
+        self.display_window()
+
+    def update_progress(self, num, total_num):
+        """
+        Update progress bar value
+        """
+        progress = (num / total_num) * 100
+        self.prog_bar['value'] = progress
+        self.master.update()
+
+    def display_msg(self, win_type, *texts):
+        """
+        Hide process window and display a message window
+        """
+        self.hide_window()
+        proc_msg = '\n\n'.join([self.win_title] + list(texts))
+        kwargs = {'proc_win': self, 'alg_win': self.alg_win,
+                  'win_type': win_type, 'win_text': proc_msg}
+        self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
+
+    def display_err(self, proc_err, path):
+        """
+        Display a message window for a process error
+        """
+        if type(proc_err) == PermissionError:
+            file_path = os.path.abspath(proc_err.filename)
+            self.display_msg(2, self.perm_msg, file_path)
+        elif type(proc_err) == UnicodeDecodeError:
+            fmt = proc_err.encoding.upper()
+            self.display_msg(2, self.code_msg.format(fmt=fmt), path)
+        elif isinstance(proc_err, OSError):
+            self.display_msg(2, self.sys_msg.format(err=proc_err.strerror), path)
+        elif isinstance(proc_err, ImportError):
+            self.display_msg(2, self.module_msg.format(name=proc_err.name), path)
+        else:
+            self.display_msg(2, self.comp_msg, path)
+
     def calc_hash(self, alg, file_path, display=False):
         """
         Calculate the hash of a file
         """
-        block_size = 2 ** 16
-        file_size = os.path.getsize(file_path)
-        total_num = int(file_size / block_size) + 1
-        stmt = 'hashlib.{method}()'
-        hasher = eval(stmt.format(method=alg))
         if not display:
-            try:
-                with open(file_path, mode='rb') as file:
-                    for i in range(total_num):
-                        buffer = file.read(block_size)
-                        hasher.update(buffer)
-                file_hash = hasher.hexdigest()
-                return file_hash
-            except PermissionError as perm_err:
-                return perm_err
-        else:
-            try:
-                self.display_window()
-                with open(file_path, mode='rb') as file:
-                    for i in range(total_num):
-                        chunk_num = i + 1
-                        buffer = file.read(block_size)
-                        hasher.update(buffer)
-                        progress = (chunk_num / total_num) * 100
-                        self.prog_bar['value'] = progress
-                        self.master.update()
-                file_hash = hasher.hexdigest()
-                self.hide_window()
-                calc_msg = '\n\n'.join([self.win_title, file_path, file_hash])
-                kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                          'win_type': 1, 'win_text': calc_msg}
-                self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except PermissionError as perm_err:
-                self.hide_window()
-                file_path = os.path.abspath(perm_err.filename)
-                calc_msg = '\n\n'.join([self.win_title, self.perm_msg, file_path])
-                kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                          'win_type': 2, 'win_text': calc_msg}
-                self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except (tk.TclError, RuntimeError):
-                pass
+            return self.hash_proc.calc_hash(alg, file_path)
+        try:
+            self.display_window()
+            file_hash = self.hash_proc.calc_hash(alg, file_path, display=True)
+            if type(file_hash) == str:
+                self.display_msg(1, file_path, file_hash)
+            else:
+                self.display_err(file_hash, file_path)
+        except (tk.TclError, RuntimeError):
+            pass
 
-    def gen_hash(self, alg, dir_path, display=False):
+    def gen_hash(self, alg, dir_path, display=False, comp=None, dial=None, shard=None):
         """
         Generate the hash table of a directory
         """
-        dir_name = os.path.basename(dir_path)
-        hash_name = '.'.join([dir_name, alg])
-        hash_path = os.path.join(dir_path, hash_name)
-        err_path = '.'.join([hash_path, 'err'])
-        path_dict = {}
-        hash_lines = []
-        err_lines = []
         if not display:
-            try:
-                for path, dirs, files in os.walk(dir_path):
-                    for file in files:
-                        file_path = os.path.join(path, file)
-                        base_path = os.path.dirname(file_path)
-                        if base_path != dir_path:
-                            path_dict[file_path] = None
-                        else:
-                            file_ext = os.path.splitext(file_path)[1][1:].lower()
-                            if file_ext not in self.alg_dict.values():
-                                if file_ext != 'err':
-                                    path_dict[file_path] = None
-                                else:
-                                    temp_path = os.path.splitext(file_path)[0]
-                                    file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                    if file_ext not in self.alg_dict.values():
-                                        path_dict[file_path] = None
-                for key in path_dict:
-                    file_path = key
-                    rel_path = os.path.relpath(file_path, start=dir_path)
-                    file_hash = self.calc_hash(alg, file_path)
-                    if type(file_hash) == str:
-                        hash_line = self.hash_fmt.format(hash=file_hash, path=rel_path)
-                        hash_lines.append(hash_line)
-                    elif type(file_hash) == PermissionError:
-                        err_line = self.err_fmt.format(err='Permission ', path=rel_path)
-                        err_lines.append(err_line)
-                    else:
-                        err_line = self.err_fmt.format(err='Unknown    ', path=rel_path)
-                        err_lines.append(err_line)
-                if err_lines:
-                    with open(err_path, mode='w', encoding='utf-8') as err_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Errors', data=len(err_lines))
-                        err_title = 'Error Type'
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, err_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        err_file.write(header_lines)
-                        err_file.writelines(err_lines)
-                    if os.path.isfile(hash_path):
-                        os.remove(hash_path)
-                    return err_lines
-                elif hash_lines:
-                    with open(hash_path, mode='w', encoding='utf-8') as hash_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Hashes', data=len(hash_lines))
-                        alg_title = self.title_fmt.format(main='Hash Algorithm', add=alg.upper())
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, alg_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        hash_file.write(header_lines)
-                        hash_file.writelines(hash_lines)
-                    if os.path.isfile(err_path):
-                        os.remove(err_path)
-                    return hash_lines
-                else:
-                    return None
-            except PermissionError as perm_err:
-                return perm_err
-        else:
-            try:
-                self.prog_bar.configure(mode='indeterminate')
-                kwargs = {'action': 'Reading', 'path': dir_path}
-                win_text = self.modif_text.format(**kwargs)
-                self.label.configure(text=win_text)
-                self.display_window()
-                self.prog_bar.start(15)
-                for path, dirs, files in os.walk(dir_path):
-                    for file in files:
-                        file_path = os.path.join(path, file)
-                        base_path = os.path.dirname(file_path)
-                        if base_path != dir_path:
-                            path_dict[file_path] = None
-                        else:
-                            file_ext = os.path.splitext(file_path)[1][1:].lower()
-                            if file_ext not in self.alg_dict.values():
-                                if file_ext != 'err':
-                                    path_dict[file_path] = None
-                                else:
-                                    temp_path = os.path.splitext(file_path)[0]
-                                    file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                    if file_ext not in self.alg_dict.values():
-                                        path_dict[file_path] = None
-                self.prog_bar.stop()
-                self.prog_bar.configure(mode='determinate')
-                kwargs = {'action': 'Processing', 'path': dir_path}
-                win_text = self.win_text.format(**kwargs)
-                self.label.configure(text=win_text)
-                total_num = len(path_dict)
-                file_num = 0
-                for key in path_dict:
-                    file_num += 1
-                    file_path = key
-                    rel_path = os.path.relpath(file_path, start=dir_path)
-                    file_hash = self.calc_hash(alg, file_path)
-                    if type(file_hash) == str:
-                        hash_line = self.hash_fmt.format(hash=file_hash, path=rel_path)
-                        hash_lines.append(hash_line)
-                    elif type(file_hash) == PermissionError:
-                        err_line = self.err_fmt.format(err='Permission ', path=rel_path)
-                        err_lines.append(err_line)
-                    else:
-                        err_line = self.err_fmt.format(err='Unknown    ', path=rel_path)
-                        err_lines.append(err_line)
-                    progress = (file_num / total_num) * 100
-                    self.prog_bar['value'] = progress
-                    self.master.update()
-                if err_lines:
-                    with open(err_path, mode='w', encoding='utf-8') as err_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Errors', data=len(err_lines))
-                        err_title = 'Error Type'
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, err_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        err_file.write(header_lines)
-                        err_file.writelines(err_lines)
-                    if os.path.isfile(hash_path):
-                        os.remove(hash_path)
-                    self.hide_window()
-                    gen_msg = '\n\n'.join([self.win_title, self.err_msg, err_path])
-                    kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                              'win_type': 2, 'win_text': gen_msg}
-                    self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-                elif hash_lines:
-                    with open(hash_path, mode='w', encoding='utf-8') as hash_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Hashes', data=len(hash_lines))
-                        alg_title = self.title_fmt.format(main='Hash Algorithm', add=alg.upper())
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, alg_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        hash_file.write(header_lines)
-                        hash_file.writelines(hash_lines)
-                    if os.path.isfile(err_path):
-                        os.remove(err_path)
-                    self.hide_window()
-                    gen_msg = '\n\n'.join([self.win_title, self.ok_msg, hash_path])
-                    kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                              'win_type': 1, 'win_text': gen_msg}
-                    self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-                else:
-                    self.hide_window()
-                    gen_msg = '\n\n'.join([self.win_title, self.empty_msg, dir_path])
-                    kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                              'win_type': 2, 'win_text': gen_msg}
-                    self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except PermissionError as perm_err:
-                self.hide_window()
-                file_path = os.path.abspath(perm_err.filename)
-                gen_msg = '\n\n'.join([self.win_title, self.perm_msg, file_path])
-                kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                          'win_type': 2, 'win_text': gen_msg}
-                self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except (tk.TclError, RuntimeError):
-                pass
+            return self.hash_proc.gen_hash(alg, dir_path, comp, dial, shard)
+        try:
+            gen_res = self.hash_proc.gen_hash(alg, dir_path, comp, dial, shard)
+            hash_path = self.hash_proc.get_table(alg, dir_path, comp)
+            err_path = '.'.join([hash_path, 'err'])
+            if isinstance(gen_res, Exception):
+                self.display_err(gen_res, dir_path)
+            elif gen_res is None:
+                self.display_msg(2, self.empty_msg, dir_path)
+            elif isinstance(gen_res, int):
+                self.display_msg(2, self.err_msg, err_path)
+            else:
+                self.display_msg(1, self.ok_msg, hash_path)
+        except (tk.TclError, RuntimeError):
+            pass
 
     def verif_hash(self, alg, hash_path, display=False):
         """
         Verify the hash table of a directory
         """
-        dir_path = os.path.dirname(hash_path)
-        err_path = '.'.join([hash_path, 'err'])
-        path_dict = {}
-        hash_dict = {}
-        skip_dict = {}
-        err_lines = []
         if not display:
-            try:
-                for path, dirs, files in os.walk(dir_path):
-                    for file in files:
-                        file_path = os.path.join(path, file)
-                        base_path = os.path.dirname(file_path)
-                        if base_path != dir_path:
-                            path_dict[file_path] = None
-                        else:
-                            file_ext = os.path.splitext(file_path)[1][1:].lower()
-                            if file_ext in self.alg_dict.values():
-                                skip_dict[file_path] = None
-                            else:
-                                if file_ext != 'err':
-                                    path_dict[file_path] = None
-                                else:
-                                    temp_path = os.path.splitext(file_path)[0]
-                                    file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                    if file_ext in self.alg_dict.values():
-                                        skip_dict[file_path] = None
-                                    else:
-                                        path_dict[file_path] = None
-                with open(hash_path, mode='r', encoding='utf-8') as hash_file:
-                    for line in hash_file:
-                        if line.count('*'):
-                            file_hash, rel_path = map(str.strip, line.split('*')[:2])
-                            file_hash = file_hash.lower()
-                            file_path = os.path.join(dir_path, rel_path)
-                            file_path = os.path.abspath(file_path)
-                            base_path = os.path.dirname(file_path)
-                            if base_path == dir_path:
-                                file_ext = os.path.splitext(file_path)[1][1:].lower()
-                                if file_ext in self.alg_dict.values():
-                                    skip_dict[file_path] = None
-                                else:
-                                    if file_ext == 'err':
-                                        temp_path = os.path.splitext(file_path)[0]
-                                        file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                        if file_ext in self.alg_dict.values():
-                                            skip_dict[file_path] = None
-                            if file_path not in hash_dict:
-                                hash_dict[file_path] = file_hash
-                            else:
-                                err_line = self.err_fmt.format(err='Duplicated ', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                            if file_path in skip_dict:
-                                err_line = self.err_fmt.format(err='Not skipped', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                            if not os.path.isfile(file_path):
-                                err_line = self.err_fmt.format(err='Not found  ', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                for key in path_dict:
-                    file_path = key
-                    rel_path = os.path.relpath(file_path, start=dir_path)
-                    if file_path not in hash_dict:
-                        err_line = self.err_fmt.format(err='Not listed ', path=rel_path)
-                        err_lines.append(err_line)
-                    else:
-                        old_hash = hash_dict[file_path]
-                        new_hash = self.calc_hash(alg, file_path)
-                        if type(new_hash) == str:
-                            if new_hash != old_hash:
-                                err_line = self.err_fmt.format(err='Not match  ', path=rel_path)
-                                err_lines.append(err_line)
-                        elif type(new_hash) == PermissionError:
-                            err_line = self.err_fmt.format(err='Permission ', path=rel_path)
-                            err_lines.append(err_line)
-                        else:
-                            err_line = self.err_fmt.format(err='Unknown    ', path=rel_path)
-                            err_lines.append(err_line)
-                if err_lines:
-                    with open(err_path, mode='w', encoding='utf-8') as err_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Errors', data=len(err_lines))
-                        err_title = 'Error Type'
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, err_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        err_file.write(header_lines)
-                        err_file.writelines(err_lines)
-                    return err_lines
-                else:
-                    if os.path.isfile(err_path):
-                        os.remove(err_path)
-                    return None
-            except PermissionError as perm_err:
-                return perm_err
-            except UnicodeDecodeError as code_err:
-                return code_err
-        else:
-            try:
-                self.prog_bar.configure(mode='indeterminate')
-                kwargs = {'action': 'Reading', 'path': dir_path}
-                win_text = self.modif_text.format(**kwargs)
-                self.label.configure(text=win_text)
-                self.display_window()
-                self.prog_bar.start(15)
-                for path, dirs, files in os.walk(dir_path):
-                    for file in files:
-                        file_path = os.path.join(path, file)
-                        base_path = os.path.dirname(file_path)
-                        if base_path != dir_path:
-                            path_dict[file_path] = None
-                        else:
-                            file_ext = os.path.splitext(file_path)[1][1:].lower()
-                            if file_ext in self.alg_dict.values():
-                                skip_dict[file_path] = None
-                            else:
-                                if file_ext != 'err':
-                                    path_dict[file_path] = None
-                                else:
-                                    temp_path = os.path.splitext(file_path)[0]
-                                    file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                    if file_ext in self.alg_dict.values():
-                                        skip_dict[file_path] = None
-                                    else:
-                                        path_dict[file_path] = None
-                self.prog_bar.stop()
-                kwargs = {'action': 'Reading', 'path': hash_path}
-                win_text = self.win_text.format(**kwargs)
-                self.label.configure(text=win_text)
-                self.prog_bar.start(15)
-                with open(hash_path, mode='r', encoding='utf-8') as hash_file:
-                    for line in hash_file:
-                        if line.count('*'):
-                            file_hash, rel_path = map(str.strip, line.split('*')[:2])
-                            file_hash = file_hash.lower()
-                            file_path = os.path.join(dir_path, rel_path)
-                            file_path = os.path.abspath(file_path)
-                            base_path = os.path.dirname(file_path)
-                            if base_path == dir_path:
-                                file_ext = os.path.splitext(file_path)[1][1:].lower()
-                                if file_ext in self.alg_dict.values():
-                                    skip_dict[file_path] = None
-                                else:
-                                    if file_ext == 'err':
-                                        temp_path = os.path.splitext(file_path)[0]
-                                        file_ext = os.path.splitext(temp_path)[1][1:].lower()
-                                        if file_ext in self.alg_dict.values():
-                                            skip_dict[file_path] = None
-                            if file_path not in hash_dict:
-                                hash_dict[file_path] = file_hash
-                            else:
-                                err_line = self.err_fmt.format(err='Duplicated ', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                            if file_path in skip_dict:
-                                err_line = self.err_fmt.format(err='Not skipped', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                            if not os.path.isfile(file_path):
-                                err_line = self.err_fmt.format(err='Not found  ', path=rel_path)
-                                if err_line not in err_lines:
-                                    err_lines.append(err_line)
-                self.prog_bar.stop()
-                self.prog_bar.configure(mode='determinate')
-                kwargs = {'action': 'Processing', 'path': hash_path}
-                win_text = self.win_text.format(**kwargs)
-                self.label.configure(text=win_text)
-                total_num = len(path_dict)
-                file_num = 0
-                for key in path_dict:
-                    file_num += 1
-                    file_path = key
-                    rel_path = os.path.relpath(file_path, start=dir_path)
-                    if file_path not in hash_dict:
-                        err_line = self.err_fmt.format(err='Not listed ', path=rel_path)
-                        err_lines.append(err_line)
-                    else:
-                        old_hash = hash_dict[file_path]
-                        new_hash = self.calc_hash(alg, file_path)
-                        if type(new_hash) == str:
-                            if new_hash != old_hash:
-                                err_line = self.err_fmt.format(err='Not match  ', path=rel_path)
-                                err_lines.append(err_line)
-                        elif type(new_hash) == PermissionError:
-                            err_line = self.err_fmt.format(err='Permission ', path=rel_path)
-                            err_lines.append(err_line)
-                        else:
-                            err_line = self.err_fmt.format(err='Unknown    ', path=rel_path)
-                            err_lines.append(err_line)
-                    progress = (file_num / total_num) * 100
-                    self.prog_bar['value'] = progress
-                    self.master.update()
-                if err_lines:
-                    with open(err_path, mode='w', encoding='utf-8') as err_file:
-                        time_info = self.info_fmt.format(info='Generated', data=time.ctime())
-                        num_info = self.info_fmt.format(info='Number of Errors', data=len(err_lines))
-                        err_title = 'Error Type'
-                        header_lines = [self.app_title, self.app_website, self.sep_fmt, time_info,
-                                        num_info, self.sep_fmt, err_title, self.sep_fmt, '']
-                        header_lines = '\n'.join(header_lines)
-                        err_file.write(header_lines)
-                        err_file.writelines(err_lines)
-                    self.hide_window()
-                    verif_msg = '\n\n'.join([self.win_title, self.err_msg, err_path])
-                    kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                              'win_type': 2, 'win_text': verif_msg}
-                    self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-                else:
-                    if os.path.isfile(err_path):
-                        os.remove(err_path)
-                    self.hide_window()
-                    verif_msg = '\n\n'.join([self.win_title, self.ok_msg, hash_path])
-                    kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                              'win_type': 1, 'win_text': verif_msg}
-                    self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except PermissionError as perm_err:
-                self.hide_window()
-                file_path = os.path.abspath(perm_err.filename)
-                verif_msg = '\n\n'.join([self.win_title, self.perm_msg, file_path])
-                kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                          'win_type': 2, 'win_text': verif_msg}
-                self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except UnicodeDecodeError as code_err:
-                self.hide_window()
-                fmt = code_err.encoding.upper()
-                verif_msg = '\n\n'.join([self.win_title, self.code_msg.format(fmt=fmt), hash_path])
-                kwargs = {'proc_win': self, 'alg_win': self.alg_win,
-                          'win_type': 2, 'win_text': verif_msg}
-                self.master.after(0, lambda: self.open_window(MsgWin, **kwargs))
-            except (tk.TclError, RuntimeError):
-                pass
+            return self.hash_proc.verif_hash(alg, hash_path)
+        try:
+            verif_res = self.hash_proc.verif_hash(alg, hash_path)
+            err_path = '.'.join([hash_path, 'err'])
+            if isinstance(verif_res, Exception):
+                self.display_err(verif_res, hash_path)
+            elif verif_res:
+                self.display_msg(2, self.err_msg, err_path)
+            else:
+                self.display_msg(1, self.ok_msg, hash_path)
+        except (tk.TclError, RuntimeError):
+            pass
 
     def _set_texts(self):
         """
@@ -1084,7 +4372,10 @@ class ProcWin(MainWin):
         self.win_msg = self.action_fmt.format(action='Processing', path=self.path)
         self.modif_text = '\n'.join([self.win_title, self.action_fmt])
         self.perm_msg = "Permission Error! We can't process the following file."
+        self.sys_msg = "System Error! {err}."
         self.code_msg = "Decoding Error! The file must be encoded in {fmt} format."
+        self.comp_msg = "Compression Error! The file is corrupted or incomplete."
+        self.module_msg = "Module Error! The {name} module is required to process the following file."
         self.empty_msg = "Empty Error! The directory doesn't have correct files to process."
         self.ok_msg = "The process has been successfully completed.\nThank you very much!"
         self.err_msg = "Warning! The verification process has failed.\nPlease check the error file for more details."
@@ -1096,6 +4387,285 @@ class ProcWin(MainWin):
         pass
 
 
+class QueueWin(MainWin):
+
+    def __init__(self, master=None, queue_path=None, *args, **kwargs):
+        """
+        Initialize queue window
+        """
+        super().__init__(master, *args, **kwargs)
+        self.hash_queue = HashQueue(queue_path=queue_path, notify=self.update_job, progress=self.update_progress)
+        self.refresh_jobs()
+        self._center_window()
+        if master is not None:
+            self.display_window()
+
+    def add_dirs(self):
+        """
+        Add a directory generation job with the selected algorithm
+        """
+        title = ' ➜ '.join([self.opt_dict[2], "Select a directory"])
+        path = filedialog.askdirectory(parent=self.master, title=title)
+        if path:
+            self.hash_queue.add(2, self.alg_var.get(), path)
+            self.refresh_jobs()
+
+    def add_tables(self):
+        """
+        Add hash table verification jobs with their detected algorithms
+        """
+        exts = [''.join(['*.', value]) for value in self.alg_dict.values()]
+        exts += ['.'.join([ext, comp]) for ext in exts for comp in self.comp_dict.values()]
+        types = [('Hash table files', ';'.join(exts)), ('Checksum files', ';'.join(['*SUMS', '*sums', '*.txt', '*.*']))]
+        title = ' ➜ '.join([self.opt_dict[3], "Select hash table files"])
+        paths = filedialog.askopenfilenames(parent=self.master, title=title, filetypes=types)
+        hash_proc = HashProc()
+        for path in paths:
+            try:
+                alg = hash_proc.detect_alg(path) or self.alg_var.get()
+            except (OSError, UnicodeDecodeError, ImportError):
+                alg = self.alg_var.get()
+            except hash_proc.comp_errs:
+                alg = self.alg_var.get()
+            self.hash_queue.add(3, alg.lower(), path)
+        self.refresh_jobs()
+
+    def start_jobs(self):
+        """
+        Run the pending jobs of the queue
+        """
+        self.prog_bar['value'] = 0
+        self.hash_queue.start()
+
+    def clear_jobs(self):
+        """
+        Remove the finished jobs from the queue
+        """
+        self.hash_queue.clear()
+        self.refresh_jobs()
+
+    def refresh_jobs(self):
+        """
+        Show the jobs of the queue and their states
+        """
+        self.tree.delete(*self.tree.get_children())
+        for job in self.hash_queue.job_list:
+            state = job['state']
+            if job['errors']:
+                state = self.state_fmt.format(state=state, errors=job['errors'])
+            values = (self.opt_dict[job['opt_num']], job['alg'].upper(), job['path'], state)
+            self.tree.insert('', 'end', values=values)
+
+    def update_job(self, job):
+        """
+        Refresh the job list from a worker thread
+        """
+        try:
+            self.master.after(0, self.refresh_jobs)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def update_progress(self, num, total_num):
+        """
+        Update progress bar value from a worker thread
+        """
+        try:
+            self.master.after(0, lambda: self.prog_bar.configure(value=(num / total_num) * 100))
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def _set_formats(self):
+        """
+        Setting special formats
+        """
+        super()._set_formats()
+        self.state_fmt = '{state} ({errors})'
+
+    def _set_texts(self):
+        """
+        Setting window texts
+        """
+        self.win_title = "Job Queue"
+        self.win_msg = "Please add the directories and hash tables you want to process."
+
+    def _create_menus(self):
+        pass
+
+    def _create_buttons(self):
+        """
+        Create job list, algorithm, and queue buttons
+        """
+        columns = ('option', 'alg', 'path', 'state')
+        self.tree = ttk.Treeview(self.upper_frame, columns=columns, show='headings', height=10)
+        for column, text, width in zip(columns, ['Option', 'Algorithm', 'Path', 'State'], [160, 80, 360, 100]):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width)
+        self.tree.pack(fill='both', expand='yes', padx=10, pady=(0, 10))
+        self.alg_var = tk.StringVar(self.master, value=self.alg_dict[4])
+        self.alg_box = ttk.Combobox(self.lower_frame, textvariable=self.alg_var, width=8, state='readonly')
+        self.alg_box['values'] = list(self.alg_dict.values())
+        self.alg_box.pack(side='left', padx=(10, 2), pady=(0, 10))
+        self.button1 = ttk.Button(self.lower_frame, text="Add Directory", command=self.add_dirs)
+        self.button2 = ttk.Button(self.lower_frame, text="Add Tables", command=self.add_tables)
+        self.button3 = ttk.Button(self.lower_frame, text="Start", command=self.start_jobs)
+        self.button4 = ttk.Button(self.lower_frame, text="Clear", command=self.clear_jobs)
+        self.buttons = [self.button1, self.button2, self.button3, self.button4]
+        for num, button in enumerate(self.buttons):
+            button.configure(style=self.button_style[min(num + 1, 3)], padding=(11, 3), takefocus=False)
+            button.pack(side='left', fill='both', expand='yes', padx=2, pady=(0, 10))
+        AddTooltip(widget=self.button1, text="Queue the generation of a directory hash table")
+        AddTooltip(widget=self.button2, text="Queue the verification of hash table files")
+        AddTooltip(widget=self.button3, text="Process the pending jobs")
+        AddTooltip(widget=self.button4, text="Remove the finished jobs")
+        self.prog_bar = ttk.Progressbar(self.master, length=422)
+        self.prog_bar.pack(fill='both', expand='yes', padx=10, pady=(0, 10))
+
+
+class ResultWin(MainWin):
+
+    def __init__(self, master=None, res_path=None, *args, **kwargs):
+        """
+        Initialize result window
+        """
+        if res_path is None:
+            res_path = ''
+        self.res_path = res_path
+        self.results = None
+        self.offset = 0
+        self.row_num = 20
+        super().__init__(master, *args, **kwargs)
+        self._center_window()
+        if master is not None:
+            self.results = HashResults(res_path)
+            self.load_results()
+            self.display_window()
+
+    def load_results(self):
+        """
+        Load the next chunk of results while the window stays responsive
+        """
+        try:
+            match_num = len(self.results.match_list)
+            is_left = self.results.load()
+            if match_num < self.offset + self.row_num:
+                self.render()
+            else:
+                self.update_count()
+            if is_left:
+                self.master.after(1, self.load_results)
+        except tk.TclError:
+            self.results.close()
+
+    def apply_filter(self, *args):
+        """
+        Filter the results from the error type and path prefix entries
+        """
+        self.results.apply_filter(self.type_var.get(), self.prefix_var.get())
+        self.offset = 0
+        self.render()
+
+    def update_count(self):
+        """
+        Update the number of matching results
+        """
+        total_num = len(self.results.match_list)
+        self.count_label.configure(text=self.count_fmt.format(num=total_num, total_num=len(self.results.res_list)))
+        if total_num:
+            self.scroll_bar.set(self.offset / total_num, min(self.offset + self.row_num, total_num) / total_num)
+        else:
+            self.scroll_bar.set(0, 1)
+
+    def render(self):
+        """
+        Render only the visible rows of the matching results
+        """
+        match_list = self.results.match_list
+        self.offset = max(0, min(self.offset, len(match_list) - self.row_num))
+        self.tree.delete(*self.tree.get_children())
+        for num in match_list[self.offset:self.offset + self.row_num]:
+            self.tree.insert('', 'end', values=self.results.res_list[num])
+        self.update_count()
+
+    def scroll_rows(self, *args):
+        """
+        Move the visible rows from the scroll bar
+        """
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * len(self.results.match_list))
+        else:
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.row_num
+            self.offset += step
+        self.render()
+
+    def scroll_event(self, event):
+        """
+        Move the visible rows when event is fired
+        """
+        sign = int(event.delta / 120) * (-1)
+        key = event.keysym.lower()
+        if (key == 'up') or (event.num == 4):
+            sign = -1
+        elif (key == 'down') or (event.num == 5):
+            sign = 1
+        self.scroll_rows('scroll', sign * 3, 'units')
+
+    def _set_formats(self):
+        """
+        Setting special formats
+        """
+        super()._set_formats()
+        self.count_fmt = '{num} of {total_num} results'
+
+    def _set_texts(self):
+        """
+        Setting window texts
+        """
+        self.win_title = "Results"
+        self.win_msg = self.res_path
+        self.type_list = ['All', 'Not match', 'Not found', 'Not listed', 'Duplicated', 'Not skipped', 'Permission',
+                          'Stalled', 'Unknown', 'OK']
+
+    def _create_menus(self):
+        pass
+
+    def _create_buttons(self):
+        """
+        Create filter entries and result list
+        """
+        self.type_var = tk.StringVar(self.master, value=self.type_list[0])
+        self.prefix_var = tk.StringVar(self.master, value='')
+        self.type_box = ttk.Combobox(self.lower_frame, textvariable=self.type_var, width=12, state='readonly')
+        self.type_box['values'] = self.type_list
+        self.prefix_entry = ttk.Entry(self.lower_frame, textvariable=self.prefix_var, width=60)
+        self.count_label = ttk.Label(self.lower_frame, text='')
+        self.type_box.bind('<<ComboboxSelected>>', func=self.apply_filter)
+        self.prefix_var.trace_add('write', self.apply_filter)
+        self.type_box.pack(side='left', padx=(10, 2), pady=(0, 5))
+        self.prefix_entry.pack(side='left', fill='x', expand='yes', padx=2, pady=(0, 5))
+        self.count_label.pack(side='right', padx=(2, 10), pady=(0, 5))
+        AddTooltip(widget=self.type_box, text="Show only one error type")
+        AddTooltip(widget=self.prefix_entry, text="Show only the paths starting with this text")
+        self.list_frame = ttk.Frame(self.master)
+        self.list_frame.pack(fill='both', expand='yes')
+        columns = ('type', 'path')
+        self.tree = ttk.Treeview(self.list_frame, columns=columns, show='headings', height=self.row_num)
+        self.tree.heading('type', text='Error Type')
+        self.tree.heading('path', text='Path')
+        self.tree.column('type', width=100, stretch=False)
+        self.tree.column('path', width=620)
+        self.scroll_bar = ttk.Scrollbar(self.list_frame, command=self.scroll_rows)
+        self.scroll_bar.pack(side='right', fill='y', padx=(0, 10), pady=(0, 10))
+        self.tree.pack(fill='both', expand='yes', padx=(10, 0), pady=(0, 10))
+        for widget in (self.tree, self.scroll_bar):
+            widget.bind('<MouseWheel>', func=self.scroll_event)
+            widget.bind('<Button-4>', func=self.scroll_event)
+            widget.bind('<Button-5>', func=self.scroll_event)
+        self.master.bind('<Up>', func=self.scroll_event)
+        self.master.bind('<Down>', func=self.scroll_event)
+
+
 class MsgWin(MainWin):
 
     def __init__(self, master=None, proc_win=None, alg_win=None, win_type=None, win_text=None, *args, **kwargs):
@@ -1123,7 +4693,7 @@ class MsgWin(MainWin):
         """
         Display sound depending on window type
         """
-        if win_type is None:
+        if (win_type is None) or (ws is None):
             self.master.bell()
         else:
             sound_dict = {1: ws.MB_OK, 2: ws.MB_ICONHAND}
@@ -1138,9 +4708,19 @@ class MsgWin(MainWin):
 
     def open_directory(self, path):
         """
-        Open a directory by path
+        Open a directory by path, selecting the file where the platform allows
         """
-        Popen(self.open_fmt.format(path=path))
+        if os.name == 'nt':
+            Popen(self.open_fmt.format(path=path))
+        else:
+            wb.open(os.path.dirname(path))
+
+    def open_results(self, path):
+        """
+        Open an error file in the result window
+        """
+        root = self.master.nametowidget('.')
+        ResultWin(master=tk.Toplevel(root), res_path=path)
 
     def close_window(self, window=None):
         """
@@ -1158,6 +4738,8 @@ class MsgWin(MainWin):
             file_path = text_list[-1]
             func = self.open_directory
             arg = file_path
+            if (self.win_type == 2) and file_path.endswith('.err') and os.path.isfile(file_path):
+                func = self.open_results
         if self.proc_win.opt_num == 3:
             close = self.alg_win.close_window
         else:
@@ -1211,7 +4793,7 @@ class AboutWin(MainWin):
         """
         self.master.title('About')
         copyright_msg = self.copyright_fmt.format(year=self.app_year, sep='\n', author=self.app_author)
-        self.image_label = ttk.Label(self.upper_frame, image=self.app_image)
+        self.image_label = ttk.Label(self.upper_frame, image=self.load_asset('image'))
         self.title_label = ttk.Label(self.upper_frame, text=self.app_title)
         self.phrase_label = ttk.Label(self.upper_frame, text=self.app_phrase)
         self.copyright_label = ttk.Label(self.lower_frame, text=copyright_msg)
@@ -1225,8 +4807,8 @@ class AboutWin(MainWin):
         self.license_button.configure(style=self.button_style[0], padding=(6, 3), takefocus=False)
         self.donate_button.configure(style=self.button_style[0], padding=(6, 3), takefocus=False)
         self.close_button.configure(style=self.button_style[0], padding=(6, 3), takefocus=False)
-        self.license_button['command'] = lambda: self.open_window(LicenseWin)
-        self.donate_button['command'] = lambda: self.open_window(DonateWin)
+        self.license_button['command'] = lambda: self.open_cached(LicenseWin)
+        self.donate_button['command'] = lambda: self.open_cached(DonateWin)
         self.close_button['command'] = self.close_window
         self.image_label.pack(expand='yes')
         self.title_label.pack(expand='yes')
@@ -1267,7 +4849,7 @@ class LicenseWin(MainWin):
         self.master.title('License')
         self.license_text = tk.Text(self.upper_frame)
         self.scroll_bar = ttk.Scrollbar(self.upper_frame)
-        self.license_text.insert(index='end', chars=self.app_license)
+        self.license_text.insert(index='end', chars=self.load_asset('license'))
         self.license_text.configure(font='Helvetica 8', state='disable')
         self.license_text.configure(yscrollcommand=self.scroll_bar.set)
         self.scroll_bar['command'] = self.license_text.yview
@@ -1318,8 +4900,8 @@ class DonateWin(MainWin):
         Create application donate
         """
         self.master.title('Donate')
-        self.paypal_icon = tk.PhotoImage(master=self.master, data=paypal_code)
-        self.donate_label = ttk.Label(self.upper_frame, text=self.app_donate)
+        self.paypal_icon = self.load_asset('paypal')
+        self.donate_label = ttk.Label(self.upper_frame, text=self.load_asset('donate'))
         self.paypal_label = ttk.Label(self.upper_frame, image=self.paypal_icon)
         self.paypal_button = ttk.Button(self.upper_frame, text=self.paypal_msg)
         self.email_label = ttk.Label(self.lower_frame, text=self.email_msg)
@@ -1372,4 +4954,389 @@ class DonateWin(MainWin):
         pass
 
 
-app = MainApp()
+def make_parser():
+    """
+    Build the parser of the command line modes
+    """
+    parser = argparse.ArgumentParser(prog='pychecksum')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+    worker_parser = subparsers.add_parser('worker', help="Serve verification units to a coordinator")
+    worker_parser.set_defaults(func=run_worker)
+    worker_parser.add_argument('address', help="Coordinator address as host:port")
+    worker_parser.add_argument('root', help="Local path of the verified directory")
+    worker_parser.add_argument('--authkey', default='', help="Shared authentication key")
+    worker_parser.add_argument('--keys', nargs='*', default=None, help="Top directories served by this worker")
+    worker_parser.add_argument('--workers', type=int, default=None, help="Threads of the worker process")
+    worker_parser.add_argument('--dev-workers', nargs='+', default=None,
+                               help="Concurrent reads per device as hdd=N, ssd=N, or path=N")
+    coord_parser = subparsers.add_parser('coord', help="Verify a hash table with local and remote workers")
+    coord_parser.set_defaults(func=run_coord)
+    coord_parser.add_argument('table', help="Path of the hash table")
+    coord_parser.add_argument('--alg', default=None, help="Hash algorithm, detected when omitted")
+    coord_parser.add_argument('--address', default=None, help="Host:port that remote workers connect to")
+    coord_parser.add_argument('--authkey', default='', help="Shared authentication key, required with --address")
+    coord_parser.add_argument('--workers', type=int, default=None, help="Number of local worker processes")
+    coord_parser.add_argument('--attempts', type=int, default=3, help="Attempts of a unit before it fails")
+    coord_parser.add_argument('--dev-workers', nargs='+', default=None,
+                              help="Concurrent reads per device, split between the local worker processes")
+    watch_parser = subparsers.add_parser('watch', help="Keep the hash table of a directory up to date")
+    watch_parser.set_defaults(func=run_watch)
+    watch_parser.add_argument('root', help="Path of the watched directory")
+    watch_parser.add_argument('--alg', default='sha256', help="Hash algorithm")
+    watch_parser.add_argument('--comp', default=None, help="Hash table compression")
+    watch_parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls")
+    watch_parser.add_argument('--delay', type=float, default=2.0, help="Seconds a file must settle")
+    watch_parser.add_argument('--poll', action='store_true', help="Compare stat snapshots instead of inotify")
+    compare_parser = subparsers.add_parser('compare', help="Compare two hash tables by their directory digests")
+    compare_parser.set_defaults(func=run_compare)
+    compare_parser.add_argument('table', help="Path of the reference hash table")
+    compare_parser.add_argument('other', help="Path of the compared hash table")
+    compare_parser.add_argument('--alg', default=None, help="Hash algorithm, detected when omitted")
+    diff_parser = subparsers.add_parser('diff', help="Diff two hash tables without rehashing")
+    diff_parser.set_defaults(func=run_diff)
+    diff_parser.add_argument('table', help="Path of the old hash table")
+    diff_parser.add_argument('other', help="Path of the new hash table")
+    diff_parser.add_argument('--alg', default=None, help="Hash algorithm, detected when omitted")
+    diff_parser.add_argument('--run-size', type=int, default=None, help="Entries per sorted run kept in memory")
+    verif_parser = subparsers.add_parser('verify', help="Verify the hash table of a directory")
+    verif_parser.set_defaults(func=run_verify)
+    verif_parser.add_argument('table', help="Path of the hash table")
+    verif_parser.add_argument('--alg', default=None, help="Hash algorithm, detected when omitted")
+    verif_parser.add_argument('--external', action='store_true', help="Merge-join sorted runs on disk")
+    verif_parser.add_argument('--run-size', type=int, default=None, help="Entries per sorted run kept in memory")
+    verif_parser.add_argument('--sample', type=float, default=None, help="Fraction of the entries to check")
+    verif_parser.add_argument('--days', type=float, default=None, help="Days to cover every entry once")
+    verif_parser.add_argument('--sample-mode', choices=['random', 'stratified'], default='random',
+                              help="Sampling across the table or per top directory")
+    verif_parser.add_argument('--seed', type=int, default=None, help="Seed of the sample selection")
+    verif_parser.add_argument('--report', default=None, help="Path of the streamed result report, - for stdout")
+    verif_parser.add_argument('--report-format', choices=['ndjson', 'csv'], default='ndjson',
+                              help="Format of the result report")
+    verif_parser.add_argument('--metrics-file', default=None, help="Path of a Prometheus textfile to keep updated")
+    verif_parser.add_argument('--metrics-port', type=int, default=None, help="Local port serving the metrics")
+    verif_parser.add_argument('--read-timeout', type=float, default=None, help="Seconds a single read may block")
+    verif_parser.add_argument('--file-timeout', type=float, default=None, help="Seconds a file read may take")
+    verif_parser.add_argument('--min-rate', type=float, default=None, help="Slowest read rate in bytes per second")
+    verif_parser.add_argument('--retries', type=int, default=0, help="Retries of stalled or failed reads")
+    verif_parser.add_argument('--dev-workers', nargs='+', default=None,
+                              help="Concurrent reads per device as hdd=N, ssd=N, or path=N")
+    bench_parser = subparsers.add_parser('bench', help="Measure the time to open each window")
+    bench_parser.set_defaults(func=run_bench)
+    bench_parser.add_argument('--repeat', type=int, default=3, help="Number of openings per window")
+    view_parser = subparsers.add_parser('view', help="Browse an error file or a result report")
+    view_parser.set_defaults(func=run_view)
+    view_parser.add_argument('path', help="Path of the error file or NDJSON report")
+    copy_parser = subparsers.add_parser('copy', help="Copy a directory and hash it from the same reads")
+    copy_parser.set_defaults(func=run_copy)
+    copy_parser.add_argument('source', help="Path of the copied directory")
+    copy_parser.add_argument('target', help="Path of the new copy")
+    copy_parser.add_argument('--alg', default='sha256', help="Hash algorithm, none to copy without hashing")
+    copy_parser.add_argument('--comp', default=None, help="Hash table compression")
+    copy_parser.add_argument('--dial', default=None, help="Hash table dialect")
+    calc_parser = subparsers.add_parser('calc', help="Calculate the hash of a file or of the standard input")
+    calc_parser.set_defaults(func=run_calc)
+    calc_parser.add_argument('path', help="Path of the hashed file, - for the standard input")
+    calc_parser.add_argument('--alg', default='sha256', help="Hash algorithm")
+    calc_parser.add_argument('--tee', action='store_true', help="Pass the data to stdout and the hash to stderr")
+    daemon_parser = subparsers.add_parser('daemon', help="Serve calc, gen, and verify requests to local clients")
+    daemon_parser.set_defaults(func=run_daemon)
+    daemon_parser.add_argument('--address', default=None, help="Unix socket path or host:port to listen on")
+    daemon_parser.add_argument('--authkey', default='', help="Shared key, read from ~/.pychecksum.key by default")
+    daemon_parser.add_argument('--workers', type=int, default=None, help="Size of the shared worker pool")
+    gen_parser = subparsers.add_parser('gen', help="Generate the hash table of a directory")
+    gen_parser.set_defaults(func=run_gen)
+    gen_parser.add_argument('root', help="Path of the hashed directory")
+    gen_parser.add_argument('--alg', default='sha256', help="Hash algorithm")
+    gen_parser.add_argument('--comp', default=None, help="Hash table compression")
+    gen_parser.add_argument('--dial', default=None, help="Hash table dialect")
+    gen_parser.add_argument('--shard', default=None, help="Shard by top directory (dir) or by a number of buckets")
+    gen_parser.add_argument('--keys', nargs='*', default=None, help="Shard keys to regenerate, all when omitted")
+    gen_parser.add_argument('--archives', action='store_true', help="List the members of zip and tar archives")
+    gen_parser.add_argument('--merkle', action='store_true', help="Add the directory digests for compare")
+    gen_parser.add_argument('--links', choices=['follow', 'record', 'skip'], default=None, help="Symlink policy")
+    gen_parser.add_argument('--exclude', action='append', default=[], help="Gitignore style rule, ! to include")
+    gen_parser.add_argument('--exclude-from', default=None, help="Path of a file of gitignore style rules")
+    gen_parser.add_argument('--min-size', type=int, default=None, help="Smallest hashed file size in bytes")
+    gen_parser.add_argument('--max-size', type=int, default=None, help="Largest hashed file size in bytes")
+    gen_parser.add_argument('--newer', type=float, default=None, help="Only files modified in the last days")
+    gen_parser.add_argument('--older', type=float, default=None, help="Only files not modified in the last days")
+    gen_parser.add_argument('--read-timeout', type=float, default=None, help="Seconds a single read may block")
+    gen_parser.add_argument('--file-timeout', type=float, default=None, help="Seconds a file read may take")
+    gen_parser.add_argument('--min-rate', type=float, default=None, help="Slowest read rate in bytes per second")
+    gen_parser.add_argument('--retries', type=int, default=0, help="Retries of stalled or failed reads")
+    gen_parser.add_argument('--report', default=None, help="Path of the streamed result report, - for stdout")
+    gen_parser.add_argument('--report-format', choices=['ndjson', 'csv'], default='ndjson',
+                            help="Format of the result report")
+    gen_parser.add_argument('--metrics-file', default=None, help="Path of a Prometheus textfile to keep updated")
+    gen_parser.add_argument('--metrics-port', type=int, default=None, help="Local port serving the metrics")
+    gen_parser.add_argument('--dev-workers', nargs='+', default=None,
+                            help="Concurrent reads per device as hdd=N, ssd=N, or path=N")
+    return parser
+
+
+def parse_dev_workers(parser, dev_args):
+    """
+    Parse the concurrent reads per device given as hdd=N, ssd=N, or path=N
+    """
+    if dev_args is None:
+        return None
+    dev_workers = {}
+    for dev_arg in dev_args:
+        dev, sep, num = dev_arg.rpartition('=')
+        if not (dev and num.isdigit() and (int(num) > 0)):
+            parser.error("argument --dev-workers: expected hdd=N, ssd=N, or path=N with N > 0")
+        if dev not in ('hdd', 'ssd'):
+            try:
+                dev = os.stat(dev).st_dev
+            except OSError as os_err:
+                parser.error("argument --dev-workers: {err}".format(err=os_err))
+        dev_workers[dev] = int(num)
+    return dev_workers
+
+
+def open_outputs(args):
+    """
+    Open the result report and the metrics exports of a generation or verification
+    """
+    sink = None
+    metrics = None
+    if args.report is not None:
+        sink = HashSink(sys.stdout if args.report == '-' else args.report, args.report_format)
+    if (args.metrics_file is not None) or (args.metrics_port is not None):
+        metrics = HashMetrics()
+        if args.metrics_file is not None:
+            metrics.export_file(args.metrics_file)
+        if args.metrics_port is not None:
+            metrics.serve(args.metrics_port)
+    return sink, metrics
+
+
+def close_outputs(sink, metrics):
+    """
+    Close the result report and stop the metrics exports
+    """
+    if sink is not None:
+        sink.close()
+    if metrics is not None:
+        metrics.stop()
+
+
+def run_worker(parser, args):
+    """
+    Serve verification units to a coordinator
+    """
+    dev_workers = parse_dev_workers(parser, args.dev_workers)
+    host, port = args.address.rsplit(':', 1)
+    worker = HashWorker((host, int(port)), args.authkey.encode('utf-8'), args.root, args.keys, args.workers,
+                        dev_workers)
+    worker.run()
+
+
+def run_coord(parser, args):
+    """
+    Verify a hash table with local and remote workers
+    """
+    dev_workers = parse_dev_workers(parser, args.dev_workers)
+    address = None
+    if args.address is not None:
+        if not args.authkey:
+            parser.error("argument --authkey: required with --address")
+        host, port = args.address.rsplit(':', 1)
+        address = (host, int(port))
+    hash_proc = HashProc(dev_workers=dev_workers)
+    coord = HashCoord(hash_proc, address, args.authkey.encode('utf-8') or None, args.attempts)
+    alg = args.alg or hash_proc.detect_alg(args.table)
+    coord_res = coord.verif_hash(alg, os.path.abspath(args.table), args.workers)
+    if isinstance(coord_res, Exception):
+        sys.exit(str(coord_res))
+    elif coord_res is not None:
+        sys.exit(1)
+
+
+def run_watch(parser, args):
+    """
+    Keep the hash table of a directory up to date
+    """
+    watcher = HashWatcher(args.alg, args.root, None, args.comp, args.interval, args.delay, args.poll)
+    try:
+        watch_res = watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        watch_res = None
+    if isinstance(watch_res, Exception):
+        sys.exit(str(watch_res))
+
+
+def run_compare(parser, args):
+    """
+    Compare two hash tables by their directory digests
+    """
+    hash_proc = HashProc()
+    alg = args.alg or hash_proc.detect_alg(args.table)
+    comp_res = hash_proc.compare_hash(alg, args.table, args.other)
+    if isinstance(comp_res, Exception):
+        sys.exit(str(comp_res))
+    elif comp_res is not None:
+        sys.stdout.writelines(comp_res)
+        sys.exit(1)
+
+
+def run_diff(parser, args):
+    """
+    Diff two hash tables without rehashing
+    """
+    hash_proc = HashProc(run_num=args.run_size)
+    alg = args.alg or hash_proc.detect_alg(args.table)
+    diff_num = 0
+    try:
+        for diff_line in hash_proc.iter_diff(alg, args.table, args.other):
+            sys.stdout.write(diff_line)
+            diff_num += 1
+    except (OSError, UnicodeDecodeError, ImportError) as proc_err:
+        sys.exit(str(proc_err))
+    except hash_proc.comp_errs as comp_err:
+        sys.exit(str(comp_err))
+    if diff_num:
+        sys.exit(1)
+
+
+def run_verify(parser, args):
+    """
+    Verify the hash table of a directory, or a sample of its entries
+    """
+    dev_workers = parse_dev_workers(parser, args.dev_workers)
+    sink, metrics = open_outputs(args)
+    timeouts = {'read': args.read_timeout, 'file': args.file_timeout, 'rate': args.min_rate, 'retries': args.retries}
+    hash_proc = HashProc(dev_workers=dev_workers, run_num=args.run_size, sink=sink, metrics=metrics,
+                         timeouts=timeouts)
+    alg = args.alg or hash_proc.detect_alg(args.table)
+    if (args.sample is not None) or (args.days is not None):
+        verif_res = hash_proc.sample_hash(alg, os.path.abspath(args.table), args.sample, args.days,
+                                          args.sample_mode, args.seed)
+    else:
+        verif_res = hash_proc.verif_hash(alg, os.path.abspath(args.table), args.external)
+    close_outputs(sink, metrics)
+    if isinstance(verif_res, Exception):
+        sys.exit(str(verif_res))
+    elif verif_res is not None:
+        sys.exit(1)
+
+
+def run_bench(parser, args):
+    """
+    Measure the time to open each window
+    """
+    root = tk.Tk()
+    root.withdraw()
+    bench_dict = MainApp(root).bench_windows(args.repeat)
+    root.destroy()
+    for win_name, times in bench_dict.items():
+        times = ' '.join('{num:8.1f}'.format(num=num * 1000) for num in times)
+        print('{name:<12} {times} ms'.format(name=win_name, times=times))
+
+
+def run_view(parser, args):
+    """
+    Browse an error file or a result report
+    """
+    root = tk.Tk()
+    ResultWin(master=root, res_path=os.path.abspath(args.path))
+    root.mainloop()
+
+
+def run_copy(parser, args):
+    """
+    Copy a directory and hash it from the same reads
+    """
+    alg = None if args.alg.lower() == 'none' else args.alg.lower()
+    copy_res = HashProc().copy_dir(alg, args.source, args.target, args.comp, args.dial)
+    if isinstance(copy_res, Exception):
+        sys.exit(str(copy_res))
+    elif isinstance(copy_res, int):
+        sys.exit(1)
+
+
+def run_calc(parser, args):
+    """
+    Calculate the hash of a file or of the standard input
+    """
+    hash_proc = HashProc()
+    out_stream = sys.stdout.buffer if args.tee else None
+    try:
+        if args.path == '-':
+            file_hash = hash_proc.hash_stream(args.alg, sys.stdin.buffer, out_stream)
+        else:
+            file_hash = hash_proc.calc_hash(args.alg, args.path, out_file=out_stream, stream=True)
+            if out_stream is not None:
+                out_stream.flush()
+    except (OSError, ValueError) as proc_err:
+        sys.exit(str(proc_err))
+    if isinstance(file_hash, Exception):
+        sys.exit(str(file_hash))
+    hash_line = hash_proc.format_line(args.alg, file_hash, args.path)
+    (sys.stderr if args.tee else sys.stdout).write(hash_line)
+
+
+def run_daemon(parser, args):
+    """
+    Serve calc, gen, and verify requests to local clients
+    """
+    address = args.address
+    if (address is not None) and re.match(r'^[^/\\]+:\d+$', address):
+        host, port = address.rsplit(':', 1)
+        address = (host, int(port))
+    daemon = HashDaemon(None, address, args.authkey.encode('utf-8') or None, args.workers)
+    try:
+        daemon_res = daemon.run()
+    except KeyboardInterrupt:
+        daemon_res = None
+    if isinstance(daemon_res, Exception):
+        sys.exit(str(daemon_res))
+
+
+def run_gen(parser, args):
+    """
+    Generate the hash table of a directory
+    """
+    if (args.shard not in (None, 'dir')) and not (args.shard.isdigit() and int(args.shard) > 0):
+        parser.error("argument --shard: expected dir or a positive number")
+    if args.merkle and ((args.dial not in (None, 'native')) or (args.shard is not None)):
+        parser.error("argument --merkle: not allowed with --shard or a gnu or bsd --dial")
+    dev_workers = parse_dev_workers(parser, args.dev_workers)
+    rules = []
+    if args.exclude_from is not None:
+        with open(args.exclude_from, mode='r', encoding='utf-8') as rule_file:
+            rules.extend(rule_file.read().splitlines())
+    rules.extend(args.exclude)
+    min_time = None if args.newer is None else time.time() - args.newer * 86400
+    max_time = None if args.older is None else time.time() - args.older * 86400
+    path_filter = None
+    if rules or any(limit is not None for limit in (args.min_size, args.max_size, min_time, max_time)):
+        path_filter = HashFilter(rules, args.min_size, args.max_size, min_time, max_time)
+    sink, metrics = open_outputs(args)
+    timeouts = {'read': args.read_timeout, 'file': args.file_timeout, 'rate': args.min_rate, 'retries': args.retries}
+    hash_proc = HashProc(dev_workers=dev_workers, sink=sink, metrics=metrics, links=args.links,
+                         path_filter=path_filter, timeouts=timeouts)
+    gen_res = hash_proc.gen_hash(args.alg, os.path.abspath(args.root), args.comp, args.dial, args.shard,
+                                 args.keys, args.archives, args.merkle)
+    close_outputs(sink, metrics)
+    if isinstance(gen_res, Exception):
+        sys.exit(str(gen_res))
+    elif isinstance(gen_res, int):
+        sys.exit(1)
+
+
+def main():
+    """
+    Run the application or one of its command line modes
+    """
+    if len(sys.argv) > 1:
+        parser = make_parser()
+        args = parser.parse_args()
+        args.func(parser, args)
+    else:
+        MainApp()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1109 @@
+import zipfile
+import tarfile
+import hashlib
+import socket
+import subprocess
+import threading
+import errno
+import json
+import time
+import stat
+import sys
+import io
+import os
+
+import pytest
+
+src_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, src_path)
+
+from pychecksum import (HashProc, HashFilter, HashWatcher, HashSink, HashCoord, HashDaemon, HashClient,  # noqa: E402
+                        HashQueue, HashMetrics, HashResults, HashWorker, MainApp, QueueWin)
+import pychecksum  # noqa: E402
+
+
+def make_tree(root):
+    """
+    Create a small directory tree with a subdirectory, a log file, and an archive
+    """
+    os.makedirs(os.path.join(root, 'sub'))
+    with open(os.path.join(root, 'a.txt'), mode='w') as file:
+        file.write('alpha')
+    with open(os.path.join(root, 'sub', 'b.txt'), mode='w') as file:
+        file.write('bravo')
+    with open(os.path.join(root, 'run.log'), mode='w') as file:
+        file.write('log')
+    with zipfile.ZipFile(os.path.join(root, 'z.zip'), mode='w') as zip_file:
+        zip_file.writestr('m.txt', 'member')
+    return str(root)
+
+
+def read_errs(hash_path):
+    """
+    Read the error lines of the error file of a hash table
+    """
+    with open(hash_path + '.err', mode='r', encoding='utf-8') as err_file:
+        err_text = err_file.read()
+    return err_text.split('Error Type')[1].splitlines()[2:]
+
+
+def test_round_trip(tmp_path):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc()
+    hash_lines = hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert len(hash_lines) == 4
+    assert hash_proc.verif_hash('sha256', hash_path) is None
+    assert hash_proc.verif_hash('sha256', hash_path, external=True) is None
+    with open(os.path.join(dir_path, 'a.txt'), mode='w') as file:
+        file.write('changed')
+    os.remove(os.path.join(dir_path, 'sub', 'b.txt'))
+    with open(os.path.join(dir_path, 'new.txt'), mode='w') as file:
+        file.write('new')
+    expected = ['Not found   *' + os.path.join('sub', 'b.txt'), 'Not listed  *new.txt', 'Not match   *a.txt']
+    assert hash_proc.verif_hash('sha256', hash_path) == 3
+    assert sorted(read_errs(hash_path)) == expected
+    assert hash_proc.verif_hash('sha256', hash_path, external=True) == 3
+    assert sorted(read_errs(hash_path)) == expected
+    assert not os.path.isfile(hash_path + '.part')
+
+
+def test_external_runs(tmp_path):
+    dir_path = make_tree(tmp_path)
+    for num in range(10):
+        with open(os.path.join(dir_path, 'sub', 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    HashProc().gen_hash('sha256', dir_path, archives=True)
+    hash_path = HashProc().get_table('sha256', dir_path)
+    with open(hash_path, mode='a', encoding='utf-8') as hash_file:
+        hash_file.writelines(['0' * 64 + ' *a.txt\n', '0' * 64 + ' *z.zip!m.txt\n', '0' * 64 + ' *gone.txt\n',
+                              '1' * 64 + ' *gone.txt\n'])
+    with open(os.path.join(dir_path, 'sub', 'f3.txt'), mode='w') as file:
+        file.write('changed')
+    expected = ['Duplicated  *a.txt', 'Duplicated  *gone.txt', 'Duplicated  *z.zip!m.txt', 'Not found   *gone.txt',
+                'Not match   *' + os.path.join('sub', 'f3.txt')]
+    assert HashProc().verif_hash('sha256', hash_path) == 5
+    assert sorted(read_errs(hash_path)) == expected
+    hash_proc = HashProc(run_num=2)
+    hash_proc.fan_num = 2
+    assert hash_proc.verif_hash('sha256', hash_path, external=True) == 5
+    assert sorted(read_errs(hash_path)) == expected
+    entries = [(str(num % 7), num) for num in range(50)]
+    assert list(hash_proc.sort_runs(iter(entries))) == sorted(entries)
+
+
+def test_dialects(tmp_path):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc()
+    native_path = hash_proc.get_table('md5', dir_path)
+    native_lines = hash_proc.gen_hash('md5', dir_path)
+    native_entries = sorted(hash_proc.read_table(native_path, 'md5'))
+    for dial, line_fmt in (('gnu', '{hash}  {path}'), ('bsd', 'MD5 ({path}) = {hash}')):
+        hash_lines = hash_proc.gen_hash('md5', dir_path, dial=dial)
+        hash_path = hash_proc.get_table('md5', dir_path)
+        with open(hash_path, mode='r', encoding='utf-8') as hash_file:
+            file_lines = hash_file.read().splitlines()
+        for file_hash, rel_path in native_entries:
+            assert line_fmt.format(hash=file_hash, path=rel_path) in file_lines
+        assert len(hash_lines) == len(native_lines)
+        assert sorted(hash_proc.read_table(hash_path, 'md5')) == native_entries
+        assert hash_proc.detect_alg(hash_path) == 'md5'
+        assert hash_proc.verif_hash('md5', hash_path) is None
+
+
+def test_escaped_gnu_line(tmp_path):
+    dir_path = str(tmp_path)
+    with open(os.path.join(dir_path, 'a\\b'), mode='w') as file:
+        file.write('x')
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha1', dir_path, dial='gnu')
+    hash_path = hash_proc.get_table('sha1', dir_path)
+    with open(hash_path, mode='r', encoding='utf-8') as hash_file:
+        assert hash_file.read().startswith('\\')
+    assert [rel_path for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha1')] == ['a\\b']
+    assert hash_proc.verif_hash('sha1', hash_path) is None
+
+
+def test_hardlinks_once(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    link_path = os.path.join(dir_path, 'sub', 'link.txt')
+    os.link(os.path.join(dir_path, 'a.txt'), link_path)
+    read_paths = []
+    calc_hash = HashProc.calc_hash
+
+    def count_reads(self, alg, file_path, *args, **kwargs):
+        if os.path.basename(file_path) in ('a.txt', 'link.txt'):
+            read_paths.append(file_path)
+        return calc_hash(self, alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(HashProc, 'calc_hash', count_reads)
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert len(read_paths) == 1
+    hash_dict = {rel_path: file_hash for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha256')}
+    assert hash_dict['a.txt'] == hash_dict[os.path.join('sub', 'link.txt')] == hashlib.sha256(b'alpha').hexdigest()
+    del read_paths[:]
+    assert hash_proc.verif_hash('sha256', hash_path) is None
+    assert len(read_paths) == 1
+    with open(link_path, mode='w') as file:
+        file.write('changed')
+    expected = ['Not match   *a.txt', 'Not match   *' + os.path.join('sub', 'link.txt')]
+    for external in (False, True):
+        assert hash_proc.verif_hash('sha256', hash_path, external=external) == 2
+        assert sorted(read_errs(hash_path)) == expected
+
+
+def test_corrupt_table(tmp_path):
+    dir_path = make_tree(tmp_path)
+    for num in range(200):
+        with open(os.path.join(dir_path, 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path, 'gz')
+    hash_path = hash_proc.get_table('sha256', dir_path, 'gz')
+    with open(hash_path, mode='r+b') as hash_file:
+        hash_file.seek(40)
+        hash_file.write(b'\xff' * 20)
+    for external in (False, True):
+        assert isinstance(hash_proc.verif_hash('sha256', hash_path, external), hash_proc.comp_errs)
+
+
+def test_read_only_verify(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    file_names = sorted(os.listdir(dir_path))
+
+    def read_only(*args):
+        raise OSError(errno.EROFS, os.strerror(errno.EROFS))
+
+    monkeypatch.setattr(hash_proc, 'write_err', read_only)
+    for external in (False, True):
+        assert hash_proc.verif_hash('sha256', hash_path, external) is None
+        assert sorted(os.listdir(dir_path)) == file_names
+    os.remove(os.path.join(dir_path, 'a.txt'))
+    for external in (False, True):
+        assert isinstance(hash_proc.verif_hash('sha256', hash_path, external), OSError)
+
+
+def test_sink_after_dedup(tmp_path):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('sha256', dir_path)
+    hash_path = HashProc().get_table('sha256', dir_path)
+    with open(hash_path, mode='a', encoding='utf-8') as hash_file:
+        hash_file.writelines(['0' * 64 + ' *gone.txt\n'] * 3)
+    for external in (False, True):
+        sink_file = io.StringIO()
+        hash_proc = HashProc(sink=HashSink(sink_file))
+        assert hash_proc.verif_hash('sha256', hash_path, external) == 2
+        records = [json.loads(line) for line in sink_file.getvalue().splitlines()]
+        err_records = [(record['type'], record['path'], record['expected']) for record in records
+                       if record['type'] != 'OK']
+        assert sorted(err_records) == [('Duplicated', 'gone.txt', '0' * 64), ('Not found', 'gone.txt', '0' * 64)]
+
+
+def read_metrics(metric_path):
+    """
+    Parse the samples of a Prometheus textfile by name and labels
+    """
+    metric_dict = {}
+    with open(metric_path, mode='r', encoding='utf-8') as metric_file:
+        for line in metric_file:
+            if line.strip() and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                metric_dict[name] = float(value)
+    return metric_dict
+
+
+def test_gen_metrics(tmp_path):
+    dir_path = make_tree(os.path.join(str(tmp_path), 'tree'))
+    metric_path = str(tmp_path / 'gen.prom')
+    report_path = str(tmp_path / 'gen.csv')
+    command = [sys.executable, os.path.join(src_path, 'pychecksum.py'), 'gen', dir_path, '--metrics-file',
+               metric_path, '--report', report_path, '--report-format', 'csv']
+    assert subprocess.run(command, timeout=30).returncode == 0
+    metric_dict = read_metrics(metric_path)
+    assert metric_dict['pychecksum_files_hashed_total{alg="sha256"}'] == 4
+    assert metric_dict['pychecksum_file_seconds_count'] == 4
+    assert metric_dict['pychecksum_errors_total{type="Not match"}'] == 0
+    with open(report_path, mode='r', encoding='utf-8') as report_file:
+        assert len(report_file.read().splitlines()) == 5
+    with open(os.path.join(dir_path, 'a.txt'), mode='w') as file:
+        file.write('changed')
+    metrics = HashMetrics()
+    hash_proc = HashProc(metrics=metrics)
+    assert hash_proc.verif_hash('sha256', hash_proc.get_table('sha256', dir_path)) == 1
+    metrics.write_file(metric_path)
+    metric_dict = read_metrics(metric_path)
+    assert metric_dict['pychecksum_files_hashed_total{alg="sha256"}'] == 4
+    assert metric_dict['pychecksum_errors_total{type="Not match"}'] == 1
+    assert metric_dict['pychecksum_queue_depth'] == 0
+
+
+def test_result_filters(tmp_path):
+    hash_proc = HashProc()
+    hash_path = hash_proc.get_table('sha256', str(tmp_path))
+    err_path = '.'.join([hash_path, 'err'])
+    err_types = ['Not match  ', 'Not found  ', 'Permission ']
+    with hash_proc.open_spool(hash_path) as err_lines:
+        for i in range(120000):
+            rel_path = os.path.join('dir{num}'.format(num=i % 4), 'f{num}'.format(num=i))
+            err_lines.append(hash_proc.format_err(err_types[i % 3], rel_path))
+        hash_proc.write_err(err_path, err_lines)
+    results = HashResults(err_path)
+    load_num = 1
+    while results.load():
+        load_num += 1
+    assert load_num == 3
+    assert results.res_file.closed
+    assert len(results.res_list) == len(results.match_list) == 120000
+    assert len(results.apply_filter('Not found', '')) == 40000
+    assert len(results.apply_filter('Not found', 'dir1')) == 10000
+    match_list = results.apply_filter('Not found', os.path.join('dir1', 'f1'))
+    assert match_list[:2] == [1, 13]
+    assert all(results.res_list[num][0] == 'Not found' for num in match_list)
+    assert len(results.apply_filter('All', 'dir2')) == 30000
+    assert len(results.apply_filter('Stalled', '')) == 0
+
+
+def test_coord_units(tmp_path):
+    dir_path = make_tree(tmp_path)
+    with zipfile.ZipFile(os.path.join(dir_path, 'z.zip'), mode='a') as zip_file:
+        zip_file.writestr('dir/n.txt', 'nested')
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path, archives=True)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    unit_dict = HashCoord(hash_proc).split_job('sha256', hash_path)
+    assert sorted(rel_path for file_hash, rel_path in unit_dict['.']) == [
+        'a.txt', 'run.log', 'z.zip', 'z.zip!dir/n.txt', 'z.zip!m.txt']
+    assert HashCoord().verif_hash('sha256', hash_path, workers=2) is None
+    hash_proc.gen_hash('sha256', dir_path, shard='dir')
+    assert HashCoord().verif_hash('sha256', hash_path, workers=2) is None
+    with open(os.path.join(dir_path, 'sub', 'b.txt'), mode='w') as file:
+        file.write('changed')
+    assert HashCoord().verif_hash('sha256', hash_path, workers=2) == 1
+    assert read_errs(hash_path) == ['Not match   *' + os.path.join('sub', 'b.txt')]
+
+
+def test_worker_budget(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc(workers=8, dev_workers={'hdd': 1, 'ssd': 6})
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert HashCoord(hash_proc).split_budget(3) == (2, {'hdd': 1, 'ssd': 2})
+    budget_list = []
+    verif_entries = HashProc.verif_entries
+
+    def count_entries(self, *args, **kwargs):
+        budget_list.append((self.workers, self.dev_workers))
+        return verif_entries(self, *args, **kwargs)
+
+    monkeypatch.setattr(HashProc, 'verif_entries', count_entries)
+    unit_dict = HashCoord(hash_proc).split_job('sha256', hash_path)
+    worker = HashWorker(None, None, dir_path, None, 2, {'ssd': 2})
+    assert worker.proc_unit('sha256', 'sub', unit_dict['sub'], []) == []
+    assert budget_list == [(2, {'hdd': 1, 'ssd': 2})]
+
+
+class SlowHasher(object):
+
+    def __init__(self, hasher):
+        """
+        Wrap a hasher that takes a short while per chunk
+        """
+        self.hasher = hasher
+
+    def update(self, buffer):
+        """
+        Update the wrapped hasher after a short pause
+        """
+        time.sleep(0.01)
+        self.hasher.update(buffer)
+
+    def hexdigest(self):
+        """
+        Get the digest of the wrapped hasher
+        """
+        return self.hasher.hexdigest()
+
+
+def test_archive_read_timeout(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    with tarfile.open(os.path.join(dir_path, 'big.tar.gz'), mode='w:gz') as tar_file:
+        member_info = tarfile.TarInfo('zeros.bin')
+        member_info.size = 2 ** 22
+        tar_file.addfile(member_info, io.BytesIO(bytes(member_info.size)))
+    HashProc().gen_hash('sha256', dir_path, archives=True)
+    hash_path = HashProc().get_table('sha256', dir_path)
+    hash_proc = HashProc(timeouts={'read': 0.1, 'interval': 0.05})
+    new_hasher = hash_proc.new_hasher
+    monkeypatch.setattr(hash_proc, 'new_hasher', lambda alg: SlowHasher(new_hasher(alg)))
+    assert hash_proc.verif_hash('sha256', hash_path) is None
+
+
+def test_sample_links(tmp_path):
+    dir_path = make_tree(tmp_path)
+    os.symlink('a.txt', os.path.join(dir_path, 'link'))
+    os.symlink('gone.txt', os.path.join(dir_path, 'dangling'))
+    hash_proc = HashProc(links='record', path_filter=HashFilter(['*.log']))
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    rel_paths = [rel_path for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha256')]
+    assert 'dangling' in rel_paths
+    assert HashProc().sample_hash('sha256', hash_path, 1.0) is None
+    os.remove(os.path.join(dir_path, 'link'))
+    os.symlink('sub', os.path.join(dir_path, 'link'))
+    assert HashProc().sample_hash('sha256', hash_path, 1.0) == 1
+    assert read_errs(hash_path) == ['Not match   *link']
+
+
+def start_daemon(sock_path, authkey=b'key'):
+    """
+    Start a hashing daemon on a socket and wait until it listens
+    """
+    daemon = HashDaemon(HashProc(), sock_path, authkey)
+    daemon.start()
+    while daemon.thread.is_alive() and not hasattr(daemon, 'listener'):
+        time.sleep(0.01)
+    return daemon
+
+
+def test_daemon_socket(tmp_path):
+    sock_path = str(tmp_path / 'sock')
+    assert isinstance(HashDaemon(HashProc(), sock_path, b'').run(), ValueError)
+    daemon = start_daemon(sock_path)
+    assert stat.S_IMODE(os.stat(sock_path).st_mode) == 0o600
+    assert isinstance(HashDaemon(HashProc(), sock_path, b'key').run(), OSError)
+    client = HashClient(sock_path, b'key')
+    assert client.calc_hash('sha256', __file__) == HashProc().calc_hash('sha256', __file__)
+    client.stop()
+    daemon.thread.join(5)
+    assert not os.path.exists(sock_path)
+    with open(sock_path, mode='w') as file:
+        file.write('data')
+    assert isinstance(HashDaemon(HashProc(), sock_path, b'key').run(), OSError)
+    with open(sock_path, mode='r') as file:
+        assert file.read() == 'data'
+    os.remove(sock_path)
+    stale_sock = socket.socket(socket.AF_UNIX)
+    stale_sock.bind(sock_path)
+    stale_sock.close()
+    daemon = start_daemon(sock_path)
+    HashClient(sock_path, b'key').stop()
+    daemon.thread.join(5)
+    assert not os.path.exists(sock_path)
+
+
+def test_daemon_cache(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path / 'tree')
+    sock_path = str(tmp_path / 'sock')
+    daemon = start_daemon(sock_path)
+    calc_paths = []
+    calc_hash = HashProc.calc_hash
+
+    def count_hash(self, alg, file_path, *args, **kwargs):
+        calc_paths.append(file_path)
+        return calc_hash(self, alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(HashProc, 'calc_hash', count_hash)
+    client = HashClient(sock_path, b'key')
+    hash_path = HashProc().get_table('sha256', dir_path)
+    file_path = os.path.join(dir_path, 'a.txt')
+    assert len(client.request([('gen', 'sha256', dir_path)])[0]) == 4
+    assert len(calc_paths) == 4
+    assert client.calc_hash('sha256', file_path) == hashlib.sha256(b'alpha').hexdigest()
+    assert len(calc_paths) == 4
+    assert client.request([('verify', 'sha256', hash_path)]) == [None]
+    assert len(calc_paths) == 8
+    file_stat = os.stat(file_path)
+    with open(file_path, mode='r+b') as file:
+        file.write(b'A')
+    os.utime(file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+    assert client.request([('verify', 'sha256', hash_path)]) == [1]
+    assert read_errs(hash_path) == ['Not match   *a.txt']
+    client.stop()
+    daemon.thread.join(5)
+
+
+def test_compare_tables(tmp_path, monkeypatch):
+    old_path = make_tree(tmp_path / 'old')
+    new_path = make_tree(tmp_path / 'new')
+    with open(os.path.join(new_path, 'a.txt'), mode='w') as file:
+        file.write('changed')
+    os.remove(os.path.join(new_path, 'sub', 'b.txt'))
+    os.makedirs(os.path.join(new_path, 'extra'))
+    for file_name in ('new.txt', os.path.join('extra', 'c.txt')):
+        with open(os.path.join(new_path, file_name), mode='w') as file:
+            file.write('new')
+    hash_proc = HashProc(run_num=2)
+    for dir_path in (old_path, new_path):
+        hash_proc.gen_hash('sha256', dir_path, merkle=True)
+    old_table = hash_proc.get_table('sha256', old_path)
+    new_table = hash_proc.get_table('sha256', new_path)
+    assert hash_proc.compare_hash('sha256', old_table, old_table) is None
+    diff_lines = ['Added       *extra/\n', 'Added       *new.txt\n', 'Changed     *a.txt\n', 'Removed     *sub/\n']
+    assert sorted(hash_proc.compare_hash('sha256', old_table, new_table)) == diff_lines
+    hash_proc.gen_hash('sha256', old_path, comp='gz', merkle=True)
+    gz_table = hash_proc.get_table('sha256', old_path, 'gz')
+    assert sorted(hash_proc.compare_hash('sha256', gz_table, new_table)) == diff_lines
+    move_path = make_tree(tmp_path / 'move')
+    os.makedirs(os.path.join(move_path, 'more'))
+    with open(os.path.join(move_path, 'more', 'c.txt'), mode='w') as file:
+        file.write('new')
+    hash_proc.gen_hash('sha256', move_path, merkle=True)
+    move_table = hash_proc.get_table('sha256', move_path)
+    with open(os.path.join(old_path, 'sub', 'b.txt'), mode='w') as file:
+        file.write('changed')
+    hash_proc.gen_hash('sha256', old_path, merkle=True)
+
+    def read_entries(*args):
+        raise AssertionError('full table read')
+
+    monkeypatch.setattr(hash_proc, 'read_entries', read_entries)
+    assert sorted(hash_proc.compare_hash('sha256', old_table, move_table)) == [
+        'Added       *more/\n', 'Changed     *' + os.path.join('sub', 'b.txt') + '\n']
+    assert sorted(hash_proc.compare_hash('sha256', new_table, move_table)) == [
+        'Added       *sub/\n', 'Changed     *a.txt\n', 'Moved       *extra/ -> more/\n', 'Removed     *new.txt\n']
+    for kwargs in ({'dial': 'gnu'}, {'dial': 'bsd'}, {'shard': 'dir'}):
+        assert isinstance(hash_proc.gen_hash('sha256', old_path, merkle=True, **kwargs), ValueError)
+
+
+def test_sample_coverage(tmp_path):
+    dir_path = make_tree(tmp_path)
+    for num in range(6):
+        with open(os.path.join(dir_path, 'sub', 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    state_path = hash_path + '.state'
+    assert hash_proc.sample_hash('sha256', hash_path, 0.5, seed=1) is None
+    assert len(hash_proc.read_state(state_path)) == 5
+    assert hash_proc.sample_hash('sha256', hash_path, 0.5, seed=2) is None
+    assert len(hash_proc.read_state(state_path)) == 10
+    with open(os.path.join(dir_path, 'sub', 'f0.txt'), mode='w') as file:
+        file.write('changed')
+    assert hash_proc.sample_hash('sha256', hash_path, 1.0, mode='stratified') == 1
+    assert read_errs(hash_path) == ['Not match   *' + os.path.join('sub', 'f0.txt')]
+    assert hash_proc.verif_hash('sha256', hash_path) == 1
+    assert os.path.isfile(state_path)
+
+
+def test_device_scheduling(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    for num in range(20):
+        with open(os.path.join(dir_path, 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    hash_proc = HashProc(dev_workers={'ssd': 1, 'hdd': 1})
+    path_dict = hash_proc.walk_dir(dir_path)
+    dev = os.stat(dir_path).st_dev
+    assert {file_info[0] for file_info in path_dict.values()} == {dev}
+    assert hash_proc.get_workers(dev) == 1
+    read_paths = []
+    calc_hash = hash_proc.calc_hash
+
+    def record_hash(alg, file_path, *args, **kwargs):
+        read_paths.append(file_path)
+        return calc_hash(alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(hash_proc, 'calc_hash', record_hash)
+    hash_dict = dict(hash_proc.hash_files('sha256', path_dict))
+    assert hash_dict == {file_path: HashProc().calc_hash('sha256', file_path) for file_path in path_dict}
+    assert sorted(read_paths) == sorted(path_dict)
+    inodes = [os.stat(file_path).st_ino for file_path in read_paths]
+    assert inodes == sorted(inodes)
+    hash_proc = HashProc(dev_workers={dev: 3})
+    assert hash_proc.get_workers(dev) == 3
+    assert hash_proc.fork().get_sema(dev) is hash_proc.get_sema(dev)
+
+
+def test_dev_workers_option(tmp_path):
+    dir_path = make_tree(os.path.join(str(tmp_path), 'tree'))
+    command = [sys.executable, os.path.join(src_path, 'pychecksum.py'), 'gen', dir_path, '--dev-workers']
+    assert subprocess.run(command + ['hdd=2', 'ssd=4', dir_path + '=3'], timeout=30).returncode == 0
+    assert HashProc().verif_hash('sha256', HashProc().get_table('sha256', dir_path)) is None
+    for dev_arg in ('ssd', 'ssd=0', 'ssd=x', os.path.join(dir_path, 'gone') + '=2'):
+        gen_res = subprocess.run(command + [dev_arg], timeout=30, stderr=subprocess.PIPE)
+        assert gen_res.returncode == 2
+        assert b'--dev-workers' in gen_res.stderr
+
+
+def test_not_found_without_stat(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    for num in range(10):
+        with open(os.path.join(dir_path, 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    removed = [os.path.join(dir_path, 'f{}.txt'.format(num)) for num in range(10)]
+    for file_path in removed:
+        os.remove(file_path)
+    checked = []
+    isfile = os.path.isfile
+
+    def record_isfile(file_path):
+        checked.append(os.path.abspath(file_path))
+        return isfile(file_path)
+
+    monkeypatch.setattr(os.path, 'isfile', record_isfile)
+    assert hash_proc.verif_hash('sha256', hash_path) == 10
+    assert not set(checked) & set(removed)
+    assert sorted(read_errs(hash_path)) == ['Not found   *f{}.txt'.format(num) for num in range(10)]
+
+
+def test_small_file_reads(tmp_path):
+    hash_proc = HashProc()
+    hash_proc.block_size = 16
+    hasher = hash_proc.new_hasher('sha256')
+    hasher.update(b'dirty')
+    assert hash_proc.new_hasher('sha256').hexdigest() == hashlib.sha256().hexdigest()
+    for data in (b'', b'x' * 15, b'x' * 16, b'x' * 17, os.urandom(1000)):
+        file_path = os.path.join(str(tmp_path), 'f{}.bin'.format(len(data)))
+        with open(file_path, mode='wb') as file:
+            file.write(data)
+        expected = hashlib.sha256(data).hexdigest()
+        assert hash_proc.calc_hash('sha256', file_path) == expected
+        assert hash_proc.calc_hash('sha256', file_path, file_size=3) == expected
+    dir_path = os.path.join(str(tmp_path), 'tiny')
+    os.makedirs(dir_path)
+    for num in range(300):
+        with open(os.path.join(dir_path, 'f{}.txt'.format(num)), mode='w') as file:
+            file.write(str(num))
+    path_dict = hash_proc.walk_dir(dir_path)
+    hash_dict = dict(hash_proc.hash_files('md5', path_dict))
+    assert len(hash_dict) == 300
+    for num in range(300):
+        file_path = os.path.join(dir_path, 'f{}.txt'.format(num))
+        assert hash_dict[file_path] == hashlib.md5(str(num).encode()).hexdigest()
+
+
+def test_walk_sizes(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    os.symlink('a.txt', os.path.join(dir_path, 'link'))
+    sparse_path = os.path.join(dir_path, 'sparse.bin')
+    with open(sparse_path, mode='wb') as file:
+        file.truncate(2 ** 22)
+    hash_proc = HashProc(path_filter=HashFilter(max_size=2 ** 30))
+    path_dict = hash_proc.walk_dir(dir_path)
+    assert path_dict[os.path.join(dir_path, 'a.txt')][2] == 5
+    assert path_dict[os.path.join(dir_path, 'link')][2] == 5
+    if hash_proc.is_sparse(os.stat(sparse_path)):
+        assert path_dict[sparse_path][2] is None
+    if os.name != 'nt':
+        assert HashProc().walk_dir(dir_path)[os.path.join(dir_path, 'a.txt')][2] is None
+    fstat_fds = []
+    fstat = os.fstat
+
+    def count_fstat(fd):
+        fstat_fds.append(fd)
+        return fstat(fd)
+
+    monkeypatch.setattr(os, 'fstat', count_fstat)
+    hash_dict = dict(hash_proc.hash_files('sha256', path_dict))
+    assert len(fstat_fds) == sum(file_info[2] is None for file_info in path_dict.values())
+    assert hash_dict[sparse_path] == hashlib.sha256(bytes(2 ** 22)).hexdigest()
+
+
+def test_queue_jobs(tmp_path):
+    dir_path = make_tree(tmp_path / 'tree')
+    hash_path = HashProc().get_table('sha256', dir_path)
+    queue_path = str(tmp_path / 'queue.json')
+    hash_queue = HashQueue(HashProc(workers=2), jobs=4, queue_path=queue_path)
+    assert hash_queue.hash_proc.budget is not None
+    assert hash_queue.hash_proc.fork().budget is hash_queue.hash_proc.budget
+    hash_queue.add(2, 'sha256', dir_path)
+    hash_queue.add(3, 'sha256', hash_path)
+    hash_queue.add(2, 'sha256', str(tmp_path / 'missing'))
+    assert len(hash_queue.run()) == 3
+    assert [(job['state'], job['errors']) for job in hash_queue.job_list][:2] == [('done', 0), ('done', 0)]
+    assert hash_queue.job_list[2]['state'] == 'failed'
+    with open(os.path.join(dir_path, 'a.txt'), mode='w') as file:
+        file.write('changed')
+    hash_queue.add(3, 'sha256', hash_path)
+    assert len(hash_queue.run()) == 1
+    assert (hash_queue.job_list[3]['state'], hash_queue.job_list[3]['errors']) == ('done', 1)
+    hash_queue.clear()
+    assert hash_queue.job_list == []
+    hash_queue.add(2, 'sha256', dir_path)
+    hash_queue.job_list[0]['state'] = 'running'
+    hash_queue.save()
+    loaded_queue = HashQueue(queue_path=queue_path)
+    assert [(job['num'], job['path'], job['state']) for job in loaded_queue.job_list] == [(1, dir_path, 'pending')]
+    assert [job['state'] for job in loaded_queue.run()] == ['done']
+
+
+def test_copy_dir(tmp_path, monkeypatch):
+    src_path = make_tree(tmp_path / 'src')
+    os.makedirs(os.path.join(src_path, 'empty'))
+    os.symlink('sub', os.path.join(src_path, 'sub_link'))
+    os.symlink('a.txt', os.path.join(src_path, 'a_link'))
+    hash_proc = HashProc()
+    dst_path = str(tmp_path / 'dst')
+    copy_lines = hash_proc.copy_dir('sha256', src_path, dst_path)
+    assert sorted(copy_lines) == sorted(hash_proc.gen_hash('sha256', src_path))
+    assert os.path.isdir(os.path.join(dst_path, 'empty'))
+    assert os.readlink(os.path.join(dst_path, 'sub_link')) == 'sub'
+    assert os.readlink(os.path.join(dst_path, 'a_link')) == 'a.txt'
+    with open(os.path.join(dst_path, 'sub', 'b.txt'), mode='r') as file:
+        assert file.read() == 'bravo'
+    assert hash_proc.verif_hash('sha256', hash_proc.get_table('sha256', dst_path)) is None
+    file_path = os.path.join(src_path, 'a.txt')
+    copy_path = str(tmp_path / 'a.copy')
+    assert hash_proc.copy_file('sha256', file_path, copy_path) == hashlib.sha256(b'alpha').hexdigest()
+    assert hash_proc.copy_file(None, file_path, copy_path) is None
+    with open(copy_path, mode='rb') as file:
+        assert file.read() == b'alpha'
+    copy_file = hash_proc.copy_file
+
+    def deny_copy(alg, src_file, dst_file, file_size=None):
+        if src_file == file_path:
+            return PermissionError(errno.EACCES, os.strerror(errno.EACCES), src_file)
+        return copy_file(alg, src_file, dst_file, file_size)
+
+    monkeypatch.setattr(hash_proc, 'copy_file', deny_copy)
+    err_path = str(tmp_path / 'err')
+    assert hash_proc.copy_dir('sha256', src_path, err_path) == 1
+    assert read_errs(hash_proc.get_table('sha256', err_path)) == ['Permission  *a.txt']
+    assert hash_proc.copy_dir(None, src_path, err_path) == 1
+    assert isinstance(hash_proc.copy_dir('sha256', str(tmp_path / 'missing'), err_path), FileNotFoundError)
+
+
+def run_calc(*args, **kwargs):
+    """
+    Run the calc command of the script in a new process
+    """
+    command = [sys.executable, os.path.join(src_path, 'pychecksum.py'), 'calc'] + list(args)
+    return subprocess.run(command, timeout=30, **kwargs)
+
+
+def test_calc_streams(tmp_path):
+    data = os.urandom(300000)
+    data_hash = hashlib.sha256(data).hexdigest()
+    hash_proc = HashProc()
+    assert hash_proc.hash_stream('sha256', io.BytesIO(data)) == data_hash
+    out_stream = io.BytesIO()
+    assert hash_proc.hash_stream('md5', io.BytesIO(data), out_stream) == hashlib.md5(data).hexdigest()
+    assert out_stream.getvalue() == data
+    sock_pair = socket.socketpair()
+    sender = threading.Thread(target=lambda: (sock_pair[0].sendall(data), sock_pair[0].close()))
+    sender.start()
+    assert hash_proc.hash_stream('sha256', sock_pair[1]) == data_hash
+    sender.join()
+    sock_pair[1].close()
+    calc_res = run_calc('-', input=data, capture_output=True)
+    assert calc_res.stdout.decode() == data_hash + ' *-\n'
+    calc_res = run_calc('-', '--tee', input=data, capture_output=True)
+    assert (calc_res.stdout, calc_res.stderr.decode()) == (data, data_hash + ' *-\n')
+    fifo_path = str(tmp_path / 'fifo')
+    os.mkfifo(fifo_path)
+    write_code = 'import sys; open(sys.argv[1], "wb").write(bytes(1000))'
+    writer = subprocess.Popen([sys.executable, '-c', write_code, fifo_path])
+    assert hash_proc.calc_hash('sha256', fifo_path, stream=True) == hashlib.sha256(bytes(1000)).hexdigest()
+    writer.wait(30)
+    assert isinstance(hash_proc.calc_hash('sha256', os.devnull), OSError)
+    dir_path = make_tree(tmp_path / 'tree')
+    os.mkfifo(os.path.join(dir_path, 'fifo'))
+    os.symlink(os.devnull, os.path.join(dir_path, 'null'))
+    assert len(hash_proc.gen_hash('sha256', dir_path)) == 4
+
+
+def test_tee_sparse_append(tmp_path):
+    file_path = str(tmp_path / 'sparse.bin')
+    with open(file_path, mode='wb') as file:
+        file.truncate(2 ** 22)
+        file.seek(2 ** 21)
+        file.write(b'data')
+    with open(file_path, mode='rb') as file:
+        data = file.read()
+    out_path = str(tmp_path / 'out.bin')
+    with open(out_path, mode='wb') as out_file:
+        out_file.write(b'head')
+    with open(out_path, mode='ab') as out_file:
+        calc_res = run_calc(file_path, '--tee', stdout=out_file, stderr=subprocess.PIPE)
+    assert calc_res.stderr.decode().startswith(hashlib.sha256(data).hexdigest())
+    with open(out_path, mode='rb') as out_file:
+        assert out_file.read() == b'head' + data
+
+
+def test_sparse_hash(tmp_path):
+    file_path = str(tmp_path / 'holes.bin')
+    with open(file_path, mode='wb') as file:
+        file.truncate(2 ** 22)
+        file.seek(2 ** 20 - 10)
+        file.write(os.urandom(100000))
+        file.seek(2 ** 22 - 3)
+        file.write(b'end')
+        file.truncate(2 ** 23)
+    with open(file_path, mode='rb') as file:
+        data = file.read()
+    hash_proc = HashProc()
+    if not hash_proc.is_sparse(os.stat(file_path)):
+        pytest.skip('the file system does not store sparse files')
+    out_path = str(tmp_path / 'out.bin')
+    with open(out_path, mode='wb') as out_file:
+        assert hash_proc.calc_hash('sha256', file_path, out_file=out_file) == hashlib.sha256(data).hexdigest()
+    with open(out_path, mode='rb') as out_file:
+        assert out_file.read() == data
+    assert hash_proc.calc_hash('md5', file_path) == hashlib.md5(data).hexdigest()
+
+
+def write_lines(file_path, entries):
+    """
+    Write a hash table without header from hash and path pairs
+    """
+    with open(file_path, mode='w', encoding='utf-8') as hash_file:
+        hash_file.writelines('{} *{}\n'.format(char * 64, rel_path) for char, rel_path in entries)
+    return file_path
+
+
+def test_diff_tables(tmp_path):
+    old_path = write_lines(str(tmp_path / 'old.sha256'), [
+        ('3', 'c.txt'), ('1', 'a.txt'), ('2', 'b.txt'), ('4', 'dup.txt'), ('0', 'dup.txt'), ('6', 'm.txt')])
+    new_path = write_lines(str(tmp_path / 'new.sha256'), [
+        ('8', 'b.txt'), ('1', 'a.txt'), ('4', 'dup.txt'), ('6', 'sub/m.txt'), ('7', 'new.txt'), ('9', 'dup.txt')])
+    expected = ['Added       *new.txt\n', 'Changed     *b.txt\n', 'Moved       *m.txt -> sub/m.txt\n',
+                'Removed     *c.txt\n']
+    for run_num in (None, 2):
+        hash_proc = HashProc(run_num=run_num)
+        assert sorted(hash_proc.diff_hash('sha256', old_path, new_path)) == expected
+        assert hash_proc.diff_hash('sha256', old_path, old_path) is None
+    assert isinstance(HashProc().diff_hash('sha256', old_path, str(tmp_path / 'missing.sha256')), OSError)
+    diff_res = subprocess.run([sys.executable, os.path.join(src_path, 'pychecksum.py'), 'diff', old_path, new_path],
+                              capture_output=True, timeout=30)
+    assert diff_res.returncode == 1
+    assert sorted(diff_res.stdout.decode().splitlines(True)) == expected
+
+
+def test_stalled_read(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('sha256', dir_path)
+    hash_path = HashProc().get_table('sha256', dir_path)
+    hash_proc = HashProc(timeouts={'read': 0.1, 'retries': 2, 'interval': 0.05})
+    release = threading.Event()
+    hung_paths = []
+    calc_hash = hash_proc.calc_hash
+
+    def hang_hash(alg, file_path, *args, **kwargs):
+        if os.path.basename(file_path) == 'a.txt':
+            hung_paths.append(file_path)
+            release.wait(30)
+        return calc_hash(alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(hash_proc, 'calc_hash', hang_hash)
+    try:
+        assert hash_proc.verif_hash('sha256', hash_path) == 1
+        assert read_errs(hash_path) == ['Stalled     *a.txt']
+        assert len(hung_paths) == 3
+    finally:
+        release.set()
+
+
+def test_sample_through_hash_files(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    os.link(os.path.join(dir_path, 'sub', 'b.txt'), os.path.join(dir_path, 'b.txt'))
+    HashProc().gen_hash('sha256', dir_path, archives=True)
+    hash_path = HashProc().get_table('sha256', dir_path)
+    hash_proc = HashProc(timeouts={'read': 0.1, 'interval': 0.05})
+    release = threading.Event()
+    read_paths = []
+    calc_hash = hash_proc.calc_hash
+
+    def hang_hash(alg, file_path, *args, **kwargs):
+        read_paths.append(os.path.basename(file_path))
+        if os.path.basename(file_path) == 'a.txt':
+            release.wait(30)
+        return calc_hash(alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(hash_proc, 'calc_hash', hang_hash)
+    try:
+        assert hash_proc.sample_hash('sha256', hash_path, 1.0) == 1
+        assert read_errs(hash_path) == ['Stalled     *a.txt']
+        assert sorted(read_paths) == ['a.txt', 'b.txt', 'run.log', 'z.zip']
+        assert len(hash_proc.read_state(hash_path + '.state')) == 6
+    finally:
+        release.set()
+
+
+def test_manifest(tmp_path):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path, shard='dir')
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert hash_proc.read_header(hash_path).get('Title') == 'Hash Manifest'
+    assert hash_proc.verif_hash('sha256', hash_path) is None
+    with open(os.path.join(dir_path, 'sub', 'b.txt'), mode='w') as file:
+        file.write('changed')
+    assert hash_proc.verif_hash('sha256', hash_path) == 1
+    assert read_errs(hash_path) == ['Not match   *' + os.path.join('sub', 'b.txt')]
+    hash_proc.gen_hash('sha256', dir_path, shard='dir', keys=['sub'])
+    assert hash_proc.verif_hash('sha256', hash_path) is None
+    shard_path = hash_proc.get_shard('sha256', dir_path, 'sub')
+    with open(shard_path, mode='a', encoding='utf-8') as shard_file:
+        shard_file.write('0' * 64 + ' *extra\n')
+    assert hash_proc.verif_hash('sha256', hash_path) == 1
+    assert read_errs(hash_path) == ['Not match   *' + os.path.basename(shard_path)]
+
+
+def test_partial_shards(tmp_path, monkeypatch):
+    dir_path = make_tree(tmp_path)
+    os.makedirs(os.path.join(dir_path, 'other'))
+    with open(os.path.join(dir_path, 'other', 'c.txt'), mode='w') as file:
+        file.write('charlie')
+    hash_proc = HashProc()
+    hash_proc.gen_hash('sha256', dir_path, shard='dir')
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    walk_paths = []
+    iter_dir = hash_proc.iter_dir
+
+    def record_walk(dir_path, skip_dict=None, sub_path=None, top_only=False):
+        walk_paths.append(sub_path)
+        return iter_dir(dir_path, skip_dict, sub_path, top_only)
+
+    monkeypatch.setattr(hash_proc, 'iter_dir', record_walk)
+    with open(os.path.join(dir_path, 'sub', 'b.txt'), mode='w') as file:
+        file.write('changed')
+    assert len(hash_proc.gen_hash('sha256', dir_path, shard='dir', keys=['sub'])) == 3
+    assert walk_paths == [os.path.join(dir_path, 'sub')]
+    assert HashProc().verif_hash('sha256', hash_path) is None
+    calc_hash = hash_proc.calc_hash
+
+    def deny_hash(alg, file_path, *args, **kwargs):
+        if os.path.basename(file_path) == 'c.txt':
+            return PermissionError(errno.EACCES, os.strerror(errno.EACCES), file_path)
+        return calc_hash(alg, file_path, *args, **kwargs)
+
+    monkeypatch.setattr(hash_proc, 'calc_hash', deny_hash)
+    assert hash_proc.gen_hash('sha256', dir_path, shard='dir', keys=['other']) == 1
+    assert read_errs(hash_path) == ['Permission  *' + os.path.join('other', 'c.txt')]
+    assert sorted(shard_name for shard_hash, shard_name in hash_proc.read_table(hash_path, 'sha256')) == [
+        os.path.basename(hash_proc.get_shard('sha256', dir_path, key)) for key in ('.', 'sub')]
+    assert HashProc().verif_hash('sha256', hash_path) == 1
+    assert read_errs(hash_path) == ['Not listed  *' + os.path.join('other', 'c.txt')]
+
+
+def test_filter_rules(tmp_path):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc(path_filter=HashFilter(['*.log']))
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert 'run.log' not in [rel_path for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha256')]
+    assert HashProc().verif_hash('sha256', hash_path) is None
+    assert HashProc().verif_hash('sha256', hash_path, external=True) is None
+    with open(os.path.join(dir_path, 'new.log'), mode='w') as file:
+        file.write('log')
+    assert HashProc().verif_hash('sha256', hash_path) is None
+
+
+def test_filter_bad_rules(tmp_path):
+    path_filter = HashFilter(['[z-a]', 'sub/[!]', '*.[ch]', 'x[a-\\]'])
+    for rel_path in ('[z-a]', os.path.join('sub', '[!]'), 'a.c', 'x[a-]'):
+        assert path_filter.is_excluded(rel_path)
+    for rel_path in ('z', os.path.join('sub', 'b'), 'a.txt', 'xb'):
+        assert not path_filter.is_excluded(rel_path)
+    dir_path = make_tree(tmp_path)
+    with open(os.path.join(dir_path, '[z-a]'), mode='w') as file:
+        file.write('bad')
+    hash_proc = HashProc(path_filter=path_filter)
+    assert type(hash_proc.gen_hash('sha256', dir_path)) == list
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert '[z-a]' not in [rel_path for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha256')]
+    assert HashProc().verif_hash('sha256', hash_path) is None
+
+
+def test_filter_limits_on_verify(tmp_path):
+    dir_path = make_tree(tmp_path)
+    hash_proc = HashProc(path_filter=HashFilter(min_size=0, max_size=5))
+    hash_proc.gen_hash('sha256', dir_path)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    assert HashProc().fork_info(HashProc().read_header(hash_path)).path_filter.min_size == 0
+    with open(os.path.join(dir_path, 'a.txt'), mode='w') as file:
+        file.write('grown past the limit')
+    for external in (False, True):
+        assert HashProc().verif_hash('sha256', hash_path, external) == 1
+        assert read_errs(hash_path) == ['Not match   *a.txt']
+
+
+def test_filter_not_leaked(tmp_path):
+    filtered_path = make_tree(tmp_path / 'filtered')
+    plain_path = make_tree(tmp_path / 'plain')
+    hash_proc = HashProc(path_filter=HashFilter(['*.log']))
+    hash_proc.gen_hash('sha256', filtered_path)
+    HashProc().gen_hash('sha256', plain_path)
+    shared_proc = HashProc()
+    assert shared_proc.verif_hash('sha256', hash_proc.get_table('sha256', filtered_path)) is None
+    assert shared_proc.path_filter is None
+    os.remove(os.path.join(plain_path, 'run.log'))
+    assert shared_proc.verif_hash('sha256', shared_proc.get_table('sha256', plain_path)) == 1
+
+
+def flush_watcher(watcher, *file_paths):
+    """
+    Flush the given files of a watcher as if they had settled
+    """
+    for file_path in file_paths:
+        watcher.pend_dict[file_path] = 0.0
+    watcher.flush()
+
+
+def test_watcher_rewrite(tmp_path):
+    dir_path = make_tree(tmp_path)
+    os.makedirs(os.path.join(dir_path, 'cache'))
+    hash_proc = HashProc(path_filter=HashFilter(['*.log', 'cache/']))
+    hash_proc.gen_hash('sha256', dir_path, archives=True, merkle=True)
+    hash_path = hash_proc.get_table('sha256', dir_path)
+    old_header = hash_proc.read_header(hash_path)
+    watcher = HashWatcher('sha256', dir_path, HashProc(), poll=True)
+    assert watcher.load() is None
+    with open(os.path.join(dir_path, 'sub', 'b.txt'), mode='w') as file:
+        file.write('changed')
+    with open(os.path.join(dir_path, 'new.log'), mode='w') as file:
+        file.write('log')
+    with open(os.path.join(dir_path, 'cache', 'c'), mode='w') as file:
+        file.write('cache')
+    sub_path = os.path.join(dir_path, 'sub', 'b.txt')
+    flush_watcher(watcher, sub_path, os.path.join(dir_path, 'new.log'), os.path.join(dir_path, 'cache', 'c'))
+    new_header = hash_proc.read_header(hash_path)
+    for key in ('Archive Members', 'Path Filter'):
+        assert new_header.get(key) == old_header.get(key)
+    assert new_header.get('Merkle Root') not in (None, old_header.get('Merkle Root'))
+    rel_paths = [rel_path for file_hash, rel_path in hash_proc.read_table(hash_path, 'sha256')]
+    assert 'z.zip!m.txt' in rel_paths
+    assert 'new.log' not in rel_paths
+    assert os.path.join('cache', 'c') not in rel_paths
+    assert HashProc().verif_hash('sha256', hash_path) is None
+
+
+def test_watcher_keeps_dialect(tmp_path):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('md5', dir_path, dial='gnu')
+    watcher = HashWatcher('md5', dir_path, poll=True)
+    assert watcher.load() is None
+    with open(os.path.join(dir_path, 'a.txt'), mode='w') as file:
+        file.write('changed')
+    flush_watcher(watcher, os.path.join(dir_path, 'a.txt'))
+    hash_path = HashProc().get_table('md5', dir_path)
+    with open(hash_path, mode='r', encoding='utf-8') as hash_file:
+        assert not hash_file.read().startswith('PyChecksum')
+    assert HashProc().verif_hash('md5', hash_path) is None
+
+
+def test_watcher_refuses_manifest(tmp_path):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('sha256', dir_path, shard='dir')
+    assert isinstance(HashWatcher('sha256', dir_path, poll=True).run(), ValueError)
+
+
+def test_watcher_polls_changed_dirs(tmp_path):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('md5', dir_path)
+    watcher = HashWatcher('md5', dir_path, poll=True)
+    assert watcher.load() is None
+    a_path = os.path.join(dir_path, 'a.txt')
+    c_path = os.path.join(dir_path, 'sub', 'c.txt')
+    with open(a_path, mode='a') as file:
+        file.write('changed')
+    with open(c_path, mode='w') as file:
+        file.write('new')
+    watcher.poll()
+    assert list(watcher.pend_dict) == [c_path]
+    watcher.pend_dict.clear()
+    watcher.poll_num = watcher.sweep_num - 1
+    watcher.poll()
+    assert list(watcher.pend_dict) == [a_path]
+
+
+def test_watcher_batches_writes(tmp_path):
+    dir_path = make_tree(tmp_path)
+    HashProc().gen_hash('md5', dir_path)
+    hash_path = HashProc().get_table('md5', dir_path)
+    watcher = HashWatcher('md5', dir_path, poll=True, interval=60.0)
+    assert watcher.load() is None
+    for name in ('a.txt', os.path.join('sub', 'b.txt')):
+        with open(os.path.join(dir_path, name), mode='w') as file:
+            file.write('changed')
+    flush_watcher(watcher, os.path.join(dir_path, 'a.txt'))
+    assert HashProc().verif_hash('md5', hash_path) == 1
+    flush_watcher(watcher, os.path.join(dir_path, 'sub', 'b.txt'))
+    assert watcher.dirty
+    assert HashProc().verif_hash('md5', hash_path) == 1
+    watcher.flush(True)
+    assert not watcher.dirty
+    assert HashProc().verif_hash('md5', hash_path) is None
+
+
+def test_watcher_prunes_watches(tmp_path):
+    dir_path = make_tree(os.path.join(str(tmp_path), 'tree'))
+    HashProc(path_filter=HashFilter(['cache/'])).gen_hash('md5', dir_path)
+    watcher = HashWatcher('md5', dir_path)
+    if watcher.fd is None:
+        pytest.skip('inotify is not available')
+    assert watcher.load() is None
+    sub_path = os.path.join(dir_path, 'sub')
+    moved_path = os.path.join(str(tmp_path), 'moved')
+    os.makedirs(os.path.join(sub_path, 'deep'))
+    watcher.read_events(1.0)
+    assert os.path.join(sub_path, 'deep') in watcher.wd_dict.values()
+    os.rename(sub_path, moved_path)
+    watcher.read_events(1.0)
+    assert sorted(watcher.wd_dict.values()) == [dir_path]
+    os.makedirs(os.path.join(dir_path, 'tmp'))
+    watcher.read_events(1.0)
+    os.rmdir(os.path.join(dir_path, 'tmp'))
+    for _ in range(5):
+        if os.path.join(dir_path, 'tmp') not in watcher.wd_dict.values():
+            break
+        watcher.read_events(1.0)
+    assert sorted(watcher.wd_dict.values()) == [dir_path]
+    os.makedirs(os.path.join(dir_path, 'cache', 'deep'))
+    watcher.read_events(1.0)
+    assert sorted(watcher.wd_dict.values()) == [dir_path]
+
+
+class FakeMaster(object):
+    """
+    Stand in for a tkinter window when no display is available
+    """
+    def __init__(self):
+        self.tk = object()
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append(name)
+
+
+def test_gui_caches(monkeypatch):
+    images = []
+    monkeypatch.setattr(pychecksum.tk, 'PhotoImage', lambda **kwargs: images.append(kwargs) or object())
+    monkeypatch.setattr(MainApp, 'asset_dict', {})
+    monkeypatch.setattr(MainApp, 'win_dict', {})
+    app = MainApp(FakeMaster())
+    assert app.load_asset('image') is app.load_asset('image')
+    assert len(images) == 1
+    other = MainApp(FakeMaster())
+    assert other.load_asset('image') is not app.load_asset('image')
+    assert len(images) == 2
+    opened = []
+
+    def open_window(self, win_class, *args, **kwargs):
+        window = win_class.__new__(win_class)
+        window.master = FakeMaster()
+        opened.append((win_class, kwargs))
+        return window
+
+    monkeypatch.setattr(MainApp, 'open_window', open_window)
+    window = app.open_cached(QueueWin)
+    assert app.open_cached(QueueWin) is window
+    assert len(opened) == 1
+    assert 'deiconify' in window.master.calls
+    app.close_window(window)
+    assert 'destroy' not in window.master.calls
+    opened.clear()
+    bench_dict = app.bench_windows(repeat=2)
+    assert all(len(times) == 2 for times in bench_dict.values())
+    queue_paths = [kwargs['queue_path'] for win_class, kwargs in opened if win_class is QueueWin]
+    home_path = os.path.join(os.path.expanduser('~'), '.pychecksum_queue.json')
+    assert len(queue_paths) == 2 and home_path not in queue_paths
+    assert not os.path.exists(os.path.dirname(queue_paths[0]))